@@ -0,0 +1,82 @@
+"""
+Compare the materialized BOQ header and cumulative totals with the
+BOQ items.
+
+Usage:
+    python manage.py check_boq_totals          # report drift
+    python manage.py check_boq_totals --fix    # report and repair drift
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.boq.models import BOQ
+from apps.boq.services.totals import (
+    TOTAL_FIELDS,
+    compute_boq_totals,
+    compute_cumulative_totals,
+    get_cumulative_totals,
+    rebuild_cumulative_totals,
+    save_boq_totals,
+    stored_boq_totals,
+)
+
+
+class Command(BaseCommand):
+    help = "Verify (and optionally repair) the stored BOQ totals"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Rewrite drifted totals from the BOQ items",
+        )
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for boq in BOQ.objects.order_by("id").iterator():
+            expected = compute_boq_totals(boq)
+            stored = stored_boq_totals(boq)
+            diff = {
+                field: (stored[field], expected[field])
+                for field in TOTAL_FIELDS
+                if stored[field] != expected[field]
+            }
+            if not diff:
+                continue
+
+            drifted += 1
+            self.stdout.write(self.style.WARNING(
+                f"BOQ {boq.id} (v{boq.version}): "
+                + ", ".join(f"{f} {old} != {new}" for f, (old, new) in diff.items())
+            ))
+            if options["fix"]:
+                with transaction.atomic():
+                    save_boq_totals(boq, expected)
+
+        # Running totals, checked per project against a fresh recomputation
+        project_ids = BOQ.objects.values_list("project_id", flat=True).distinct()
+        for project_id in project_ids.order_by("project_id"):
+            expected = compute_cumulative_totals(project_id)
+            stale = [
+                boq for boq in BOQ.objects.filter(project_id=project_id).order_by("version")
+                if get_cumulative_totals(boq) != expected[boq.id]
+            ]
+            if not stale:
+                continue
+
+            drifted += 1
+            self.stdout.write(self.style.WARNING(
+                f"Project {project_id}: cumulative totals out of sync for version(s) "
+                + ", ".join(str(boq.version) for boq in stale)
+            ))
+            if options["fix"]:
+                with transaction.atomic():
+                    rebuild_cumulative_totals(project_id)
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("All BOQ totals are consistent"))
+        elif options["fix"]:
+            self.stdout.write(self.style.SUCCESS(f"Repaired {drifted} inconsistencies"))
+        else:
+            self.stdout.write(self.style.ERROR(f"{drifted} inconsistencies found"))
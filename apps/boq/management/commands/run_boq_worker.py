@@ -0,0 +1,57 @@
+"""
+Django management command that executes queued BOQ jobs
+(generation, PDF and Excel exports).
+
+Usage: python manage.py run_boq_worker [--once] [--poll-interval 2]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.boq.services.jobs import claim_next_job, purge_expired_job_outputs, run_job
+
+
+# Seconds between sweeps of expired DRAFT export files while idle
+PURGE_INTERVAL = 600
+
+
+class Command(BaseCommand):
+    help = 'Run the BOQ background job worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue and exit instead of polling forever'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep when the queue is empty'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('BOQ worker started')
+        next_purge = 0
+
+        while True:
+            close_old_connections()
+            job = claim_next_job()
+
+            if job is None:
+                if time.monotonic() >= next_purge:
+                    purge_expired_job_outputs()
+                    next_purge = time.monotonic() + PURGE_INTERVAL
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            run_job(job)
+            style = self.style.SUCCESS if job.status == 'SUCCEEDED' else self.style.ERROR
+            self.stdout.write(style(f'{job.kind} job #{job.pk}: {job.status} {job.message}'))
+
+        self.stdout.write('BOQ worker stopped')
@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+ITEM_TYPE_FIELDS = {
+    "PRODUCT": ("product_quantity", "product_amount"),
+    "DRIVER": ("driver_quantity", "driver_amount"),
+    "ACCESSORY": ("accessory_quantity", "accessory_amount"),
+}
+
+
+def backfill_boq_totals(apps, schema_editor):
+    BOQ = apps.get_model("boq", "BOQ")
+    BOQItem = apps.get_model("boq", "BOQItem")
+
+    totals = {}
+    items = BOQItem.objects.values_list(
+        "boq_id", "item_type", "quantity", "unit_price", "final_price"
+    ).iterator()
+    for boq_id, item_type, quantity, unit_price, final_price in items:
+        row = totals.setdefault(boq_id, {"subtotal": Decimal(0)})
+        quantity_field, amount_field = ITEM_TYPE_FIELDS[item_type]
+        row[quantity_field] = row.get(quantity_field, 0) + quantity
+        row[amount_field] = row.get(amount_field, Decimal(0)) + (final_price or 0)
+        row["subtotal"] += (unit_price or 0) * quantity
+
+    for boq in BOQ.objects.filter(pk__in=totals.keys()):
+        row = totals[boq.pk]
+        for field, value in row.items():
+            setattr(boq, field, value)
+        boq.grand_total = sum(
+            (row.get(amount, Decimal(0)) for _, amount in ITEM_TYPE_FIELDS.values()),
+            Decimal(0),
+        )
+        boq.margin_amount = boq.grand_total - boq.subtotal
+        boq.margin_percent = (
+            BOQItem.objects.filter(boq_id=boq.pk)
+            .values_list("markup_pct", flat=True)
+            .first() or 0
+        )
+        boq.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boq', '0002_boqjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boq',
+            name='product_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='boq',
+            name='product_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='boq',
+            name='driver_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='boq',
+            name='driver_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='boq',
+            name='accessory_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='boq',
+            name='accessory_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='boq',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='boq',
+            name='margin_percent',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='boq',
+            name='margin_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='boq',
+            name='grand_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunPython(backfill_boq_totals, migrations.RunPython.noop),
+    ]
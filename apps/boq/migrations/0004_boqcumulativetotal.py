@@ -0,0 +1,64 @@
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+ITEM_TYPES = ["PRODUCT", "DRIVER", "ACCESSORY"]
+
+
+def backfill_cumulative_totals(apps, schema_editor):
+    BOQ = apps.get_model("boq", "BOQ")
+    BOQItem = apps.get_model("boq", "BOQItem")
+    BOQCumulativeTotal = apps.get_model("boq", "BOQCumulativeTotal")
+
+    own = {}
+    items = BOQItem.objects.values_list(
+        "boq_id", "item_type", "quantity", "unit_price", "final_price"
+    ).iterator()
+    for boq_id, item_type, quantity, unit_price, final_price in items:
+        key = (boq_id, item_type)
+        q, a, b = own.get(key, (0, Decimal(0), Decimal(0)))
+        own[key] = (q + quantity, a + (final_price or 0), b + (unit_price or 0) * quantity)
+
+    rows = []
+    running = {}
+    boqs = BOQ.objects.order_by("project_id", "version").values_list("id", "project_id")
+    for boq_id, project_id in boqs.iterator():
+        for item_type in ITEM_TYPES:
+            q, a, b = running.get((project_id, item_type), (0, Decimal(0), Decimal(0)))
+            oq, oa, ob = own.get((boq_id, item_type), (0, Decimal(0), Decimal(0)))
+            running[(project_id, item_type)] = (q + oq, a + oa, b + ob)
+            rows.append(BOQCumulativeTotal(
+                boq_id=boq_id,
+                item_type=item_type,
+                quantity=q + oq,
+                amount=a + oa,
+                base_amount=b + ob,
+            ))
+    BOQCumulativeTotal.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boq', '0003_boq_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BOQCumulativeTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_type', models.CharField(choices=[('PRODUCT', 'Product'), ('DRIVER', 'Driver'), ('ACCESSORY', 'Accessory')], max_length=20)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('base_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('boq', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cumulative_totals', to='boq.boq')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('boq', 'item_type'), name='uniq_cumulative_total_per_boq_item_type')],
+            },
+        ),
+        migrations.RunPython(backfill_cumulative_totals, migrations.RunPython.noop),
+    ]
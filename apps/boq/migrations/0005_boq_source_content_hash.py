@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boq', '0004_boqcumulativetotal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boq',
+            name='source_content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
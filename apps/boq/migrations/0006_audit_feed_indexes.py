@@ -0,0 +1,40 @@
+from django.db import migrations, models
+
+
+# easyaudit's CRUDEvent only indexes (object_id, content_type); the audit
+# feed (apps.common.audit_feed) scans it newest first, per content type
+# and per user.
+CRUD_EVENT_INDEXES = [
+    ("easyaudit_crudevent_time_idx", "datetime, id"),
+    ("easyaudit_crudevent_ct_time_idx", "content_type_id, datetime"),
+    ("easyaudit_crudevent_user_time_idx", "user_id, datetime"),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boq', '0005_boq_source_content_hash'),
+        ('easyaudit', '0019_alter_crudevent_changed_fields_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlogentry',
+            index=models.Index(fields=['timestamp', 'id'], name='boq_auditlog_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlogentry',
+            index=models.Index(fields=['user', 'timestamp'], name='boq_auditlog_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlogentry',
+            index=models.Index(fields=['action', 'timestamp'], name='boq_auditlog_action_time_idx'),
+        ),
+    ] + [
+        migrations.RunSQL(
+            f"CREATE INDEX IF NOT EXISTS {name} ON easyaudit_crudevent ({columns})",
+            f"DROP INDEX IF EXISTS {name}",
+        )
+        for name, columns in CRUD_EVENT_INDEXES
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boq', '0006_audit_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boqjob',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='boqjob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='boqjob',
+            index=models.Index(fields=['status', 'lease_expires_at'], name='boq_boqjob_lease_idx'),
+        ),
+    ]
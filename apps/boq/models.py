@@ -28,10 +28,27 @@ class BOQ(models.Model):
     )
     
     source_configuration_version = models.PositiveIntegerField(null=True, blank=True)
+    # Hash of the configuration snapshots the BOQ was generated from
+    # (apps.configurations.services.snapshots.project_content_hash)
+    source_content_hash = models.CharField(max_length=64, blank=True, default="")
     
     created_at = models.DateTimeField(auto_now_add=True)
     locked_at = models.DateTimeField(null=True, blank=True)
 
+    # Denormalized totals, maintained by apps.boq.services.totals
+    # (amount = SUM(final_price), subtotal = SUM(unit_price * quantity))
+    product_quantity = models.PositiveIntegerField(default=0)
+    product_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    driver_quantity = models.PositiveIntegerField(default=0)
+    driver_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    accessory_quantity = models.PositiveIntegerField(default=0)
+    accessory_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    margin_percent = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    margin_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    grand_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
     class Meta:
         unique_together = ("project", "version")
         indexes = [
@@ -96,6 +113,28 @@ class BOQItem(models.Model):
         ]
     
 
+class BOQCumulativeTotal(models.Model):
+    """
+    Running totals of all BOQ versions of a project up to (and including)
+    `boq.version`, one row per item type.
+    Maintained by apps.boq.services.totals.
+    """
+    boq = models.ForeignKey(BOQ, on_delete=models.CASCADE, related_name="cumulative_totals")
+    item_type = models.CharField(max_length=20, choices=BOQItem._meta.get_field("item_type").choices)
+
+    quantity = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    base_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["boq", "item_type"],
+                name="uniq_cumulative_total_per_boq_item_type"
+            ),
+        ]
+
+
 class AuditLogEntry(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True)
     action = models.CharField(max_length=50)
@@ -104,3 +143,56 @@ class AuditLogEntry(models.Model):
 
     class Meta:
         verbose_name_plural = "Audit Log Entries"
+        # Audit feed (apps.common.audit_feed): keyset scans, newest first
+        indexes = [
+            models.Index(fields=["timestamp", "id"], name="boq_auditlog_time_idx"),
+            models.Index(fields=["user", "timestamp"], name="boq_auditlog_user_time_idx"),
+            models.Index(fields=["action", "timestamp"], name="boq_auditlog_action_time_idx"),
+        ]
+
+
+class BOQJob(models.Model):
+    """
+    Background job for heavy BOQ work (generation / document exports).
+    Queued through /api/boq/jobs/ and executed by `manage.py run_boq_worker`.
+    """
+    KIND_CHOICES = [
+        ("GENERATE", "Generate BOQ"),
+        ("EXPORT_PDF", "Export PDF"),
+        ("EXPORT_EXCEL", "Export Excel"),
+    ]
+    STATUS_CHOICES = [
+        ("QUEUED", "Queued"),
+        ("RUNNING", "Running"),
+        ("SUCCEEDED", "Succeeded"),
+        ("FAILED", "Failed"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="QUEUED")
+
+    project = models.ForeignKey(Project, null=True, blank=True, on_delete=models.CASCADE)
+    boq = models.ForeignKey(BOQ, null=True, blank=True, on_delete=models.CASCADE, related_name="jobs")
+    requested_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+
+    progress = models.PositiveSmallIntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True, default="")
+    result = models.JSONField(default=dict, blank=True)
+    output_file = models.CharField(max_length=255, blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # RUNNING jobs whose lease ran out (crashed worker) are requeued or failed
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+            models.Index(fields=["status", "lease_expires_at"], name="boq_boqjob_lease_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job #{self.pk} ({self.status})"
@@ -0,0 +1,110 @@
+"""
+BOQ Pagination
+==============
+Keyset (cursor) pagination for cumulative BOQ item listings.
+
+Key Concepts:
+- Items are ordered by (boq__version, id), which is unique and stable
+  while new versions are appended
+- The cursor encodes the last (version, id) of the previous page, so a
+  page is one indexed range query no matter how deep the client pages
+  (no OFFSET scans, no COUNT(*))
+"""
+
+import base64
+import binascii
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class BOQItemKeysetPagination(BasePagination):
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 200
+    max_page_size = 1000
+    ordering = ("boq__version", "id")
+
+    invalid_cursor_message = "Invalid cursor"
+
+    # ---- CURSOR ENCODING ----
+    @staticmethod
+    def encode_cursor(version, item_id):
+        raw = f"{version}:{item_id}".encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, value):
+        try:
+            raw = base64.urlsafe_b64decode(value.encode()).decode()
+            version, item_id = raw.split(":")
+            return int(version), int(item_id)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    # ---- PAGINATION ----
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            version, item_id = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(boq__version__gt=version) |
+                Q(boq__version=version, id__gt=item_id)
+            )
+
+        # One extra row tells whether another page exists
+        page = list(queryset.order_by(*self.ordering)[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_next_cursor(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        return self.encode_cursor(last.boq.version, last.id)
+
+    def get_next_link(self, path=None):
+        """
+        URL of the next page; `path` points it at another endpoint than
+        the current one (e.g. from an embedded first page).
+        """
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        if path is None:
+            url = self.request.build_absolute_uri()
+        else:
+            url = self.request.build_absolute_uri(path)
+            page_size = self.request.query_params.get(self.page_size_query_param)
+            if page_size:
+                url = replace_query_param(url, self.page_size_query_param, page_size)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
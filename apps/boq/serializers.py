@@ -1,6 +1,6 @@
 # apps.boq.serailizers.py
 from rest_framework import serializers
-from .models import BOQ, BOQItem
+from .models import BOQ, BOQItem, BOQJob
 
 
 class BOQSerializer(serializers.ModelSerializer):
@@ -149,4 +149,67 @@ class BOQItemPriceUpdateSerializer(serializers.Serializer):
         """Validate that unit_price is positive"""
         if value < 0:
             raise serializers.ValidationError("unit_price cannot be negative")
-        return value
\ No newline at end of file
+        return value
+
+
+class BOQItemBulkPriceEntrySerializer(BOQItemPriceUpdateSerializer):
+    id = serializers.IntegerField(min_value=1)
+
+
+class BOQItemBulkPriceUpdateSerializer(serializers.Serializer):
+    """
+    Bulk price override: {"items": [{"id": .., "unit_price": ..}, ...]}.
+    All items must belong to the same DRAFT BOQ.
+    """
+    MAX_ITEMS = 5000
+
+    items = BOQItemBulkPriceEntrySerializer(many=True, allow_empty=False)
+
+    def validate_items(self, value):
+        if len(value) > self.MAX_ITEMS:
+            raise serializers.ValidationError(
+                f"At most {self.MAX_ITEMS} items can be updated per request"
+            )
+        ids = [entry["id"] for entry in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Duplicate item ids")
+        return value
+
+
+class BOQJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BOQJob
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "progress",
+            "message",
+            "result",
+            "project",
+            "boq",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "download_url",
+        ]
+
+    def get_download_url(self, obj):
+        if obj.kind != "GENERATE" and obj.status == "SUCCEEDED":
+            return f"/api/boq/jobs/{obj.id}/download/"
+        return None
+
+
+class BOQJobCreateSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=BOQJob.KIND_CHOICES)
+    project_id = serializers.IntegerField(required=False)
+    boq_id = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if attrs["kind"] == "GENERATE" and not attrs.get("project_id"):
+            raise serializers.ValidationError({"project_id": "project_id is required for GENERATE jobs."})
+        if attrs["kind"] != "GENERATE" and not attrs.get("boq_id"):
+            raise serializers.ValidationError({"boq_id": "boq_id is required for export jobs."})
+        return attrs
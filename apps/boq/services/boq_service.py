@@ -1,12 +1,13 @@
 import io
+import tempfile
 import openpyxl
 
 from decimal import Decimal
 from datetime import date
 from django.utils import timezone
 from django.db import transaction
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.http import HttpResponse, FileResponse
 from django.core.exceptions import ValidationError
 from django.db.models import Max
 from reportlab.platypus import Image
@@ -31,17 +32,96 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
 from apps.boq.models import BOQ, BOQItem
+from apps.common.audit import record_audit
+from apps.boq.services.export_metrics import measure_export
+from apps.boq.services.margins import (
+    final_price_expression,
+    markup_expression,
+    normalize_margin_rules,
+)
+from apps.boq.services.render_dataset import load_render_dataset
+from apps.boq.services.totals import (
+    ITEM_TYPE_FIELDS,
+    compute_totals_from_items,
+    get_cumulative_totals,
+    refresh_boq_totals,
+    save_boq_totals,
+)
 from apps.projects.models import Project
-from apps.configurations.models import (
-    LightingConfiguration,
-    ConfigurationAccessory,
-    ConfigurationDriver
+from apps.masters.models import Product, Driver, Accessory
+from apps.configurations.services.snapshots import (
+    load_active_snapshots,
+    project_content_hash,
 )
 
+# Streaming exports stay in memory up to this size, then spill to disk.
+EXPORT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+def document_date(boq):
+    """
+    Date printed on an export: the approval date of a FINAL BOQ (its
+    documents are cached, see export_cache), today for drafts.
+    """
+    if boq.status == "FINAL" and boq.locked_at:
+        return timezone.localtime(boq.locked_at).date()
+    return date.today()
+
+
+def spooled_export_response(builder, label):
+    """
+    Render `builder` into a SpooledTemporaryFile and return it as a
+    chunked FileResponse carrying the export metrics headers.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+
+    with measure_export(label) as metrics:
+        builder.render(spool)
+
+    spool.seek(0)
+    response = FileResponse(
+        spool,
+        as_attachment=True,
+        filename=builder.filename(),
+        content_type=builder.content_type,
+    )
+    metrics.apply_headers(response)
+    return response
+
+
+class _SectionedFlowables(list):
+    """
+    Flowable list for `doc.build` that is refilled one section at a time.
+
+    ReportLab consumes flowables from the front of the list, so only the
+    section being laid out (one area) is held in memory instead of the
+    whole document.
+    """
+
+    def __init__(self, sections):
+        super().__init__()
+        self._sections = iter(sections)
+
+    def __len__(self):
+        if not list.__len__(self):
+            for section in self._sections:
+                self.extend(section)
+                if list.__len__(self):
+                    break
+        return list.__len__(self)
+
+
 class BOQPDFBuilder:
-    def __init__(self, boq, is_draft=False):
+    export_format = "pdf"
+    content_type = "application/pdf"
+    # Bump whenever the document layout changes (invalidates cached exports).
+    template_revision = 1
+
+    def __init__(self, boq, is_draft=False, progress=None):
         self.boq = boq
         self.is_draft = is_draft
+        # Optional callback: progress(sections_done, sections_total)
+        self.progress = progress
         self.buffer = io.BytesIO()
 
         # Landscape A4
@@ -97,7 +177,7 @@ class BOQPDFBuilder:
         canvas.drawRightString(
             self.width - self.MARGIN_X,
             self.height - 80,
-            f"Date: {date.today().strftime('%d-%m-%Y')}"
+            f"Date: {document_date(self.boq).strftime('%d-%m-%Y')}"
         )
 
         canvas.setStrokeColor(colors.black)
@@ -144,11 +224,11 @@ class BOQPDFBuilder:
         return f"₹ {Decimal(value):,.2f}"
 
     # --------------------------------------------------
-    # Main Builder
+    # Document + flowables
     # --------------------------------------------------
-    def build(self):
-        doc = SimpleDocTemplate(
-            self.buffer,
+    def _new_document(self, fileobj):
+        return SimpleDocTemplate(
+            fileobj,
             pagesize=self.pagesize,
             leftMargin=20 * mm,
             rightMargin=20 * mm,
@@ -156,180 +236,185 @@ class BOQPDFBuilder:
             bottomMargin=25 * mm
         )
 
-        elements = []
-        grand_total = Decimal(0)
-
-        areas = (
-            self.boq.items
-            .select_related("area")
-            .values_list("area__id", "area__name")
-            .distinct()
+    def _area_flowables(self, doc, section):
+        """Return (flowables, area_total) for a single area section."""
+        elements = [
+            Paragraph(f"<b>Area: {section.area_name}</b>", self.styles['Heading4']),
+            Spacer(1, 5),
+        ]
+
+        table_data = [[
+            "Image",
+            "Type",
+            "Code",
+            "Description",
+            "Qty",
+            "Unit",
+            "Rate",
+            "GST",
+            "Total"
+        ]]
+
+        area_total = Decimal(0)
+
+        for item in section.items:
+
+            qty = Decimal(item.quantity or 0)
+            line_total = Decimal(item.final_price or 0)
+
+            # derive base for display
+            if qty > 0:
+                total_unit = line_total / qty
+            else:
+                total_unit = Decimal("0")
+
+            base_price = total_unit / Decimal("1.18")
+            gst = total_unit - base_price
+
+            area_total += line_total
+
+            img = ""
+            item_code = "-"
+            desc = "-"
+
+            # PRODUCT
+            if item.item_type == "PRODUCT" and item.product:
+                product = item.product
+                item_code = product.order_code or "-"
+                desc = (
+                    f"{product.make} | "
+                    f"{product.wattage}W | "
+                    f"{product.cct_kelvin}K | "
+                    f"{product.beam_angle_degree}°"
+                )
+
+                if product.visual_image:
+                    try:
+                        img = Image(
+                            product.visual_image.path,
+                            width=28,
+                            height=28
+                        )
+                    except:
+                        img = ""
+
+                table_data.append([
+                    img,
+                    "Product",
+                    item_code,
+                    Paragraph(desc, self.style_normal),
+                    str(qty),
+                    "Nos",
+                    self._format_currency(base_price),
+                    self._format_currency(gst),
+                    self._format_currency(line_total)
+                ])
+
+            # DRIVER
+            elif item.item_type == "DRIVER" and item.driver:
+                driver = item.driver
+                desc = f"{driver.driver_make} {driver.driver_code}"
+
+                table_data.append([
+                    "",
+                    Paragraph("→ Driver", self.style_normal),
+                    "-",
+                    Paragraph(desc, self.style_normal),
+                    str(qty),
+                    "Nos",
+                    self._format_currency(base_price),
+                    self._format_currency(gst),
+                    self._format_currency(line_total)
+                ])
+
+            # ACCESSORY
+            elif item.item_type == "ACCESSORY" and item.accessory:
+                acc = item.accessory
+                desc = acc.accessory_name
+
+                table_data.append([
+                    "",
+                    Paragraph("→ Accessory", self.style_normal),
+                    "-",
+                    Paragraph(desc, self.style_normal),
+                    str(qty),
+                    "Nos",
+                    self._format_currency(base_price),
+                    self._format_currency(gst),
+                    self._format_currency(line_total)
+                ])
+
+        # Area subtotal
+        table_data.append([
+            "", "", "", "Area Subtotal",
+            "", "", "",
+            "",
+            self._format_currency(area_total)
+        ])
+
+        usable_width = doc.width
+        table = Table(
+            table_data,
+            colWidths=[
+                usable_width * 0.05,  # image
+                usable_width * 0.08,  # type
+                usable_width * 0.12,  # code
+                usable_width * 0.30,  # description
+                usable_width * 0.07,  # qty
+                usable_width * 0.07,  # unit
+                usable_width * 0.10,  # rate
+                usable_width * 0.10,  # gst
+                usable_width * 0.11,  # total
+            ],
+            repeatRows=1,
+            hAlign="CENTER"
         )
 
-        for area_id, area_name in areas:
-            elements.append(Paragraph(f"<b>Area: {area_name}</b>", self.styles['Heading4']))
-            elements.append(Spacer(1, 5))
-
-            table_data = [[
-                "Image",
-                "Type",
-                "Code",
-                "Description",
-                "Qty",
-                "Unit",
-                "Rate",
-                "GST",
-                "Total"
-            ]]
-
-            area_total = Decimal(0)
-            items = self.boq.items.filter(area_id=area_id)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#E8E8E8")),
+            ('FONTNAME', (0, 0), (-1, 0), 'DejaVu'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
 
-            for item in items:
+            ('FONTNAME', (0, 1), (-1, -1), 'DejaVu'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
 
-                qty = Decimal(item.quantity or 0)
-                line_total = Decimal(item.final_price or 0)
+            ('ALIGN', (4, 1), (-1, -1), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
 
-                # derive base for display
-                if qty > 0:
-                    total_unit = line_total / qty
-                else:
-                    total_unit = Decimal("0")
+            # internal padding
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
 
-                base_price = total_unit / Decimal("1.18")
-                gst = total_unit - base_price
+            ('ROWBACKGROUNDS', (0, 1), (-1, -2),
+            [colors.white, colors.HexColor("#F7F7F7")]),
 
-                area_total += line_total
-                grand_total += line_total
+            ('GRID', (0, 0), (-1, -1), 0.4, colors.grey),
 
-                img = ""
-                item_code = "-"
-                desc = "-"
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor("#EFEFEF")),
+            ('FONTNAME', (0, -1), (-1, -1), 'DejaVu'),
+        ]))
 
-                # PRODUCT
-                if item.item_type == "PRODUCT" and item.product:
-                    product = item.product
-                    item_code = product.order_code or "-"
-                    desc = (
-                        f"{product.make} | "
-                        f"{product.wattage}W | "
-                        f"{product.cct_kelvin}K | "
-                        f"{product.beam_angle_degree}°"
-                    )
-
-                    if product.visual_image:
-                        try:
-                            img = Image(
-                                product.visual_image.path,
-                                width=28,
-                                height=28
-                            )
-                        except:
-                            img = ""
-
-                    table_data.append([
-                        img,
-                        "Product",
-                        item_code,
-                        Paragraph(desc, self.style_normal),
-                        str(qty),
-                        "Nos",
-                        self._format_currency(base_price),
-                        self._format_currency(gst),
-                        self._format_currency(line_total)
-                    ])
-
-                # DRIVER
-                elif item.item_type == "DRIVER" and item.driver:
-                    driver = item.driver
-                    desc = f"{driver.driver_make} {driver.driver_code}"
-
-                    table_data.append([
-                        "",
-                        Paragraph("→ Driver", self.style_normal),
-                        "-",
-                        Paragraph(desc, self.style_normal),
-                        str(qty),
-                        "Nos",
-                        self._format_currency(base_price),
-                        self._format_currency(gst),
-                        self._format_currency(line_total)
-                    ])
-
-                # ACCESSORY
-                elif item.item_type == "ACCESSORY" and item.accessory:
-                    acc = item.accessory
-                    desc = acc.accessory_name
-
-                    table_data.append([
-                        "",
-                        Paragraph("→ Accessory", self.style_normal),
-                        "-",
-                        Paragraph(desc, self.style_normal),
-                        str(qty),
-                        "Nos",
-                        self._format_currency(base_price),
-                        self._format_currency(gst),
-                        self._format_currency(line_total)
-                    ])
-
-            # Area subtotal
-            table_data.append([
-                "", "", "", "Area Subtotal",
-                "", "", "",
-                "",
-                self._format_currency(area_total)
-            ])
-
-            usable_width = doc.width
-            table = Table(
-                table_data,
-                colWidths=[
-                    usable_width * 0.05,  # image
-                    usable_width * 0.08,  # type
-                    usable_width * 0.12,  # code
-                    usable_width * 0.30,  # description
-                    usable_width * 0.07,  # qty
-                    usable_width * 0.07,  # unit
-                    usable_width * 0.10,  # rate
-                    usable_width * 0.10,  # gst
-                    usable_width * 0.11,  # total
-                ],
-                repeatRows=1,
-                hAlign="CENTER"
-            )
+        elements.append(table)
+        elements.append(Spacer(1, 15))
 
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#E8E8E8")),
-                ('FONTNAME', (0, 0), (-1, 0), 'DejaVu'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
+        return elements, area_total
 
-                ('FONTNAME', (0, 1), (-1, -1), 'DejaVu'),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-
-                ('ALIGN', (4, 1), (-1, -1), 'RIGHT'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-
-                # internal padding
-                ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-                ('TOPPADDING', (0, 0), (-1, -1), 5),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-
-                ('ROWBACKGROUNDS', (0, 1), (-1, -2),
-                [colors.white, colors.HexColor("#F7F7F7")]),
-
-                ('GRID', (0, 0), (-1, -1), 0.4, colors.grey),
-
-                ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor("#EFEFEF")),
-                ('FONTNAME', (0, -1), (-1, -1), 'DejaVu'),
-            ]))
+    def _iter_flowables(self, doc):
+        """Yield the document one area section at a time."""
+        grand_total = Decimal(0)
 
-            elements.append(table)
-            elements.append(Spacer(1, 15))
+        dataset = load_render_dataset(self.boq)
+        for index, section in enumerate(dataset, start=1):
+            elements, area_total = self._area_flowables(doc, section)
+            grand_total += area_total
+            yield elements
+            if self.progress:
+                self.progress(index, len(dataset))
 
         # Grand total
-        elements.append(Paragraph(
+        yield [Paragraph(
             f"Grand Total: {self._format_currency(grand_total)}",
             ParagraphStyle(
                 'Total',
@@ -338,20 +423,122 @@ class BOQPDFBuilder:
                 fontName='DejaVu',
                 fontSize=13,
             )
-        ))
+        )]
+
+    def filename(self):
+        return f"{self.boq.project.name}_V{self.boq.version}_{self.boq.status}.pdf"
 
+    # --------------------------------------------------
+    # Main Builder
+    # --------------------------------------------------
+    def render(self, fileobj):
+        """Lay out the BOQ into `fileobj`, one area at a time."""
+        doc = self._new_document(fileobj)
         doc.build(
-            elements,
+            _SectionedFlowables(self._iter_flowables(doc)),
             onFirstPage=self._header_footer,
             onLaterPages=self._header_footer
         )
 
+    def build(self):
+        self.render(self.buffer)
+
         self.buffer.seek(0)
-        response = HttpResponse(self.buffer, content_type="application/pdf")
-        filename = f"{self.boq.project.name}_V{self.boq.version}_{self.boq.status}.pdf"
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response = HttpResponse(self.buffer, content_type=self.content_type)
+        response["Content-Disposition"] = f'attachment; filename="{self.filename()}"'
         return response
 
+    def stream(self):
+        """
+        Streaming export: render into a spooled temp file (spills to disk
+        above EXPORT_SPOOL_MAX_BYTES) and serve it in chunks.
+        """
+        return spooled_export_response(self, f"pdf boq={self.boq.id}")
+
+# Rows per INSERT statement when materialising BOQ items.
+BOQ_ITEM_BATCH_SIZE = 500
+
+
+def build_boq_items(boq, area_snapshots):
+    """
+    Build unsaved BOQItem rows for the active configuration snapshots
+    (apps.configurations.services.snapshots.load_active_snapshots).
+
+    Unit prices are read once per master table. A product appears once
+    per area (snapshot lines are unique per product), matching
+    `uniq_product_per_area_per_boq`.
+    """
+    product_ids, driver_ids, accessory_ids = set(), set(), set()
+    for snapshot in area_snapshots:
+        for line in snapshot.lines:
+            product_ids.add(line["product_id"])
+            driver_ids.update(pk for pk, _ in line["drivers"])
+            accessory_ids.update(pk for pk, _ in line["accessories"])
+
+    product_prices = dict(Product.objects.filter(pk__in=product_ids).values_list("pk", "base_price"))
+    driver_prices = dict(Driver.objects.filter(pk__in=driver_ids).values_list("pk", "base_price"))
+    accessory_prices = dict(Accessory.objects.filter(pk__in=accessory_ids).values_list("pk", "base_price"))
+
+    items = []
+
+    for snapshot in area_snapshots:
+        area_id = snapshot.area_id
+
+        for line in snapshot.lines:
+
+            # -------------------------
+            # PRODUCT ITEM
+            # -------------------------
+            product_price = product_prices[line["product_id"]]
+
+            items.append(BOQItem(
+                boq=boq,
+                area_id=area_id,
+                item_type="PRODUCT",
+                product_id=line["product_id"],
+                quantity=line["quantity"],
+                unit_price=product_price,
+                markup_pct=0,
+                final_price=product_price * line["quantity"],
+            ))
+
+            # -------------------------
+            # DRIVER ITEMS
+            # -------------------------
+            for driver_id, quantity in line["drivers"]:
+                driver_price = driver_prices[driver_id]
+
+                items.append(BOQItem(
+                    boq=boq,
+                    area_id=area_id,
+                    item_type="DRIVER",
+                    driver_id=driver_id,
+                    quantity=quantity,
+                    unit_price=driver_price,
+                    markup_pct=0,
+                    final_price=driver_price * quantity,
+                ))
+
+            # -------------------------
+            # ACCESSORY ITEMS
+            # -------------------------
+            for accessory_id, quantity in line["accessories"]:
+                acc_price = accessory_prices[accessory_id]
+
+                items.append(BOQItem(
+                    boq=boq,
+                    area_id=area_id,
+                    item_type="ACCESSORY",
+                    accessory_id=accessory_id,
+                    quantity=quantity,
+                    unit_price=acc_price,
+                    markup_pct=0,
+                    final_price=acc_price * quantity,
+                ))
+
+    return items
+
+
 @transaction.atomic
 def generate_boq(project, user):
     """
@@ -387,26 +574,29 @@ def generate_boq(project, user):
     # -----------------------------
     # 2. LOAD ACTIVE CONFIGURATIONS
     # -----------------------------
-    active_configs = LightingConfiguration.objects.filter(
-        project=project,
-        is_active=True
-    ).select_related("area", "product")
+    # Stored snapshots of the active versions (one serialized row per
+    # area), so the item builder below never queries per configuration.
+    area_snapshots = load_active_snapshots(project.id)
 
-    if not active_configs.exists():
+    if not area_snapshots:
         raise ValidationError(
             "No active configurations found. "
             "Please save configuration first."
         )
 
-    # All configs must share same version
-    config_version = active_configs.first().configuration_version
+    config_version = area_snapshots[0].version
+    content_hash = project_content_hash(area_snapshots)
 
     # -----------------------------
     # 3. PREVENT DUPLICATE BOQ
     # -----------------------------
     latest_boq = BOQ.objects.filter(project=project).order_by("-version").first()
 
-    if latest_boq and latest_boq.source_configuration_version == config_version:
+    if latest_boq and (
+        latest_boq.source_content_hash == content_hash
+        if latest_boq.source_content_hash
+        else latest_boq.source_configuration_version == config_version
+    ):
         raise ValidationError(
             "BOQ already generated for the current configuration version."
         )
@@ -431,85 +621,17 @@ def generate_boq(project, user):
     created_by=user,
     status="DRAFT",
     source_configuration_version=config_version,
+    source_content_hash=content_hash,
     )
 
     # -----------------------------
-    # 6. CREATE BOQ ITEMS
+    # 6. CREATE BOQ ITEMS (BULK)
     # -----------------------------
-    seen_products = set()
-
-    for config in active_configs:
-
-        area = config.area
-        product = config.product
-
-        # Prevent duplicates
-        area_key = area.id if area else "PROJECT"
-        key = (area_key, product.prod_id)
-
-        if key in seen_products:
-            continue
-
-        seen_products.add(key)
+    items = build_boq_items(boq, area_snapshots)
+    BOQItem.objects.bulk_create(items, batch_size=BOQ_ITEM_BATCH_SIZE)
 
-        # -------------------------
-        # PRODUCT ITEM
-        # -------------------------
-        product_price = getattr(product, "base_price", 0)
-        product_total = product_price * config.quantity
-
-        product_item = BOQItem.objects.create(
-            boq=boq,
-            area=area,
-            item_type="PRODUCT",
-            product=product,
-            quantity=config.quantity,
-            unit_price=product_price,
-            markup_pct=0,
-            final_price=product_total,
-        )
-
-        # -------------------------
-        # DRIVER ITEMS
-        # -------------------------
-        drivers = ConfigurationDriver.objects.filter(configuration=config)
-
-        for drv in drivers:
-            driver = drv.driver
-            driver_price = getattr(driver, "base_price", 0)
-            driver_total = driver_price * drv.quantity
-
-            BOQItem.objects.create(
-                boq=boq,
-                area=area,
-                item_type="DRIVER",
-                driver=driver,
-                quantity=drv.quantity,
-                unit_price=driver_price,
-                markup_pct=0,
-                final_price=driver_total,
-            )
-
-        # -------------------------
-        # ACCESSORY ITEMS
-        # -------------------------
-        accessories = ConfigurationAccessory.objects.filter(configuration=config)
-
-        for acc in accessories:
-            accessory = acc.accessory
-            acc_price = getattr(accessory, "base_price", 0)
-            acc_total = acc_price * acc.quantity
-
-            BOQItem.objects.create(
-                boq=boq,
-                area=area,
-                item_type="ACCESSORY",
-                accessory=accessory,
-                quantity=acc.quantity,
-                unit_price=acc_price,
-                markup_pct=0,
-                final_price=acc_total,
-            )
+    # Header totals straight from the rows just built (no re-aggregation)
+    save_boq_totals(boq, compute_totals_from_items(items))
 
     # -----------------------------
     # 7. RETURN RESULT
@@ -521,28 +643,31 @@ def get_boq_summary(boq):
     if not boq:
         return None
 
-    # 🔥 cumulative items
-    items = BOQItem.objects.filter(
-        boq__project=boq.project,
-        boq__version__lte=boq.version
-    ).values("item_type").annotate(
-        total_qty=Sum("quantity"),
-        total_value=Sum("final_price")
-    )
+    # 🔥 cumulative totals: one running-total row per item type
+    cumulative = get_cumulative_totals(boq)
 
     summary = {}
-    for item in items:
-        summary[item["item_type"]] = {
-            "quantity": item["total_qty"],
-            "amount": float(item["total_value"] or 0)
-        }
+    for item_type in ITEM_TYPE_FIELDS:
+        quantity, amount, _ = cumulative.get(item_type, (0, 0, 0))
+        if quantity or amount:
+            summary[item_type] = {
+                "quantity": quantity,
+                "amount": float(amount)
+            }
+
+    subtotal = sum(base for _, _, base in cumulative.values())
+    grand_total = sum(amount for _, amount, _ in cumulative.values())
 
     return {
-        "project_id": boq.project.id,
+        "project_id": boq.project_id,
         "boq_id": boq.id,
         "version": boq.version,
         "status": boq.status,
         "summary": summary,
+        "subtotal": float(subtotal),
+        "margin_percent": float(boq.margin_percent),
+        "margin_amount": float(grand_total - subtotal),
+        "grand_total": float(grand_total),
         "created_at": boq.created_at,
         "source_configuration_version": boq.source_configuration_version
     }
@@ -552,45 +677,218 @@ def get_project_boq_summary(project):
     boq = BOQ.objects.filter(project=project).order_by("-version").first()
     return get_boq_summary(boq)
 
-def approve_boq(boq):
+def approve_boq(boq, user=None):
     if boq.status != "DRAFT":
         raise ValidationError("Already finalized")
     boq.status = "FINAL"
     boq.locked_at = timezone.now()
     boq.save()
+
+    record_audit(
+        "BOQ_APPROVED",
+        user=user,
+        details={"boq_id": boq.id, "version": boq.version}
+    )
+
+    # FINAL BOQs are immutable: pre-render the export cache off the request path.
+    from apps.boq.services.jobs import schedule_export_warmup
+    schedule_export_warmup(boq, user)
     return boq
 
-def apply_margin_to_boq(boq, markup_pct):
+def apply_margin_to_boq(boq, markup_pct, item_type_margins=None, area_margins=None, user=None):
+    """
+    Apply margins to every item of a DRAFT BOQ in one set-based UPDATE.
+
+    - markup_pct: global markup (%)
+    - item_type_margins: {"PRODUCT": pct, ...} overrides the global markup
+    - area_margins: {area_id: pct} overrides both (see services.margins)
+
+    final_price = ROUND(unit_price * quantity * (1 + markup / 100), 2) is
+    computed by the database. No per-row save() runs, so a single
+    MARGIN_APPLIED audit entry summarizes the change.
+    """
     if boq.status != "DRAFT":
         raise ValidationError("Cannot modify FINAL BOQ")
-    markup_pct = Decimal(markup_pct)
-    for item in boq.items.all():
-        item.markup_pct = markup_pct
-        item.final_price = Decimal(item.unit_price) * Decimal(item.quantity) * (Decimal(1) + markup_pct / Decimal(100))
-        item.save(update_fields=["markup_pct", "final_price"])
+
+    markup_pct, item_type_margins, area_margins = normalize_margin_rules(
+        markup_pct, item_type_margins, area_margins
+    )
+    markup = markup_expression(markup_pct, item_type_margins, area_margins)
+
+    with transaction.atomic():
+        updated = BOQItem.objects.filter(boq=boq).update(
+            markup_pct=markup,
+            final_price=final_price_expression(markup),
+        )
+        refresh_boq_totals(boq, margin_percent=markup_pct)
+
+    record_audit(
+        "MARGIN_APPLIED",
+        user=user,
+        details={
+            "boq_id": boq.id,
+            "version": boq.version,
+            "markup_pct": float(markup_pct),
+            "item_type_margins": {k: float(v) for k, v in item_type_margins.items()},
+            "area_margins": {str(k): float(v) for k, v in area_margins.items()},
+            "items_updated": updated,
+            "grand_total": float(boq.grand_total),
+        }
+    )
     return boq
 
+def boq_item_reference(boq_item):
+    """Human-readable reference of a BOQ item for audit logs"""
+    if boq_item.item_type == "PRODUCT" and boq_item.product:
+        return f"Product: {boq_item.product.make} ({boq_item.product.order_code})"
+    elif boq_item.item_type == "DRIVER" and boq_item.driver:
+        return f"Driver: {boq_item.driver.driver_code}"
+    elif boq_item.item_type == "ACCESSORY" and boq_item.accessory:
+        return f"Accessory: {boq_item.accessory.accessory_name}"
+    else:
+        return f"BOQ Item {boq_item.id}"
+
+
+def bulk_update_item_prices(updates, user=None):
+    """
+    Override the unit price of many items of one DRAFT BOQ at once.
+
+    Args:
+        updates: [{"id": item_id, "unit_price": Decimal}, ...]
+
+    All rows change in a single UPDATE (CASE on id); final_price keeps
+    each item's markup. One consolidated audit entry is written.
+
+    Returns:
+        (boq, per-item result dicts)
+    """
+    prices = {entry["id"]: Decimal(entry["unit_price"]) for entry in updates}
+
+    items = list(
+        BOQItem.objects.filter(id__in=prices)
+        .select_related("boq", "area", "product", "driver", "accessory")
+        .order_by("id")
+    )
+    missing = sorted(set(prices) - {item.id for item in items})
+    if missing:
+        raise ValidationError(f"BOQ items not found: {missing}")
+
+    boq_ids = {item.boq_id for item in items}
+    if len(boq_ids) > 1:
+        raise ValidationError("All items must belong to the same BOQ")
+
+    boq = items[0].boq
+    if boq.status != "DRAFT":
+        raise ValidationError("Approved BOQ cannot be modified")
+
+    new_price = Case(
+        *[When(id=item_id, then=Value(price)) for item_id, price in prices.items()],
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+    with transaction.atomic():
+        BOQItem.objects.filter(id__in=prices).update(
+            unit_price=new_price,
+            final_price=final_price_expression(F("markup_pct"), unit_price=new_price),
+        )
+        final_prices = dict(
+            BOQItem.objects.filter(id__in=prices).values_list("id", "final_price")
+        )
+
+        results = []
+        for item in items:
+            results.append({
+                "boq_item_id": item.id,
+                "item_reference": boq_item_reference(item),
+                "area_name": item.area.name if item.area else "Unknown",
+                "quantity": item.quantity,
+                "old_unit_price": float(item.unit_price),
+                "new_unit_price": float(prices[item.id]),
+                "old_final_price": float(item.final_price),
+                "new_final_price": float(final_prices[item.id]),
+            })
+
+        refresh_boq_totals(boq)
+
+    record_audit(
+        "BULK PRICE UPDATE",
+        user=user,
+        details={
+            "boq_id": boq.id,
+            "version": boq.version,
+            "items_updated": len(results),
+            "items": results,
+        }
+    )
+    return boq, results
+
+
 class BOQExcelBuilder:
-    def __init__(self, boq):
+    """
+    Write-only workbook: rows are streamed to the sheet as soon as they
+    are complete and every styled cell shares one NamedStyle per
+    (bold, align, currency) combination, so memory stays flat for large
+    BOQs. Cells may still be written in any column order within the
+    current row; `self.row` only ever moves forward.
+    """
+    export_format = "xlsx"
+    content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    # Bump whenever the sheet layout changes (invalidates cached exports).
+    template_revision = 2
+
+    CURRENCY_FORMAT = '₹#,##0.00'
+
+    def __init__(self, boq, progress=None):
         self.boq = boq
-        self.wb = openpyxl.Workbook()
-        self.ws = self.wb.active
-        self.ws.title = "BOQ"
+        # Optional callback: progress(sections_done, sections_total)
+        self.progress = progress
+        self.wb = openpyxl.Workbook(write_only=True)
+        self.ws = self.wb.create_sheet("BOQ")
+        for col in range(1, 8): self.ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = 20
         self.row = 1
+        self._written_rows = 0
+        self._pending = {}
+        self._styles = {}
 
     def money(self, value): return float(round(Decimal(value), 2))
-    def bold(self): return openpyxl.styles.Font(bold=True)
-    def center(self): return openpyxl.styles.Alignment(horizontal="center")
-    def right(self): return openpyxl.styles.Alignment(horizontal="right")
+    def center(self): return "center"
+    def right(self): return "right"
+
+    def style(self, bold=False, align=None, currency=False):
+        """Shared named style for a formatting combination (registered once)."""
+        key = (bold, align, currency)
+        if key not in self._styles:
+            name = "boq_" + "_".join(filter(None, ["bold" if bold else "", align, "currency" if currency else ""]))
+            named = openpyxl.styles.NamedStyle(name=name)
+            if bold: named.font = openpyxl.styles.Font(bold=True)
+            if align: named.alignment = openpyxl.styles.Alignment(horizontal=align)
+            if currency: named.number_format = self.CURRENCY_FORMAT
+            self.wb.add_named_style(named)
+            self._styles[key] = name
+        return self._styles[key]
 
     def write(self, col, value, bold=False, align=None, currency=False):
-        cell = self.ws.cell(row=self.row, column=col, value=value)
-        if bold: cell.font = self.bold()
-        if align: cell.alignment = align
-        if currency: cell.number_format = '₹#,##0.00'
+        if self._pending and self._pending_row != self.row: self.flush()
+        self._pending_row = self.row
+        cell = openpyxl.cell.WriteOnlyCell(self.ws, value=value)
+        if bold or align or currency: cell.style = self.style(bold, align, currency)
+        self._pending[col] = cell
         return cell
 
-    def build(self):
+    def flush(self):
+        """Append the buffered row, padding skipped rows with empty ones."""
+        if not self._pending: return
+        while self._written_rows < self._pending_row - 1:
+            self.ws.append([])
+            self._written_rows += 1
+        self.ws.append([self._pending.get(col) for col in range(1, max(self._pending) + 1)])
+        self._written_rows += 1
+        self._pending = {}
+
+    def filename(self):
+        return f"BOQ_{self.boq.project.name}_V{self.boq.version}.xlsx"
+
+    def render(self, fileobj):
         if self.boq.status != "FINAL": raise ValidationError("Excel export is allowed only for FINAL BOQ")
         self.write(1, "TVUM TECH", bold=True)
         self.row += 1
@@ -600,17 +898,17 @@ class BOQExcelBuilder:
         self.write(5, "Version:", bold=True); self.write(6, self.boq.version)
         self.row += 1
         self.write(1, "Status:", bold=True); self.write(2, self.boq.status)
-        self.write(5, "Date:", bold=True); self.write(6, date.today().strftime("%d-%m-%Y"))
+        self.write(5, "Date:", bold=True); self.write(6, document_date(self.boq).strftime("%d-%m-%Y"))
         self.row += 2
         grand_total = Decimal(0)
-        areas = self.boq.items.select_related("area").order_by("area__name").values_list("area__id", "area__name").distinct()
-        for area_id, area_name in areas:
-            self.write(1, f"Area: {area_name}", bold=True); self.row += 1
+        dataset = load_render_dataset(self.boq, order_by_area_name=True)
+        for index, section in enumerate(dataset, start=1):
+            self.write(1, f"Area: {section.area_name}", bold=True); self.row += 1
             headers = ["Type", "Item Code", "Description", "Qty", "Unit Price (₹)", "Margin (%)", "Line Total (₹)"]
             for col, h in enumerate(headers, start=1): self.write(col, h, bold=True, align=self.center())
             self.row += 1
             area_total = Decimal(0)
-            for item in self.boq.items.filter(area_id=area_id):
+            for item in section.items:
                 qty = Decimal(item.quantity)
                 unit_price = Decimal(item.unit_price or 0)
                 margin = Decimal(item.markup_pct or 0)
@@ -619,7 +917,7 @@ class BOQExcelBuilder:
                 grand_total += line_total
                 desc = "-"
                 if item.item_type == "PRODUCT" and item.product: desc = item.product.make
-                elif item.item_type == "DRIVER" and item.driver: desc = item.driver.driver_type
+                elif item.item_type == "DRIVER" and item.driver: desc = item.driver.constant_type
                 elif item.item_type == "ACCESSORY" and item.accessory: desc = item.accessory.accessory_type
                 self.write(1, item.item_type)
                 self.write(2, item.product.order_code if item.product else "-")
@@ -632,10 +930,18 @@ class BOQExcelBuilder:
             self.write(6, "Area Total", bold=True, align=self.right())
             self.write(7, self.money(area_total), bold=True, currency=True)
             self.row += 2
+            if self.progress: self.progress(index, len(dataset))
         self.write(6, "Grand Total", bold=True, align=self.right())
         self.write(7, self.money(grand_total), bold=True, currency=True)
-        for col in range(1, 8): self.ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = 20
-        response = HttpResponse(content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-        response["Content-Disposition"] = f'attachment; filename="BOQ_{self.boq.project.name}_V{self.boq.version}.xlsx"'
-        self.wb.save(response)
-        return response
\ No newline at end of file
+        self.flush()
+        self.wb.save(fileobj)
+
+    def build(self):
+        response = HttpResponse(content_type=self.content_type)
+        response["Content-Disposition"] = f'attachment; filename="{self.filename()}"'
+        self.render(response)
+        return response
+
+    def stream(self):
+        """Render into a spooled temp file and serve it in chunks."""
+        return spooled_export_response(self, f"xlsx boq={self.boq.id}")
\ No newline at end of file
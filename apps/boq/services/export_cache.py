@@ -0,0 +1,129 @@
+"""
+BOQ Export Cache
+================
+Disk cache of rendered FINAL BOQ documents (PDF / Excel).
+
+Key Concepts:
+- A FINAL BOQ is locked, so its rendered document only changes when the
+  builder layout changes (template_revision)
+- Entries are content-addressed: sha256(boq id, version, format, revision)
+- Filled on first export or by the export jobs queued on approval
+  (apps.boq.services.jobs.schedule_export_warmup), served as a FileResponse so the
+  WSGI server can use sendfile
+- Least-recently-used entries are evicted once the cache grows beyond
+  settings.BOQ_EXPORT_CACHE_MAX_BYTES
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse
+
+
+class BOQExportCache:
+    def __init__(self, root=None, max_bytes=None):
+        self.root = Path(root or settings.BOQ_EXPORT_CACHE_DIR)
+        self.max_bytes = (
+            max_bytes if max_bytes is not None
+            else settings.BOQ_EXPORT_CACHE_MAX_BYTES
+        )
+
+    @staticmethod
+    def cache_key(boq, export_format, template_revision):
+        raw = f"{boq.id}:{boq.version}:{export_format}:{template_revision}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def path_for(self, key, export_format):
+        return self.root / f"{key}.{export_format}"
+
+    def open(self, key, export_format):
+        """
+        Open a cached entry for reading and mark it as recently used.
+
+        Returns:
+            file object, or None on a cache miss
+        """
+        path = self.path_for(key, export_format)
+        try:
+            handle = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return handle
+
+    def store(self, key, export_format, render):
+        """
+        Render a new entry through `render(fileobj)` and return it opened.
+
+        The document is written to a temp file first and renamed into
+        place, so readers never see a partially written entry.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.path_for(key, export_format)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                render(tmp)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # Open before evicting so the fresh entry survives even if it
+        # alone exceeds the size budget.
+        handle = open(path, "rb")
+        self.evict()
+        return handle
+
+    def evict(self):
+        """Drop least-recently-used entries until under max_bytes."""
+        entries = []
+        for path in self.root.glob("*.*"):
+            if path.suffix == ".part":
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def fetch(self, builder):
+        """Return the cached document for `builder`, rendering it on a miss."""
+        key = self.cache_key(builder.boq, builder.export_format, builder.template_revision)
+        handle = self.open(key, builder.export_format)
+        if handle is None:
+            handle = self.store(key, builder.export_format, builder.render)
+        return handle
+
+
+def get_export_cache():
+    return BOQExportCache()
+
+
+def cached_export_response(builder):
+    """
+    FileResponse for a FINAL BOQ document, rendered once and then served
+    from the export cache.
+    """
+    handle = get_export_cache().fetch(builder)
+    return FileResponse(
+        handle,
+        as_attachment=True,
+        filename=builder.filename(),
+        content_type=builder.content_type,
+    )
@@ -0,0 +1,69 @@
+"""
+Export Metrics
+==============
+Render time and peak memory reporting for BOQ document exports.
+
+Peak memory is measured with `tracemalloc` (Python heap only) and is
+only collected when settings.BOQ_EXPORT_TRACE_MEMORY is enabled, since
+tracing slows rendering down noticeably.
+"""
+
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExportMetrics:
+    def __init__(self, label):
+        self.label = label
+        self.render_ms = None
+        self.peak_memory_kb = None
+
+    def apply_headers(self, response):
+        """Expose the metrics on the HTTP response."""
+        response["X-Render-Time-Ms"] = str(self.render_ms)
+        if self.peak_memory_kb is not None:
+            response["X-Render-Peak-Memory-Kb"] = str(self.peak_memory_kb)
+        return response
+
+
+@contextmanager
+def measure_export(label):
+    """
+    Usage:
+        with measure_export("pdf boq=12") as metrics:
+            builder.render(fileobj)
+        metrics.apply_headers(response)
+    """
+    metrics = ExportMetrics(label)
+
+    # Never hijack a trace somebody else started.
+    trace_memory = (
+        getattr(settings, "BOQ_EXPORT_TRACE_MEMORY", False)
+        and not tracemalloc.is_tracing()
+    )
+    if trace_memory:
+        tracemalloc.start()
+
+    started = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.render_ms = round((time.perf_counter() - started) * 1000)
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            metrics.peak_memory_kb = peak // 1024
+
+        logger.info(
+            "BOQ export %s rendered in %sms (peak memory: %s KB)",
+            metrics.label,
+            metrics.render_ms,
+            metrics.peak_memory_kb if metrics.peak_memory_kb is not None else "n/a",
+        )
@@ -0,0 +1,324 @@
+"""
+BOQ Job Queue
+=============
+DB-backed background jobs for BOQ generation and document exports.
+
+Key Concepts:
+- The API only enqueues a BOQJob row; heavy work runs outside the
+  request worker
+- Workers (`manage.py run_boq_worker`) claim jobs with a conditional
+  UPDATE, so several workers never run the same job
+- A claimed job holds a lease (BOQ_JOB_LEASE_SECONDS), renewed on every
+  progress report. RUNNING jobs with an expired lease (crashed worker)
+  are requeued, or failed after BOQ_JOB_MAX_ATTEMPTS
+- settings.BOQ_JOB_BACKEND selects how queued jobs are executed:
+    "worker" - picked up by the worker command (default)
+    "thread" - run in a daemon thread of the current process
+    "inline" - run synchronously on enqueue (tests / development only:
+               blocks the request for the whole render)
+- FINAL exports are served from the export cache; DRAFT exports are
+  written to settings.BOQ_JOB_OUTPUT_DIR and deleted after
+  BOQ_JOB_OUTPUT_TTL seconds
+"""
+
+import logging
+import os
+import threading
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.boq.models import BOQJob
+from apps.boq.services.boq_service import (
+    BOQPDFBuilder,
+    BOQExcelBuilder,
+    generate_boq,
+)
+from apps.boq.services.export_cache import get_export_cache
+from apps.common.audit import record_audit
+
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------------
+# ENQUEUE / CLAIM
+# -------------------------------
+def enqueue_job(kind, user, project=None, boq=None):
+    job = BOQJob.objects.create(
+        kind=kind,
+        project=project or (boq.project if boq else None),
+        boq=boq,
+        requested_by=user if user and user.is_authenticated else None,
+    )
+
+    backend = job_backend()
+    if backend == "inline":
+        run_job(job)
+    elif backend == "thread":
+        transaction.on_commit(
+            lambda: threading.Thread(
+                target=_run_job_in_thread, args=(job.pk,), daemon=True
+            ).start()
+        )
+    return job
+
+
+def job_backend():
+    return getattr(settings, "BOQ_JOB_BACKEND", "worker")
+
+
+def _lease_deadline():
+    return timezone.now() + timedelta(seconds=getattr(settings, "BOQ_JOB_LEASE_SECONDS", 300))
+
+
+def schedule_export_warmup(boq, user=None):
+    """
+    Queue PDF / Excel jobs rendering a FINAL BOQ into the export cache
+    once the approval commits. Skipped with the inline backend, where the
+    jobs would run inside the approve request: the cache then fills on
+    the first export instead.
+    """
+    if job_backend() == "inline":
+        return
+
+    def enqueue():
+        for kind in ("EXPORT_PDF", "EXPORT_EXCEL"):
+            enqueue_job(kind, user, boq=boq)
+
+    transaction.on_commit(enqueue)
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest QUEUED job to RUNNING.
+    Jobs abandoned by crashed workers are reclaimed first.
+
+    Returns:
+        BOQJob or None when the queue is empty
+    """
+    reclaim_stale_jobs()
+    while True:
+        job = (
+            BOQJob.objects.filter(status="QUEUED")
+            .order_by("created_at", "id")
+            .first()
+        )
+        if job is None:
+            return None
+
+        claimed = BOQJob.objects.filter(pk=job.pk, status="QUEUED").update(
+            status="RUNNING",
+            started_at=timezone.now(),
+            lease_expires_at=_lease_deadline(),
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+        # Another worker won the race; try the next job.
+
+
+def reclaim_stale_jobs():
+    """
+    Requeue RUNNING jobs whose lease expired, or fail them once they
+    used up BOQ_JOB_MAX_ATTEMPTS.
+
+    Returns:
+        (requeued, failed) counts
+    """
+    now = timezone.now()
+    stale = BOQJob.objects.filter(status="RUNNING", lease_expires_at__lt=now)
+    max_attempts = getattr(settings, "BOQ_JOB_MAX_ATTEMPTS", 3)
+
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status="FAILED",
+        message="Worker stopped responding",
+        finished_at=now,
+        lease_expires_at=None,
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(
+        status="QUEUED",
+        message="Requeued after worker timeout",
+        lease_expires_at=None,
+    )
+    return requeued, failed
+
+
+def purge_expired_job_outputs():
+    """
+    Delete DRAFT export files older than BOQ_JOB_OUTPUT_TTL.
+
+    Returns:
+        number of files removed
+    """
+    expired = BOQJob.objects.filter(finished_at__lt=_output_cutoff()).exclude(output_file="")
+
+    removed = 0
+    for job in expired.only("pk", "output_file"):
+        remove_job_output(job)
+        removed += 1
+    return removed
+
+
+def _output_cutoff():
+    return timezone.now() - timedelta(seconds=getattr(settings, "BOQ_JOB_OUTPUT_TTL", 24 * 60 * 60))
+
+
+def job_output_expired(job):
+    return job.finished_at is not None and job.finished_at < _output_cutoff()
+
+
+def remove_job_output(job):
+    try:
+        os.remove(job.output_file)
+    except FileNotFoundError:
+        pass
+    BOQJob.objects.filter(pk=job.pk).update(output_file="")
+    job.output_file = ""
+
+
+# -------------------------------
+# EXECUTION
+# -------------------------------
+def run_job(job):
+    """Execute a job and record its outcome. Never raises."""
+    if job.status == "QUEUED":
+        job.status = "RUNNING"
+        job.started_at = timezone.now()
+        job.lease_expires_at = _lease_deadline()
+        job.attempts += 1
+        job.save(update_fields=["status", "started_at", "lease_expires_at", "attempts"])
+
+    try:
+        JOB_HANDLERS[job.kind](job)
+    except Exception as e:
+        logger.exception("BOQ job %s failed", job.pk)
+        message = e.message if isinstance(e, ValidationError) and hasattr(e, "message") else str(e)
+        _finish(job, "FAILED", message=message[:255])
+    else:
+        _finish(job, "SUCCEEDED", message=job.message)
+    return job
+
+
+def _run_job_in_thread(job_id):
+    try:
+        job = BOQJob.objects.get(pk=job_id)
+        run_job(job)
+    finally:
+        close_old_connections()
+
+
+def _finish(job, status, message=""):
+    job.status = status
+    job.message = message
+    job.finished_at = timezone.now()
+    job.lease_expires_at = None
+    if status == "SUCCEEDED":
+        job.progress = 100
+    job.save(update_fields=[
+        "status", "message", "finished_at", "progress",
+        "boq", "result", "output_file", "lease_expires_at",
+    ])
+
+
+def report_progress(job, percent, message=""):
+    """Persist progress (and renew the lease) without touching the rest of the row."""
+    job.progress = max(0, min(100, int(percent)))
+    job.message = message[:255]
+    job.lease_expires_at = _lease_deadline()
+    BOQJob.objects.filter(pk=job.pk).update(
+        progress=job.progress,
+        message=job.message,
+        lease_expires_at=job.lease_expires_at,
+    )
+
+
+def _section_progress(job, label):
+    """Builder callback mapping rendered sections to 5-95 %."""
+    def callback(done, total):
+        report_progress(job, 5 + 90 * done / max(total, 1), f"{label}: {done}/{total} areas")
+    return callback
+
+
+# -------------------------------
+# HANDLERS
+# -------------------------------
+def _handle_generate(job):
+    report_progress(job, 5, "Generating BOQ")
+    boq = generate_boq(job.project, job.requested_by)
+
+    record_audit(
+        "BOQ_GENERATED",
+        user=job.requested_by,
+        details={"boq_id": boq.id, "version": boq.version}
+    )
+
+    job.boq = boq
+    job.result = {"boq_id": boq.id, "version": boq.version}
+    job.message = f"BOQ v{boq.version} generated"
+
+
+def _handle_export(job, builder):
+    boq = job.boq
+    label = builder.export_format.upper()
+    report_progress(job, 5, f"{label}: rendering")
+
+    if boq.status == "FINAL":
+        # Immutable: render straight into the shared export cache.
+        get_export_cache().fetch(builder).close()
+    else:
+        output_dir = Path(settings.BOQ_JOB_OUTPUT_DIR)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / f"job_{job.pk}.{builder.export_format}"
+        with open(path, "wb") as fileobj:
+            builder.render(fileobj)
+        job.output_file = str(path)
+
+    job.result = {"boq_id": boq.id, "filename": builder.filename()}
+    job.message = f"{label} ready"
+
+
+def _handle_export_pdf(job):
+    boq = job.boq
+    is_draft = boq.status == "DRAFT"
+    if is_draft:
+        # Audit log mandatory for draft export
+        record_audit(
+            "EXPORT_DRAFT_BOQ",
+            user=job.requested_by,
+            details={"boq_id": boq.id, "version": boq.version}
+        )
+    _handle_export(job, BOQPDFBuilder(
+        boq,
+        is_draft=is_draft,
+        progress=_section_progress(job, "PDF"),
+    ))
+
+
+def _handle_export_excel(job):
+    _handle_export(job, BOQExcelBuilder(
+        job.boq,
+        progress=_section_progress(job, "XLSX"),
+    ))
+
+
+JOB_HANDLERS = {
+    "GENERATE": _handle_generate,
+    "EXPORT_PDF": _handle_export_pdf,
+    "EXPORT_EXCEL": _handle_export_excel,
+}
+
+
+def job_builder(job):
+    """Document builder matching an export job (used for downloads)."""
+    if job.kind == "EXPORT_PDF":
+        return BOQPDFBuilder(job.boq, is_draft=job.boq.status == "DRAFT")
+    if job.kind == "EXPORT_EXCEL":
+        return BOQExcelBuilder(job.boq)
+    return None
@@ -0,0 +1,107 @@
+"""
+BOQ Margin Rules
+================
+Resolution of the markup percentage that applies to a BOQ item.
+
+Precedence (most specific wins):
+1. area_margins[item.area_id]
+2. item_type_margins[item.item_type]
+3. markup_pct (global)
+
+The same rules are used by the set-based UPDATE (apply_margin_to_boq)
+and by the what-if simulation, so both always agree.
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Round
+
+from apps.boq.services.totals import ITEM_TYPE_FIELDS
+
+
+# BOQItem.markup_pct is DECIMAL(5, 2)
+MIN_MARKUP = Decimal("-100")
+MAX_MARKUP = Decimal("999.99")
+
+MARKUP_FIELD = DecimalField(max_digits=5, decimal_places=2)
+PRICE_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+def parse_markup(value, label="markup_pct"):
+    try:
+        markup = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ValidationError(f"{label} must be a number")
+    if not markup.is_finite() or not MIN_MARKUP <= markup <= MAX_MARKUP:
+        raise ValidationError(f"{label} must be between {MIN_MARKUP} and {MAX_MARKUP}")
+    return markup.quantize(Decimal("0.01"))
+
+
+def normalize_margin_rules(markup_pct, item_type_margins=None, area_margins=None):
+    """
+    Validate margin input (e.g. straight from request.data).
+
+    Returns:
+        (markup_pct, {item_type: pct}, {area_id: pct})
+    """
+    markup_pct = parse_markup(markup_pct)
+    for label, rules in (("item_type_margins", item_type_margins), ("area_margins", area_margins)):
+        if rules is not None and not isinstance(rules, dict):
+            raise ValidationError(f"{label} must be an object")
+
+    by_type = {}
+    for item_type, value in (item_type_margins or {}).items():
+        item_type = str(item_type).upper()
+        if item_type not in ITEM_TYPE_FIELDS:
+            raise ValidationError(f"Unknown item type: {item_type}")
+        by_type[item_type] = parse_markup(value, f"item_type_margins[{item_type}]")
+
+    by_area = {}
+    for area_id, value in (area_margins or {}).items():
+        try:
+            area_id = int(area_id)
+        except (TypeError, ValueError):
+            raise ValidationError(f"Invalid area id: {area_id}")
+        by_area[area_id] = parse_markup(value, f"area_margins[{area_id}]")
+
+    return markup_pct, by_type, by_area
+
+
+def resolve_markup(markup_pct, item_type_margins, area_margins, item_type, area_id):
+    """Python twin of markup_expression() for a single item."""
+    if area_id in area_margins:
+        return area_margins[area_id]
+    return item_type_margins.get(item_type, markup_pct)
+
+
+def markup_expression(markup_pct, item_type_margins, area_margins):
+    whens = [
+        When(area_id=area_id, then=Value(pct))
+        for area_id, pct in area_margins.items()
+    ] + [
+        When(item_type=item_type, then=Value(pct))
+        for item_type, pct in item_type_margins.items()
+    ]
+    if not whens:
+        return Value(markup_pct, output_field=MARKUP_FIELD)
+    return Case(*whens, default=Value(markup_pct), output_field=MARKUP_FIELD)
+
+
+def final_price_expression(markup, unit_price=None):
+    """
+    ROUND(unit_price * quantity * (1 + markup / 100), 2)
+
+    `unit_price` defaults to the stored column; pass the new value when
+    it is changed by the same UPDATE (SET expressions see the old row).
+
+    Written as (100 + markup) * 0.01: SQLite casts whole-number decimals
+    to INTEGER, so dividing by 100 would truncate.
+    """
+    return Round(
+        (F("unit_price") if unit_price is None else unit_price) * F("quantity")
+        * (Value(Decimal(100)) + markup) * Value(Decimal("0.01")),
+        2,
+        output_field=PRICE_FIELD,
+    )
@@ -0,0 +1,44 @@
+"""
+BOQ Render Dataset
+==================
+Shared data loader for the BOQ document builders (PDF / Excel).
+
+All items of a BOQ are fetched in ONE query with their product, driver,
+accessory and area joined in, then grouped by area in memory. Builders
+iterate the sections instead of querying per area / per row.
+"""
+
+from collections import namedtuple
+
+
+AreaSection = namedtuple("AreaSection", ["area_id", "area_name", "items"])
+
+
+def load_render_dataset(boq, order_by_area_name=False):
+    """
+    Returns:
+        list[AreaSection]: one section per area, items in id order.
+        Sections keep first-seen order unless `order_by_area_name` is set
+        (project-level items, area=None, sort first like SQL NULLs).
+    """
+    items = (
+        boq.items
+        .select_related("product", "driver", "accessory", "area")
+        .order_by("id")
+    )
+
+    sections = {}
+    for item in items:
+        section = sections.get(item.area_id)
+        if section is None:
+            section = sections[item.area_id] = AreaSection(
+                item.area_id,
+                item.area.name if item.area else None,
+                [],
+            )
+        section.items.append(item)
+
+    dataset = list(sections.values())
+    if order_by_area_name:
+        dataset.sort(key=lambda s: (s.area_name is not None, s.area_name or ""))
+    return dataset
@@ -0,0 +1,272 @@
+"""
+BOQ Totals Service
+==================
+Maintains the denormalized totals stored on the BOQ header and the
+per-version running totals (BOQCumulativeTotal).
+
+Definitions (per BOQ):
+- <type>_quantity = SUM(quantity)      for item_type = <type>
+- <type>_amount   = SUM(final_price)   for item_type = <type>
+- subtotal        = SUM(unit_price * quantity)   (before margin)
+- grand_total     = SUM(final_price)             (after margin)
+- margin_amount   = grand_total - subtotal
+- margin_percent  = last global markup applied to the BOQ
+
+Cumulative totals (per BOQ version v, per item type):
+- the sums above over every BOQ of the project with version <= v
+- created from the previous version's rows when a BOQ is generated,
+  then shifted by the change delta for all versions >= v on every edit
+- a cumulative summary therefore reads 3 rows instead of rescanning
+  the items of every earlier version
+
+Every code path that changes BOQ items must call one of the refresh
+functions inside the same transaction.
+"""
+
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+from apps.boq.models import BOQ, BOQItem, BOQCumulativeTotal
+
+
+TWO_PLACES = Decimal("0.01")
+
+ITEM_TYPE_FIELDS = {
+    "PRODUCT": ("product_quantity", "product_amount"),
+    "DRIVER": ("driver_quantity", "driver_amount"),
+    "ACCESSORY": ("accessory_quantity", "accessory_amount"),
+}
+
+# Per-type amount before margin; only kept on the cumulative rows
+ITEM_TYPE_BASE_FIELDS = {
+    "PRODUCT": "product_base_amount",
+    "DRIVER": "driver_base_amount",
+    "ACCESSORY": "accessory_base_amount",
+}
+
+TOTAL_FIELDS = [
+    field for pair in ITEM_TYPE_FIELDS.values() for field in pair
+] + ["subtotal", "margin_amount", "grand_total"]
+
+
+def _empty_totals():
+    totals = {field: Decimal(0) for field in TOTAL_FIELDS}
+    for quantity_field, _ in ITEM_TYPE_FIELDS.values():
+        totals[quantity_field] = 0
+    for base_field in ITEM_TYPE_BASE_FIELDS.values():
+        totals[base_field] = Decimal(0)
+    return totals
+
+
+def _finalize(totals):
+    for field, value in totals.items():
+        if isinstance(value, Decimal):
+            totals[field] = value.quantize(TWO_PLACES)
+    totals["subtotal"] = sum(
+        (totals[base] for base in ITEM_TYPE_BASE_FIELDS.values()), Decimal(0)
+    )
+    totals["grand_total"] = sum(
+        (totals[amount] for _, amount in ITEM_TYPE_FIELDS.values()), Decimal(0)
+    )
+    totals["margin_amount"] = totals["grand_total"] - totals["subtotal"]
+    return totals
+
+
+def _item_type_aggregates(queryset, *group_by):
+    """SUM(quantity), SUM(final_price), SUM(unit_price * quantity) per group."""
+    return queryset.values(*group_by, "item_type").annotate(
+        total_qty=Sum("quantity"),
+        total_value=Sum("final_price"),
+        base_value=Sum(ExpressionWrapper(
+            F("unit_price") * F("quantity"),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        )),
+    )
+
+
+def compute_totals_from_items(items):
+    """Totals for in-memory BOQItem objects (e.g. right before bulk_create)."""
+    totals = _empty_totals()
+    for item in items:
+        quantity_field, amount_field = ITEM_TYPE_FIELDS[item.item_type]
+        totals[quantity_field] += item.quantity
+        totals[amount_field] += Decimal(item.final_price or 0)
+        totals[ITEM_TYPE_BASE_FIELDS[item.item_type]] += (
+            Decimal(item.unit_price or 0) * item.quantity
+        )
+    return _finalize(totals)
+
+
+def compute_boq_totals(boq):
+    """Totals for a saved BOQ, aggregated in SQL (one query)."""
+    totals = _empty_totals()
+    for row in _item_type_aggregates(BOQItem.objects.filter(boq=boq)):
+        quantity_field, amount_field = ITEM_TYPE_FIELDS[row["item_type"]]
+        totals[quantity_field] = row["total_qty"] or 0
+        totals[amount_field] = Decimal(row["total_value"] or 0)
+        totals[ITEM_TYPE_BASE_FIELDS[row["item_type"]]] = Decimal(row["base_value"] or 0)
+    return _finalize(totals)
+
+
+def save_boq_totals(boq, totals, margin_percent=None):
+    """Persist header totals and shift the cumulative rows by the change."""
+    values = {field: totals[field] for field in TOTAL_FIELDS}
+    if margin_percent is not None:
+        values["margin_percent"] = margin_percent
+    # Derived data only: a plain UPDATE skips the save signals (audit trail)
+    BOQ.objects.filter(pk=boq.pk).update(**values)
+    for field, value in values.items():
+        setattr(boq, field, value)
+
+    _apply_cumulative_delta(boq, totals)
+    return boq
+
+
+def refresh_boq_totals(boq, margin_percent=None):
+    """Recompute the header totals from the BOQ items and persist them."""
+    return save_boq_totals(boq, compute_boq_totals(boq), margin_percent)
+
+
+def stored_boq_totals(boq):
+    return {field: getattr(boq, field) for field in TOTAL_FIELDS}
+
+
+# -------------------------------
+# CUMULATIVE TOTALS
+# -------------------------------
+ZERO_TOTAL = (0, Decimal(0), Decimal(0))
+
+
+def _as_tuple(row):
+    if row is None:
+        return ZERO_TOTAL
+    return (row.quantity, row.amount, row.base_amount)
+
+
+def _apply_cumulative_delta(boq, totals):
+    # Rows of this version and the one before it, in a single query
+    recent = (
+        BOQCumulativeTotal.objects.filter(
+            boq__project_id=boq.project_id,
+            boq__version__lte=boq.version,
+        )
+        .annotate(version=F("boq__version"))
+        .order_by("-boq__version")[:2 * len(ITEM_TYPE_FIELDS)]
+    )
+    current_rows, previous_rows = {}, {}
+    previous_version = None
+    for row in recent:
+        if row.boq_id == boq.pk:
+            current_rows[row.item_type] = row
+        elif previous_version in (None, row.version):
+            previous_version = row.version
+            previous_rows[row.item_type] = row
+
+    new_totals = {
+        item_type: (
+            totals[quantity_field],
+            totals[amount_field],
+            totals[ITEM_TYPE_BASE_FIELDS[item_type]],
+        )
+        for item_type, (quantity_field, amount_field) in ITEM_TYPE_FIELDS.items()
+    }
+
+    if not current_rows:
+        # Freshly generated BOQ. Versions are append-only, so it is the
+        # latest one: its running total is the previous one plus its own.
+        created = []
+        for item_type, new in new_totals.items():
+            previous = _as_tuple(previous_rows.get(item_type))
+            created.append(BOQCumulativeTotal(
+                boq=boq,
+                item_type=item_type,
+                quantity=previous[0] + new[0],
+                amount=previous[1] + new[1],
+                base_amount=previous[2] + new[2],
+            ))
+        BOQCumulativeTotal.objects.bulk_create(created)
+        return
+
+    # Shift this version and every later one by the change of its own totals
+    for item_type, new in new_totals.items():
+        previous = _as_tuple(previous_rows.get(item_type))
+        current = _as_tuple(current_rows.get(item_type))
+        own = tuple(c - p for c, p in zip(current, previous))
+        quantity, amount, base_amount = (n - o for n, o in zip(new, own))
+        if not (quantity or amount or base_amount):
+            continue
+        BOQCumulativeTotal.objects.filter(
+            boq__project_id=boq.project_id,
+            boq__version__gte=boq.version,
+            item_type=item_type,
+        ).update(
+            quantity=F("quantity") + quantity,
+            amount=F("amount") + amount,
+            base_amount=F("base_amount") + base_amount,
+        )
+
+
+def get_cumulative_totals(boq):
+    """
+    Running totals up to `boq.version` (one query, one row per item type).
+
+    Returns:
+        dict item_type -> (quantity, amount, base_amount)
+    """
+    return {
+        row.item_type: _as_tuple(row)
+        for row in BOQCumulativeTotal.objects.filter(boq=boq)
+    }
+
+
+def compute_cumulative_totals(project_id):
+    """
+    Running totals of every BOQ of a project, recomputed from the items.
+
+    Returns:
+        dict boq_id -> {item_type: (quantity, amount, base_amount)}
+    """
+    per_boq = {}
+    rows = _item_type_aggregates(
+        BOQItem.objects.filter(boq__project_id=project_id), "boq_id"
+    )
+    for row in rows:
+        per_boq.setdefault(row["boq_id"], {})[row["item_type"]] = (
+            row["total_qty"] or 0,
+            Decimal(row["total_value"] or 0).quantize(TWO_PLACES),
+            Decimal(row["base_value"] or 0).quantize(TWO_PLACES),
+        )
+
+    running = {item_type: ZERO_TOTAL for item_type in ITEM_TYPE_FIELDS}
+    result = {}
+    boq_ids = (
+        BOQ.objects.filter(project_id=project_id)
+        .order_by("version")
+        .values_list("id", flat=True)
+    )
+    for boq_id in boq_ids:
+        own = per_boq.get(boq_id, {})
+        for item_type, total in running.items():
+            running[item_type] = tuple(
+                t + o for t, o in zip(total, own.get(item_type, ZERO_TOTAL))
+            )
+        result[boq_id] = dict(running)
+    return result
+
+
+def rebuild_cumulative_totals(project_id):
+    """Replace the cumulative rows of a project with recomputed values."""
+    expected = compute_cumulative_totals(project_id)
+    BOQCumulativeTotal.objects.filter(boq__project_id=project_id).delete()
+    BOQCumulativeTotal.objects.bulk_create([
+        BOQCumulativeTotal(
+            boq_id=boq_id,
+            item_type=item_type,
+            quantity=quantity,
+            amount=amount,
+            base_amount=base_amount,
+        )
+        for boq_id, by_type in expected.items()
+        for item_type, (quantity, amount, base_amount) in by_type.items()
+    ])
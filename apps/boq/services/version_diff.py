@@ -0,0 +1,176 @@
+"""
+BOQ Version Diff
+================
+Server-side comparison of two BOQ versions of a project.
+
+Key Concepts:
+- Each BOQ is a complete snapshot, so its own items are compared
+- Lines are matched on (area, item_type, product/driver/accessory):
+  both sides are loaded once and hash-joined in memory
+- Lines sharing a key (e.g. one driver used by several products of an
+  area) are summed before comparing
+- Results of two FINAL versions never change and are kept in the Django
+  cache, keyed by the version pair
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+
+from apps.boq.models import BOQItem
+
+
+# Bump when the result layout changes to invalidate cached diffs
+DIFF_REVISION = 1
+
+REFERENCE_FIELDS = {
+    "PRODUCT": "product_id",
+    "DRIVER": "driver_id",
+    "ACCESSORY": "accessory_id",
+}
+
+
+def _diff_cache_key(base, target):
+    return f"boq-diff:{DIFF_REVISION}:{base.id}:{base.version}:{target.id}:{target.version}"
+
+
+def _reference(row):
+    if row["item_type"] == "PRODUCT":
+        return f"{row['product__make']} ({row['product__order_code']})"
+    if row["item_type"] == "DRIVER":
+        return row["driver__driver_code"]
+    return row["accessory__accessory_name"]
+
+
+def load_diff_lines(boq):
+    """
+    Lines of one BOQ keyed for the hash join (one query).
+
+    Returns:
+        dict (area_id, item_type, reference_id) -> line dict
+    """
+    rows = BOQItem.objects.filter(boq=boq).values(
+        "area_id", "area__name", "item_type",
+        "product_id", "product__make", "product__order_code",
+        "driver_id", "driver__driver_code",
+        "accessory_id", "accessory__accessory_name",
+        "quantity", "unit_price", "final_price",
+    )
+
+    lines = {}
+    for row in rows:
+        item_type = row["item_type"]
+        key = (row["area_id"], item_type, row[REFERENCE_FIELDS[item_type]])
+        line = lines.get(key)
+        if line is None:
+            line = lines[key] = {
+                "area_id": row["area_id"],
+                "area_name": row["area__name"] or "Unknown",
+                "item_type": item_type,
+                "reference_id": key[2],
+                "reference": _reference(row),
+                "quantity": 0,
+                "unit_price": row["unit_price"],
+                "amount": Decimal(0),
+            }
+        line["quantity"] += row["quantity"]
+        line["amount"] += row["final_price"] or 0
+    return lines
+
+
+def _line_header(line):
+    return {
+        "area_id": line["area_id"],
+        "area_name": line["area_name"],
+        "item_type": line["item_type"],
+        "reference_id": line["reference_id"],
+        "reference": line["reference"],
+    }
+
+
+def diff_boq_lines(base_lines, target_lines):
+    added, removed, changed = [], [], []
+    unchanged = 0
+
+    for key, new in target_lines.items():
+        old = base_lines.get(key)
+        if old is None:
+            added.append({
+                **_line_header(new),
+                "quantity": new["quantity"],
+                "unit_price": float(new["unit_price"]),
+                "amount": float(new["amount"]),
+            })
+            continue
+
+        if (old["quantity"], old["unit_price"], old["amount"]) == (
+            new["quantity"], new["unit_price"], new["amount"]
+        ):
+            unchanged += 1
+            continue
+
+        changed.append({
+            **_line_header(new),
+            "old_quantity": old["quantity"],
+            "new_quantity": new["quantity"],
+            "quantity_delta": new["quantity"] - old["quantity"],
+            "old_unit_price": float(old["unit_price"]),
+            "new_unit_price": float(new["unit_price"]),
+            "unit_price_delta": float(new["unit_price"] - old["unit_price"]),
+            "old_amount": float(old["amount"]),
+            "new_amount": float(new["amount"]),
+            "amount_delta": float(new["amount"] - old["amount"]),
+        })
+
+    for key, old in base_lines.items():
+        if key not in target_lines:
+            removed.append({
+                **_line_header(old),
+                "quantity": old["quantity"],
+                "unit_price": float(old["unit_price"]),
+                "amount": float(old["amount"]),
+            })
+
+    sort_key = lambda line: (line["area_name"], line["item_type"], line["reference"] or "")
+    return {
+        "added": sorted(added, key=sort_key),
+        "removed": sorted(removed, key=sort_key),
+        "changed": sorted(changed, key=sort_key),
+        "unchanged_count": unchanged,
+    }
+
+
+def diff_boq_versions(base, target):
+    """
+    Compare two BOQs of the same project (base -> target).
+
+    Returns:
+        dict with added / removed / changed lines and total deltas
+    """
+    if base.project_id != target.project_id:
+        raise ValidationError("BOQs belong to different projects")
+
+    cacheable = base.status == "FINAL" and target.status == "FINAL"
+    if cacheable:
+        result = cache.get(_diff_cache_key(base, target))
+        if result is not None:
+            return result
+
+    result = {
+        "project_id": base.project_id,
+        "base": {"boq_id": base.id, "version": base.version, "status": base.status},
+        "target": {"boq_id": target.id, "version": target.version, "status": target.status},
+        **diff_boq_lines(load_diff_lines(base), load_diff_lines(target)),
+        "grand_total_delta": float(target.grand_total - base.grand_total),
+        "subtotal_delta": float(target.subtotal - base.subtotal),
+    }
+
+    if cacheable:
+        cache.set(
+            _diff_cache_key(base, target),
+            result,
+            getattr(settings, "BOQ_DIFF_CACHE_TIMEOUT", 24 * 60 * 60),
+        )
+    return result
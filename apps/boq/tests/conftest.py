@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+import pytest
+
+from apps.projects.models import Project, Area
+from apps.masters.models import Product, Driver, Accessory
+from apps.configurations.models import (
+    LightingConfiguration,
+    ConfigurationDriver,
+    ConfigurationAccessory,
+)
+
+
+@pytest.fixture
+def project():
+    return Project.objects.create(
+        name="BOQ Project",
+        project_code="BOQ-001",
+        client_name="BOQ Client",
+        fee=1000,
+    )
+
+
+@pytest.fixture
+def configured_project(project):
+    """
+    Project with two areas, each holding three configured products
+    with one driver and one accessory per product.
+    """
+    driver = Driver.objects.create(
+        driver_code="DRV-350",
+        driver_make="Meanwell",
+        base_price=Decimal("200.00"),
+    )
+    accessory = Accessory.objects.create(
+        accessory_name="Spring Clip Kit",
+        accessory_type="Clip",
+        accessory_category="MOUNTING",
+        base_price=Decimal("50.00"),
+    )
+
+    for area_name in ("Lobby", "Lounge"):
+        area = Area.objects.create(project=project, name=area_name)
+        for index in range(3):
+            product = Product.objects.create(
+                make=f"Make {area_name} {index}",
+                order_code=f"{area_name[:3].upper()}-{index}",
+                base_price=Decimal("500.00"),
+            )
+            config = LightingConfiguration.objects.create(
+                project=project,
+                area=area,
+                product=product,
+                quantity=index + 1,
+            )
+            ConfigurationDriver.objects.create(
+                configuration=config, driver=driver, quantity=index + 1
+            )
+            ConfigurationAccessory.objects.create(
+                configuration=config, accessory=accessory, quantity=2
+            )
+
+    return project
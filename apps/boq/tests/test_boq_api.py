@@ -18,4 +18,111 @@ def test_generate_boq_api():
     assert 'id' in response.data
     assert response.data["status"] == "DRAFT"
     assert response.data["version"] == 1
-    
\ No newline at end of file
+    
+
+@pytest.mark.django_db
+def test_summary_detail_omits_items_unless_requested(configured_project):
+    from django.contrib.auth.models import User
+    from apps.boq.services.boq_service import generate_boq
+
+    boq = generate_boq(configured_project, None)
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user("viewer"))
+
+    response = client.get(f"/api/boq/summary/detail/{boq.id}/")
+    assert response.status_code == 200
+    assert "items" not in response.data
+    assert response.data["grand_total"] == 9000.0
+
+    response = client.get(
+        f"/api/boq/summary/detail/{boq.id}/?include=items&page_size=5&fields=boq_id,items,items_next"
+    )
+    assert set(response.data) == {"boq_id", "items", "items_next"}
+    assert len(response.data["items"]) == 5
+
+
+@pytest.mark.django_db
+def test_summary_items_cursor_pagination(configured_project):
+    from django.contrib.auth.models import User
+    from apps.boq.models import BOQItem
+    from apps.boq.services.boq_service import generate_boq
+
+    boq = generate_boq(configured_project, None)
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user("viewer"))
+
+    seen = []
+    url = f"/api/boq/summary/detail/{boq.id}/items/?page_size=7"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert len(response.data["results"]) <= 7
+        seen.extend(item["id"] for item in response.data["results"])
+        url = response.data["next"]
+
+    assert seen == list(BOQItem.objects.filter(boq=boq).order_by("id").values_list("id", flat=True))
+
+    response = client.get(f"/api/boq/summary/detail/{boq.id}/items/?cursor=garbage")
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_bulk_price_update(configured_project):
+    from decimal import Decimal
+    from django.contrib.auth.models import User
+    from apps.boq.models import AuditLogEntry, BOQItem
+    from apps.boq.services.boq_service import apply_margin_to_boq, generate_boq
+
+    boq = generate_boq(configured_project, None)
+    apply_margin_to_boq(boq, 10)
+    product, driver = (
+        BOQItem.objects.filter(boq=boq, item_type=t).order_by("id").last()
+        for t in ("PRODUCT", "DRIVER")
+    )
+    client = APIClient()
+    client.force_authenticate(User.objects.create_superuser("admin"))
+
+    response = client.patch(
+        "/api/boq/items/price/",
+        [
+            {"id": product.id, "unit_price": "600.00"},
+            {"id": driver.id, "unit_price": "250"},
+        ],
+        format="json",
+    )
+
+    assert response.status_code == 200
+    results = {row["boq_item_id"]: row for row in response.data["items"]}
+    # Lounge product, quantity 3 at 10% markup
+    assert results[product.id]["final_price"] == 1980.0
+    assert results[driver.id]["final_price"] == 825.0
+
+    driver.refresh_from_db()
+    assert driver.unit_price == Decimal("250.00")
+    assert driver.final_price == Decimal("825.00")
+    assert AuditLogEntry.objects.filter(action="BULK PRICE UPDATE").count() == 1
+
+    boq.refresh_from_db()
+    assert boq.subtotal == Decimal("9450.00")
+
+
+@pytest.mark.django_db
+def test_bulk_price_update_rejects_unknown_items(configured_project):
+    from django.contrib.auth.models import User
+    from apps.boq.models import BOQItem
+    from apps.boq.services.boq_service import generate_boq
+
+    boq = generate_boq(configured_project, None)
+    item = BOQItem.objects.filter(boq=boq).first()
+    client = APIClient()
+    client.force_authenticate(User.objects.create_superuser("admin"))
+
+    response = client.patch(
+        "/api/boq/items/price/",
+        {"items": [{"id": item.id, "unit_price": "1"}, {"id": 999999, "unit_price": "1"}]},
+        format="json",
+    )
+
+    assert response.status_code == 400
+    item.refresh_from_db()
+    assert item.unit_price != 1
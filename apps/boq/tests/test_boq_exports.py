@@ -0,0 +1,137 @@
+import io
+import os
+from datetime import datetime, timezone
+
+import openpyxl
+import pytest
+from django.http import FileResponse
+
+from apps.boq.models import BOQ
+from apps.boq.services.boq_service import (
+    BOQExcelBuilder,
+    BOQPDFBuilder,
+    generate_boq,
+)
+from apps.boq.services.export_cache import BOQExportCache, cached_export_response
+from apps.boq.services.render_dataset import load_render_dataset
+
+
+@pytest.mark.django_db
+def test_pdf_stream_returns_file_response(configured_project):
+    boq = generate_boq(configured_project, None)
+
+    response = BOQPDFBuilder(boq, is_draft=True).stream()
+
+    assert isinstance(response, FileResponse)
+    assert response["Content-Type"] == "application/pdf"
+    assert "attachment" in response["Content-Disposition"]
+    assert "X-Render-Time-Ms" in response
+    assert b"".join(response.streaming_content).startswith(b"%PDF")
+
+
+@pytest.mark.django_db
+def test_render_dataset_groups_items_in_one_query(
+    configured_project, django_assert_num_queries
+):
+    boq = generate_boq(configured_project, None)
+
+    with django_assert_num_queries(1):
+        dataset = load_render_dataset(boq, order_by_area_name=True)
+        # Related rows are already joined in.
+        for section in dataset:
+            for item in section.items:
+                item.product, item.driver, item.accessory, item.area
+
+    assert [section.area_name for section in dataset] == ["Lobby", "Lounge"]
+    assert [len(section.items) for section in dataset] == [9, 9]
+
+
+@pytest.mark.django_db
+def test_exports_do_not_query_per_area(configured_project, django_assert_num_queries):
+    boq = generate_boq(configured_project, None)
+    BOQ.objects.filter(id=boq.id).update(status="FINAL")
+
+    # Render dataset + the project header lookup, regardless of area count.
+    boq = BOQ.objects.get(id=boq.id)
+    with django_assert_num_queries(2):
+        BOQExcelBuilder(boq).build()
+
+    boq = BOQ.objects.get(id=boq.id)
+    with django_assert_num_queries(2):
+        BOQPDFBuilder(boq).render(io.BytesIO())
+
+
+class _FakeBuilder:
+    export_format = "pdf"
+    content_type = "application/pdf"
+    template_revision = 1
+
+    def __init__(self, boq, payload=b"x" * 100):
+        self.boq = boq
+        self.payload = payload
+        self.renders = 0
+
+    def filename(self):
+        return "boq.pdf"
+
+    def render(self, fileobj):
+        self.renders += 1
+        fileobj.write(self.payload)
+
+
+@pytest.mark.django_db
+def test_final_export_is_rendered_once(configured_project, settings, tmp_path):
+    settings.BOQ_EXPORT_CACHE_DIR = tmp_path
+    boq = generate_boq(configured_project, None)
+    builder = _FakeBuilder(boq)
+
+    first = cached_export_response(builder)
+    second = cached_export_response(builder)
+
+    assert builder.renders == 1
+    assert b"".join(second.streaming_content) == builder.payload
+    first.close()
+    second.close()
+
+
+def test_export_cache_evicts_least_recently_used(tmp_path):
+    cache = BOQExportCache(root=tmp_path, max_bytes=250)
+    render = lambda fileobj: fileobj.write(b"x" * 100)
+
+    cache.store("a", "pdf", render).close()
+    cache.store("b", "pdf", render).close()
+    # Touch "a" so "b" becomes the least recently used entry.
+    os.utime(cache.path_for("b", "pdf"), (0, 0))
+    cache.open("a", "pdf").close()
+    cache.store("c", "pdf", render).close()
+
+    assert cache.path_for("a", "pdf").exists()
+    assert not cache.path_for("b", "pdf").exists()
+    assert cache.path_for("c", "pdf").exists()
+
+
+@pytest.mark.django_db
+def test_excel_write_only_layout(configured_project):
+    boq = generate_boq(configured_project, None)
+    BOQ.objects.filter(id=boq.id).update(
+        status="FINAL", locked_at=datetime(2026, 3, 2, 12, 0, tzinfo=timezone.utc)
+    )
+    boq = BOQ.objects.get(id=boq.id)
+
+    response = BOQExcelBuilder(boq).stream()
+    ws = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content)))["BOQ"]
+
+    assert ws["A1"].value == "TVUM TECH" and ws["A1"].font.b
+    assert (ws["E4"].value, ws["F4"].value) == ("Version:", 1)
+    # Cached FINAL documents carry the approval date, not the render date
+    assert (ws["E5"].value, ws["F5"].value) == ("Date:", "02-03-2026")
+    assert ws["A7"].value == "Area: Lobby"
+    assert ws["D8"].value == "Qty" and ws["D8"].alignment.horizontal == "center"
+    assert ws["A9"].value == "PRODUCT"
+    assert ws["G9"].number_format == "₹#,##0.00"
+    assert ws["G9"].alignment.horizontal == "right"
+    assert ws.column_dimensions["G"].width == 20
+
+    # Area block: header + 9 items + total, then one blank row.
+    assert ws["F18"].value == "Area Total" and ws["F18"].font.b
+    assert ws["A20"].value == "Area: Lounge"
@@ -0,0 +1,225 @@
+from decimal import Decimal
+
+import pytest
+
+from apps.boq.models import AuditLogEntry, BOQItem
+from apps.boq.services.boq_service import apply_margin_to_boq, generate_boq, get_boq_summary
+from apps.boq.services.totals import (
+    TOTAL_FIELDS,
+    compute_boq_totals,
+    compute_cumulative_totals,
+    get_cumulative_totals,
+    stored_boq_totals,
+)
+from apps.configurations.models import ConfigurationAccessory, LightingConfiguration
+
+
+def assert_totals_in_sync(boq):
+    computed = compute_boq_totals(boq)
+    assert stored_boq_totals(boq) == {field: computed[field] for field in TOTAL_FIELDS}
+    expected = compute_cumulative_totals(boq.project_id)
+    for version in boq.project.boq_set.all():
+        assert get_cumulative_totals(version) == expected[version.id]
+
+
+@pytest.mark.django_db
+def test_generate_boq_creates_all_items(configured_project):
+    boq = generate_boq(configured_project, None)
+
+    items = BOQItem.objects.filter(boq=boq)
+    assert items.filter(item_type="PRODUCT").count() == 6
+    assert items.filter(item_type="DRIVER").count() == 6
+    assert items.filter(item_type="ACCESSORY").count() == 6
+
+    driver_line = items.filter(item_type="DRIVER").order_by("id").last()
+    assert driver_line.quantity == 3
+    assert driver_line.final_price == Decimal("600.00")
+
+
+@pytest.mark.django_db
+def test_generate_boq_query_count_is_independent_of_size(
+    configured_project, django_assert_max_num_queries
+):
+    # 6 configurations -> 18 items. The budget covers the fixed lookups,
+    # the active snapshots (rebuilt from the rows here: the fixture has no
+    # version headers), one price lookup per master table, the header
+    # insert, one bulk insert, the totals update, the running totals (one
+    # select, one insert) and savepoints; per-row inserts/selects would
+    # exceed it.
+    with django_assert_max_num_queries(22):
+        generate_boq(configured_project, None)
+
+
+@pytest.mark.django_db
+def test_generate_boq_keeps_first_product_per_area(configured_project):
+    config = LightingConfiguration.objects.filter(project=configured_project).first()
+    # Same product in the same area under a different version number.
+    LightingConfiguration.objects.create(
+        project=configured_project,
+        area=config.area,
+        product=config.product,
+        quantity=99,
+        configuration_version=2,
+    )
+
+    boq = generate_boq(configured_project, None)
+
+    product_line = BOQItem.objects.get(
+        boq=boq, area=config.area, product=config.product, item_type="PRODUCT"
+    )
+    assert product_line.quantity == config.quantity
+
+
+@pytest.mark.django_db
+def test_generate_boq_stores_header_totals(configured_project):
+    boq = generate_boq(configured_project, None)
+    boq.refresh_from_db()
+
+    assert boq.product_quantity == 12
+    assert boq.product_amount == Decimal("6000.00")
+    assert boq.driver_amount == Decimal("2400.00")
+    assert boq.accessory_amount == Decimal("600.00")
+    assert boq.grand_total == Decimal("9000.00")
+    assert_totals_in_sync(boq)
+
+
+@pytest.mark.django_db
+def test_apply_margin_refreshes_header_totals(configured_project):
+    boq = generate_boq(configured_project, None)
+
+    apply_margin_to_boq(boq, 10)
+    boq.refresh_from_db()
+
+    assert boq.margin_percent == Decimal("10.00")
+    assert boq.subtotal == Decimal("9000.00")
+    assert boq.margin_amount == Decimal("900.00")
+    assert boq.grand_total == Decimal("9900.00")
+    assert_totals_in_sync(boq)
+
+    summary = get_boq_summary(boq)
+    assert summary["grand_total"] == 9900.0
+    assert summary["summary"]["PRODUCT"] == {"quantity": 12, "amount": 6600.0}
+
+
+@pytest.mark.django_db
+def test_cumulative_totals_follow_edits_of_earlier_versions(configured_project):
+    first = generate_boq(configured_project, None)
+    LightingConfiguration.objects.filter(project=configured_project).update(
+        configuration_version=2
+    )
+    # New content (accessories 2 -> 3 per product): not a duplicate BOQ
+    ConfigurationAccessory.objects.filter(
+        configuration__project=configured_project
+    ).update(quantity=3)
+    second = generate_boq(configured_project, None)
+
+    assert get_cumulative_totals(second)["PRODUCT"] == (
+        24, Decimal("12000.00"), Decimal("12000.00")
+    )
+
+    # Editing v1 shifts the running totals of v1 and every later version
+    apply_margin_to_boq(first, 10)
+    assert_totals_in_sync(first)
+
+    summary = get_boq_summary(second)
+    assert summary["summary"]["PRODUCT"] == {"quantity": 24, "amount": 12600.0}
+    assert summary["subtotal"] == 18300.0
+    assert summary["grand_total"] == 19200.0
+
+
+@pytest.mark.django_db
+def test_apply_margin_with_item_type_and_area_overrides(
+    configured_project, django_assert_max_num_queries
+):
+    boq = generate_boq(configured_project, None)
+    lounge = configured_project.areas.get(name="Lounge")
+
+    # One item UPDATE, the totals refresh and one audit insert; nothing
+    # per item
+    with django_assert_max_num_queries(14):
+        apply_margin_to_boq(
+            boq, 10,
+            item_type_margins={"DRIVER": "20"},
+            area_margins={str(lounge.id): 5},
+        )
+
+    lobby_driver = BOQItem.objects.filter(boq=boq, item_type="DRIVER", area__name="Lobby").order_by("id").last()
+    assert lobby_driver.markup_pct == Decimal("20.00")
+    assert lobby_driver.final_price == Decimal("720.00")
+
+    lounge_product = BOQItem.objects.filter(boq=boq, item_type="PRODUCT", area=lounge).order_by("id").last()
+    assert lounge_product.markup_pct == Decimal("5.00")
+    assert lounge_product.final_price == Decimal("1575.00")
+
+    assert AuditLogEntry.objects.filter(action="MARGIN_APPLIED").count() == 1
+    assert_totals_in_sync(boq)
+
+
+@pytest.mark.django_db
+def test_margin_simulation_matches_applied_margins(configured_project):
+    from apps.boq.services.margin_simulation import simulate_margins
+
+    boq = generate_boq(configured_project, None)
+    lounge = configured_project.areas.get(name="Lounge")
+    scenario = {
+        "markup_pct": 10,
+        "item_type_margins": {"DRIVER": 20},
+        "area_margins": {lounge.id: 5},
+    }
+
+    curve = simulate_margins(boq, [{"markup_pct": 0}, {"markup_pct": 25}, scenario])
+
+    assert [result["grand_total"] for result in curve[:2]] == [9000.0, 11250.0]
+    assert BOQItem.objects.filter(boq=boq, markup_pct=0).count() == 18
+
+    apply_margin_to_boq(boq, **scenario)
+    boq.refresh_from_db()
+    assert curve[2]["grand_total"] == float(boq.grand_total)
+    assert curve[2]["summary"]["DRIVER"]["amount"] == float(boq.driver_amount)
+
+
+@pytest.mark.django_db
+def test_version_diff_reports_added_removed_and_changed_lines(
+    configured_project, settings, tmp_path
+):
+    from django.core.cache import cache
+    from apps.boq.services.boq_service import approve_boq
+    from apps.boq.services.version_diff import diff_boq_versions
+    from apps.masters.models import Product
+
+    first = generate_boq(configured_project, None)
+
+    configs = LightingConfiguration.objects.filter(project=configured_project).order_by("id")
+    dropped, bumped = configs[0], configs[1]
+    LightingConfiguration.objects.filter(pk=dropped.pk).update(is_active=False)
+    LightingConfiguration.objects.filter(pk=bumped.pk).update(quantity=10)
+    new_product = Product.objects.create(make="Extra", order_code="EXT-1", base_price=Decimal("80.00"))
+    LightingConfiguration.objects.create(
+        project=configured_project, area=bumped.area, product=new_product, quantity=4
+    )
+    LightingConfiguration.objects.filter(project=configured_project).update(configuration_version=2)
+    second = generate_boq(configured_project, None)
+
+    diff = diff_boq_versions(first, second)
+
+    assert [(line["item_type"], line["reference"]) for line in diff["added"]] == [
+        ("PRODUCT", "Extra (EXT-1)")
+    ]
+    assert [line["reference_id"] for line in diff["removed"] if line["item_type"] == "PRODUCT"] == [
+        dropped.product_id
+    ]
+    product_change = next(
+        line for line in diff["changed"]
+        if line["item_type"] == "PRODUCT" and line["reference_id"] == bumped.product_id
+    )
+    assert product_change["quantity_delta"] == 8
+    assert product_change["amount_delta"] == 4000.0
+
+    # FINAL pairs are cached by version pair
+    settings.BOQ_EXPORT_CACHE_DIR = tmp_path
+    cache.clear()
+    approve_boq(first)
+    approve_boq(second)
+    assert diff_boq_versions(first, second) is not None
+    BOQItem.objects.filter(boq=second).delete()
+    assert diff_boq_versions(first, second)["added"] == diff["added"]
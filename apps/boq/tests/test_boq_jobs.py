@@ -0,0 +1,133 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.boq.models import BOQ, BOQJob
+from apps.boq.services.boq_service import generate_boq
+from apps.boq.services.jobs import (
+    claim_next_job,
+    enqueue_job,
+    purge_expired_job_outputs,
+    run_job,
+)
+
+
+@pytest.mark.django_db
+def test_worker_claims_and_runs_generation_job(configured_project, settings):
+    settings.BOQ_JOB_BACKEND = "worker"
+
+    job = enqueue_job("GENERATE", None, project=configured_project)
+    assert job.status == "QUEUED"
+
+    claimed = claim_next_job()
+    assert claimed.pk == job.pk
+    assert claimed.status == "RUNNING"
+    assert claim_next_job() is None
+
+    run_job(claimed)
+
+    job.refresh_from_db()
+    assert job.status == "SUCCEEDED"
+    assert job.progress == 100
+    assert job.boq == BOQ.objects.get(project=configured_project)
+
+
+@pytest.mark.django_db
+def test_failed_job_records_message(configured_project, settings):
+    settings.BOQ_JOB_BACKEND = "inline"
+    generate_boq(configured_project, None)
+
+    # Same configuration version again -> generation is rejected.
+    job = enqueue_job("GENERATE", None, project=configured_project)
+
+    assert job.status == "FAILED"
+    assert "already generated" in job.message
+
+
+@pytest.mark.django_db
+def test_export_job_api_and_download(configured_project, settings, tmp_path):
+    settings.BOQ_JOB_BACKEND = "inline"
+    settings.BOQ_JOB_OUTPUT_DIR = tmp_path
+    boq = generate_boq(configured_project, None)
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_superuser("admin", "a@x.io", "pw"))
+
+    response = client.post("/api/boq/jobs/", {"kind": "EXPORT_PDF", "boq_id": boq.id}, format="json")
+    assert response.status_code == 202
+    assert response.data["status"] == "SUCCEEDED"
+
+    job = BOQJob.objects.get(id=response.data["id"])
+    status_response = client.get(f"/api/boq/jobs/{job.id}/")
+    assert status_response.data["download_url"] == f"/api/boq/jobs/{job.id}/download/"
+
+    download = client.get(status_response.data["download_url"])
+    assert download.status_code == 200
+    assert b"".join(download.streaming_content).startswith(b"%PDF")
+
+
+@pytest.mark.django_db
+def test_approval_queues_export_warmup_after_commit(
+    configured_project, settings, django_capture_on_commit_callbacks
+):
+    settings.BOQ_JOB_BACKEND = "worker"
+    boq = generate_boq(configured_project, None)
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_superuser("admin", "a@x.io", "pw"))
+
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        response = client.post(f"/api/boq/approve/{boq.id}/")
+        assert response.status_code == 200
+        # Nothing is rendered or queued inside the approve request
+        assert not BOQJob.objects.exists()
+
+    for callback in callbacks:
+        callback()
+    assert sorted(BOQJob.objects.filter(boq=boq).values_list("kind", "status")) == [
+        ("EXPORT_EXCEL", "QUEUED"),
+        ("EXPORT_PDF", "QUEUED"),
+    ]
+    boq.refresh_from_db()
+    assert boq.status == "FINAL"
+
+
+@pytest.mark.django_db
+def test_jobs_of_crashed_workers_are_requeued_then_failed(configured_project, settings):
+    settings.BOQ_JOB_BACKEND = "worker"
+    settings.BOQ_JOB_MAX_ATTEMPTS = 2
+    job = enqueue_job("GENERATE", None, project=configured_project)
+
+    for attempt in (1, 2):
+        claimed = claim_next_job()
+        assert (claimed.pk, claimed.attempts) == (job.pk, attempt)
+        # The worker dies without reporting progress
+        BOQJob.objects.filter(pk=job.pk).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    assert claim_next_job() is None
+    job.refresh_from_db()
+    assert job.status == "FAILED"
+    assert job.message == "Worker stopped responding"
+
+
+@pytest.mark.django_db
+def test_expired_draft_outputs_are_deleted(configured_project, settings, tmp_path):
+    settings.BOQ_JOB_BACKEND = "inline"
+    settings.BOQ_JOB_OUTPUT_DIR = tmp_path
+    boq = generate_boq(configured_project, None)
+
+    fresh = enqueue_job("EXPORT_PDF", None, boq=boq)
+    stale = enqueue_job("EXPORT_PDF", None, boq=boq)
+    BOQJob.objects.filter(pk=stale.pk).update(
+        finished_at=timezone.now() - timedelta(seconds=settings.BOQ_JOB_OUTPUT_TTL + 1)
+    )
+
+    assert purge_expired_job_outputs() == 1
+    stale.refresh_from_db()
+    assert stale.output_file == ""
+    assert sorted(tmp_path.iterdir()) == [tmp_path / f"job_{fresh.pk}.pdf"]
@@ -4,31 +4,48 @@ from .views import (
     GenerateBOQAPI,
     BOQSummaryAPI,
     BOQSummaryDetailAPI,
+    BOQSummaryItemsAPI,
     BOQVersionsListAPI,
+    BOQVersionDiffAPI,
     BOQApproveAPI,
     BOQExportPDFAPI,
     BOQExportExcelAPI,
     ApplyMarginAPI,
+    MarginSimulationAPI,
     BOQItemPriceUpdateAPI,
-    BOQItemViewSet
+    BOQItemBulkPriceUpdateAPI,
+    BOQItemViewSet,
+    BOQJobCreateAPI,
+    BOQJobDetailAPI,
+    BOQJobDownloadAPI,
 )
 
 router = DefaultRouter()
 router.register("items", BOQItemViewSet, basename="boq-items")
 
 urlpatterns = [
+    # Bulk price override; must precede the router's items/<pk>/ route
+    path("items/price/", BOQItemBulkPriceUpdateAPI.as_view()),
     path('', include(router.urls)),
     path('generate/<int:project_id>/', GenerateBOQAPI.as_view()),
     path('summary/<int:project_id>/', BOQSummaryAPI.as_view()),
     path('summary/detail/<int:boq_id>/', BOQSummaryDetailAPI.as_view()),
+    path('summary/detail/<int:boq_id>/items/', BOQSummaryItemsAPI.as_view(), name="boq-summary-items"),
     path('versions/<int:project_id>/', BOQVersionsListAPI.as_view()), # Mandatory Endpoint
+    path('diff/<int:base_id>/<int:target_id>/', BOQVersionDiffAPI.as_view()),
     path('approve/<int:boq_id>/', BOQApproveAPI.as_view()),
     
     # Download PDF/EXCEL
     path("export/pdf/<int:boq_id>/", BOQExportPDFAPI.as_view()),
     path("export/excel/<int:boq_id>/", BOQExportExcelAPI.as_view()),
     path("apply-margin/<int:boq_id>/", ApplyMarginAPI.as_view()),
+    path("simulate-margin/<int:boq_id>/", MarginSimulationAPI.as_view()),
     
+    # Background jobs (generation / exports)
+    path("jobs/", BOQJobCreateAPI.as_view()),
+    path("jobs/<int:job_id>/", BOQJobDetailAPI.as_view()),
+    path("jobs/<int:job_id>/download/", BOQJobDownloadAPI.as_view()),
+
     # Price Override (Transactional)
     path("items/<int:boq_item_id>/price/", BOQItemPriceUpdateAPI.as_view()),
 ]
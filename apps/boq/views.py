@@ -1,15 +1,19 @@
 
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from apps.projects.models import Project
 from apps.boq.models import BOQ, BOQItem
 from django.utils import timezone
 from apps.rbac.drf_permissions import HasPermission
+from apps.rbac.permissions import has_permission
 from apps.boq.services.boq_service import (
     get_project_boq_summary,
     get_boq_summary,
     generate_boq,
     approve_boq,
-    apply_margin_to_boq
+    apply_margin_to_boq,
+    boq_item_reference,
+    bulk_update_item_prices,
 )
 from rest_framework import serializers
 from rest_framework.views import APIView
@@ -18,11 +22,22 @@ from rest_framework.response import Response
 from rest_framework import status
 from apps.boq.services.boq_service import BOQPDFBuilder
 from apps.boq.services.boq_service import BOQExcelBuilder
+from apps.boq.services.export_cache import cached_export_response
+from apps.boq.services.totals import refresh_boq_totals
+from apps.boq.services.margin_simulation import simulate_margins
+from apps.boq.services.version_diff import diff_boq_versions
+from django.db import transaction
 from apps.boq.serializers import BOQSerializer, BOQItemSerializer, BOQItemWriteSerializer
+from apps.common.audit import record_audit
 from apps.common.authentication import QueryParamJWTAuthentication
 from rest_framework.generics import GenericAPIView
 from drf_spectacular.utils import extend_schema
-from apps.boq.serializers import BOQItemPriceUpdateSerializer
+from apps.boq.serializers import BOQItemPriceUpdateSerializer, BOQItemBulkPriceUpdateSerializer
+from apps.boq.pagination import BOQItemKeysetPagination
+from apps.boq.serializers import BOQJobSerializer, BOQJobCreateSerializer
+from apps.boq.models import BOQJob
+from apps.boq.services.jobs import enqueue_job, job_builder, job_output_expired, remove_job_output
+from django.http import FileResponse
 from rest_framework.serializers import Serializer
 # from django.http import HttpResponse
 # from reportlab.pdfgen import canvas
@@ -50,10 +65,9 @@ class GenerateBOQAPI(APIView):
             project = get_object_or_404(Project, id=project_id)
             boq = generate_boq(project, request.user)
 
-            from apps.boq.models import AuditLogEntry
-            AuditLogEntry.objects.create(
+            record_audit(
+                "BOQ_GENERATED",
                 user=request.user,
-                action="BOQ_GENERATED",
                 details={"boq_id": boq.id, "version": boq.version}
             )
 
@@ -95,75 +109,75 @@ class BOQSummaryAPI(APIView):
         summary = get_project_boq_summary(project)
         if summary is None:
             return Response({"detail": "No BOQ found for project."}, status=status.HTTP_404_NOT_FOUND)
-        boq = BOQ.objects.filter(project=project).order_by("-version").first()
-        subtotal = sum([v["amount"] for v in summary["summary"].values()])
-        margin_percent = getattr(boq, "margin_percent", 0)
-        margin_amount = subtotal * (margin_percent / 100)
-        grand_total = subtotal + margin_amount
-        summary.update({
-            "subtotal": subtotal,
-            "margin_percent": margin_percent,
-            "margin_amount": margin_amount,
-            "grand_total": grand_total
-        })
+        # subtotal / margin / grand_total come from the materialized BOQ totals
         return Response(summary)
 
+def _cumulative_items(boq):
+    """Items of every version of the project up to `boq.version`."""
+    return BOQItem.objects.filter(
+        boq__project_id=boq.project_id,
+        boq__version__lte=boq.version
+    ).select_related(
+        "boq",
+        "product",
+        "driver",
+        "accessory",
+        "area"
+    )
+
+
+def _query_list(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return {part.strip() for part in value.split(",") if part.strip()}
+
+
 class BOQSummaryDetailAPI(APIView):
     """
     Specific BOQ summary by ID (CUMULATIVE)
+
+    Query params:
+    - include=items : embed the first page of cumulative items
+                      (next pages via `items_next`)
+    - fields=a,b,.. : only return these top-level keys
     """
 
     def get(self, request, boq_id):
         boq = get_object_or_404(BOQ, id=boq_id)
 
-        # 🔥 cumulative BOQ items
-        items = BOQItem.objects.filter(
-            boq__project=boq.project,
-            boq__version__lte=boq.version
-        ).select_related(
-            "product",
-            "driver",
-            "accessory",
-            "area"
-        ).order_by("boq__version", "id")
+        # -------- cumulative totals (running-total rows) ----------
+        data = get_boq_summary(boq)
 
-        # serialize items
-        items_data = BOQItemSerializer(items, many=True).data
+        include = _query_list(request, "include") or set()
+        if "items" in include:
+            paginator = BOQItemKeysetPagination()
+            page = paginator.paginate_queryset(_cumulative_items(boq), request, self)
+            data["items"] = BOQItemSerializer(page, many=True).data
+            data["items_next"] = paginator.get_next_link(
+                reverse("boq-summary-items", args=[boq.id])
+            )
 
-        # -------- summary calculation ----------
-        summary_map = {}
-        for item in items:
-            key = item.item_type
+        fields = _query_list(request, "fields")
+        if fields:
+            data = {key: value for key, value in data.items() if key in fields}
 
-            if key not in summary_map:
-                summary_map[key] = {"quantity": 0, "amount": 0}
+        return Response(data)
 
-            summary_map[key]["quantity"] += item.quantity
-            summary_map[key]["amount"] += float(item.final_price or 0)
 
-        subtotal = sum(v["amount"] for v in summary_map.values())
-        margin_percent = getattr(boq, "margin_percent", 0)
-        margin_amount = subtotal * (margin_percent / 100)
-        grand_total = subtotal + margin_amount
+class BOQSummaryItemsAPI(GenericAPIView):
+    """
+    Cumulative BOQ items for a BOQ version, cursor-paginated on
+    (boq version, item id).
+    """
+    serializer_class = BOQItemSerializer
+    pagination_class = BOQItemKeysetPagination
 
-        return Response({
-            "project_id": boq.project.id,
-            "boq_id": boq.id,
-            "version": boq.version,
-            "status": boq.status,
-            "created_at": boq.created_at,
-            "source_configuration_version": boq.source_configuration_version,
-
-            # cumulative totals
-            "summary": summary_map,
-            "subtotal": subtotal,
-            "margin_percent": margin_percent,
-            "margin_amount": margin_amount,
-            "grand_total": grand_total,
-
-            # 🔥 NEW FIELD
-            "items": items_data
-        })
+    def get(self, request, boq_id):
+        boq = get_object_or_404(BOQ, id=boq_id)
+        page = self.paginate_queryset(_cumulative_items(boq))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class BOQVersionsListAPI(APIView):
@@ -188,6 +202,24 @@ class BOQVersionsListAPI(APIView):
         return Response(boqs)
 
 
+class BOQVersionDiffAPI(APIView):
+    """
+    Line-level diff between two BOQ versions of a project
+    (added / removed / changed lines with quantity and price deltas).
+    """
+
+    def get(self, request, base_id, target_id):
+        base = get_object_or_404(BOQ, id=base_id)
+        target = get_object_or_404(BOQ, id=target_id)
+        try:
+            return Response(diff_boq_versions(base, target))
+        except ValidationError as e:
+            return Response(
+                {"detail": e.message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+
   
 class BOQApproveAPI(APIView):
     serializer_class = serializers.Serializer
@@ -197,21 +229,12 @@ class BOQApproveAPI(APIView):
     filter_backends = [SearchFilter, DjangoFilterBackend]
     def post(self, request, boq_id):
         from apps.rbac.permissions import has_permission
-        if not has_permission(request.user, 'boq', 'approve'):
+        if not has_permission(request.user, 'boq.approve_boq'):
             return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
         boq = get_object_or_404(BOQ, id=boq_id)
         if boq.status == 'FINAL':
             return Response({'detail': 'BOQ already Approved'}, status=status.HTTP_400_BAD_REQUEST)
-        boq.status = "FINAL"
-        boq.approved_at = timezone.now()
-        boq.save()
-        from apps.boq.models import AuditLogEntry
-        AuditLogEntry.objects.create(
-            user=request.user,
-            action="BOQ_APPROVED",
-            reference_id=boq.id,
-            details={"boq_id": boq.id, "version": boq.version}
-        )
+        approve_boq(boq, user=request.user)
         return Response({'detail': f"BOQ v{boq.version} approved"}, status=status.HTTP_200_OK)
 
 
@@ -220,7 +243,6 @@ class BOQExportPDFAPI(APIView):
     permission_classes = [IsAdmin | IsFinance | IsEditor]
     filter_backends = [SearchFilter, DjangoFilterBackend]
     def get(self, request, boq_id):
-            from apps.boq.models import AuditLogEntry
             boq = get_object_or_404(BOQ, id=boq_id)
             user = request.user
             
@@ -229,14 +251,16 @@ class BOQExportPDFAPI(APIView):
             # ERP RULE: Draft export is watermarked. Allowed for Editors.
             if is_draft:
                 # Audit log mandatory for draft export
-                AuditLogEntry.objects.create(
+                record_audit(
+                    "EXPORT_DRAFT_BOQ",
                     user=user,
-                    action="EXPORT_DRAFT_BOQ",
                     details={"boq_id": boq.id, "version": boq.version}
                 )
             
             pdf = BOQPDFBuilder(boq, is_draft=is_draft)
-            return pdf.build()
+            if boq.status == "FINAL":
+                return cached_export_response(pdf)
+            return pdf.stream()
         
 
 class BOQExportExcelAPI(APIView):
@@ -253,7 +277,7 @@ class BOQExportExcelAPI(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        return BOQExcelBuilder(boq).build()
+        return cached_export_response(BOQExcelBuilder(boq))
 
 
 class ApplyMarginAPI(APIView):
@@ -278,55 +302,76 @@ class ApplyMarginAPI(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        from decimal import Decimal
-        markup_pct = Decimal(str(markup_pct))
-
-        subtotal = Decimal("0")
-
-        # Apply margin to items
-        for item in boq.items.all():
-            base_amount = item.unit_price * item.quantity
-            final_amount = base_amount * (1 + markup_pct / 100)
-
-            item.markup_pct = markup_pct
-            item.final_price = final_amount
-            item.save()
-
-            subtotal += base_amount
-
-        # Update BOQ header totals
-        margin_amount = subtotal * markup_pct / Decimal("100")
-        grand_total = subtotal + margin_amount
-
-        boq.subtotal = subtotal
-        boq.margin_percent = markup_pct
-        boq.margin_amount = margin_amount
-        boq.grand_total = grand_total
-        boq.save()
-
-        from apps.boq.models import AuditLogEntry
-        AuditLogEntry.objects.create(
-            user=request.user,
-            action="MARGIN_APPLIED",
-            details={
-                "boq_id": boq.id,
-                "version": boq.version,
-                "markup_pct": float(markup_pct)
-            }
-        )
+        try:
+            # One set-based UPDATE, header totals refresh and audit entry
+            apply_margin_to_boq(
+                boq,
+                markup_pct,
+                item_type_margins=request.data.get("item_type_margins"),
+                area_margins=request.data.get("area_margins"),
+                user=request.user,
+            )
+        except ValidationError as e:
+            return Response(
+                {"detail": e.message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         return Response(
             {
-                "detail": f"Margin {markup_pct}% applied successfully",
+                "detail": f"Margin {boq.margin_percent}% applied successfully",
                 "boq_id": boq.id,
-                "subtotal": subtotal,
-                "margin_amount": margin_amount,
-                "grand_total": grand_total
+                "subtotal": boq.subtotal,
+                "margin_amount": boq.margin_amount,
+                "grand_total": boq.grand_total
             },
             status=status.HTTP_200_OK
         )
 
     
+class MarginSimulationAPI(APIView):
+    """
+    What-if margins for a BOQ (read-only, nothing is saved).
+
+    Body:
+    - {"markups": [5, 10, 15]}                    global markup curve
+    - {"scenarios": [{"markup_pct": 10,
+                      "item_type_margins": {"DRIVER": 15},
+                      "area_margins": {"12": 8}}, ...]}
+    """
+    permission_classes = [HasPermission]
+    permission_required = "boq.apply_margin"
+
+    def post(self, request, boq_id):
+        boq = get_object_or_404(BOQ, id=boq_id)
+
+        scenarios = request.data.get("scenarios")
+        markups = request.data.get("markups")
+        if scenarios is None and isinstance(markups, list):
+            scenarios = [{"markup_pct": markup} for markup in markups]
+        if not isinstance(scenarios, list):
+            return Response(
+                {"detail": "scenarios (or markups) must be a list"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            results = simulate_margins(boq, scenarios)
+        except ValidationError as e:
+            return Response(
+                {"detail": e.message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            "boq_id": boq.id,
+            "version": boq.version,
+            "current_margin_percent": float(boq.margin_percent),
+            "current_grand_total": float(boq.grand_total),
+            "results": results,
+        })
+
+
 class BOQItemPriceUpdateAPI(APIView):
     permission_classes = [IsEditor]
     @extend_schema(
@@ -365,14 +410,15 @@ class BOQItemPriceUpdateAPI(APIView):
                 boq_item.unit_price * boq_item.quantity *
                 (1 + boq_item.markup_pct / 100)
             )
-            boq_item.save()
+            with transaction.atomic():
+                boq_item.save()
+                refresh_boq_totals(boq)
 
             item_ref = self._get_item_reference(boq_item)
 
-            from apps.boq.models import AuditLogEntry
-            AuditLogEntry.objects.create(
+            record_audit(
+                "PRICE UPDATE",
                 user=request.user,
-                action="PRICE UPDATE",
                 details={
                     "boq_id": boq.id,
                     "version": boq.version,
@@ -400,14 +446,53 @@ class BOQItemPriceUpdateAPI(APIView):
         
     def _get_item_reference(self, boq_item):
         """Generate human-readable reference for audit log"""
-        if boq_item.item_type == "PRODUCT" and boq_item.product:
-            return f"Product: {boq_item.product.make} ({boq_item.product.order_code})"
-        elif boq_item.item_type == "DRIVER" and boq_item.driver:
-            return f"Driver: {boq_item.driver.driver_code}"
-        elif boq_item.item_type == "ACCESSORY" and boq_item.accessory:
-            return f"Accessory: {boq_item.accessory.accessory_name}"
-        else:
-            return f"BOQ Item {boq_item.id}"
+        return boq_item_reference(boq_item)
+
+
+class BOQItemBulkPriceUpdateAPI(APIView):
+    """
+    Override the unit price of many items of one DRAFT BOQ in one call.
+    Body: {"items": [{"id": 1, "unit_price": "120.00"}, ...]} (a bare
+    list is accepted too).
+    """
+    permission_classes = [IsEditor]
+
+    @extend_schema(
+        request=BOQItemBulkPriceUpdateSerializer,
+        responses={200: None, 400: None},
+        description="Bulk override of BOQ item unit prices (Only DRAFT BOQ allowed)"
+    )
+    def patch(self, request):
+        data = {"items": request.data} if isinstance(request.data, list) else request.data
+        serializer = BOQItemBulkPriceUpdateSerializer(data=data)
+        if not serializer.is_valid():
+            return Response(
+                {"errors": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            boq, results = bulk_update_item_prices(
+                serializer.validated_data["items"], user=request.user
+            )
+        except ValidationError as e:
+            return Response({"error": e.message}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "detail": f"{len(results)} BOQ item prices updated successfully",
+            "boq_id": boq.id,
+            "subtotal": float(boq.subtotal),
+            "grand_total": float(boq.grand_total),
+            "items": [
+                {
+                    "boq_item_id": result["boq_item_id"],
+                    "unit_price": result["new_unit_price"],
+                    "final_price": result["new_final_price"],
+                    "item_reference": result["item_reference"],
+                }
+                for result in results
+            ],
+        }, status=status.HTTP_200_OK)
 
     
 class BOQViewSet(ModelViewSet):
@@ -455,3 +540,99 @@ class BOQItemViewSet(ModelViewSet):
             queryset = queryset.filter(boq_id=boq_id)
         return queryset
 
+    # Keep the BOQ header totals in step with item edits
+    @transaction.atomic
+    def perform_create(self, serializer):
+        item = serializer.save()
+        refresh_boq_totals(item.boq)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        previous_boq_id = serializer.instance.boq_id
+        item = serializer.save()
+        refresh_boq_totals(item.boq)
+        if previous_boq_id != item.boq_id:
+            refresh_boq_totals(BOQ.objects.get(pk=previous_boq_id))
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        boq = instance.boq
+        instance.delete()
+        refresh_boq_totals(boq)
+
+
+
+class BOQJobCreateAPI(APIView):
+    """
+    Queue heavy BOQ work (generation / PDF / Excel export).
+    Poll the returned job, then fetch `download_url` for exports.
+    """
+    @extend_schema(request=BOQJobCreateSerializer, responses={202: BOQJobSerializer})
+    def post(self, request):
+        serializer = BOQJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        kind = serializer.validated_data["kind"]
+
+        if kind == "GENERATE":
+            if not has_permission(request.user, "boq.generate_boq"):
+                return Response({"detail": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+            project = get_object_or_404(Project, id=serializer.validated_data["project_id"])
+            job = enqueue_job(kind, request.user, project=project)
+        else:
+            boq = get_object_or_404(BOQ.objects.select_related("project"), id=serializer.validated_data["boq_id"])
+
+            # Same rules as BOQExportPDFAPI / BOQExportExcelAPI
+            allowed = IsAdmin | IsFinance if kind == "EXPORT_EXCEL" else IsAdmin | IsFinance | IsEditor
+            if not allowed().has_permission(request, self):
+                return Response({"detail": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+            if kind == "EXPORT_EXCEL" and boq.status != "FINAL":
+                return Response(
+                    {"detail": "Only Final BOQs can be exported"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            job = enqueue_job(kind, request.user, boq=boq)
+
+        return Response(BOQJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+def _visible_jobs(user):
+    jobs = BOQJob.objects.select_related("boq", "boq__project")
+    if user.is_superuser:
+        return jobs
+    return jobs.filter(requested_by_id=user.pk)
+
+
+class BOQJobDetailAPI(APIView):
+    def get(self, request, job_id):
+        job = get_object_or_404(_visible_jobs(request.user), id=job_id)
+        return Response(BOQJobSerializer(job).data)
+
+
+class BOQJobDownloadAPI(APIView):
+    authentication_classes = [QueryParamJWTAuthentication]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(_visible_jobs(request.user), id=job_id)
+        builder = job_builder(job)
+
+        if builder is None or job.status != "SUCCEEDED":
+            return Response(
+                {"detail": "Job has no downloadable result"},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        if job.boq.status == "FINAL":
+            return cached_export_response(builder)
+
+        if job.output_file and job_output_expired(job):
+            remove_job_output(job)
+        try:
+            handle = open(job.output_file, "rb")
+        except (FileNotFoundError, ValueError):
+            return Response({"detail": "Export file expired"}, status=status.HTTP_410_GONE)
+        return FileResponse(
+            handle,
+            as_attachment=True,
+            filename=job.result.get("filename") or builder.filename(),
+            content_type=builder.content_type,
+        )
@@ -0,0 +1,155 @@
+"""
+Audit Writer
+============
+Buffered writes of BOQ audit entries (AuditLogEntry) and easyaudit CRUD
+events.
+
+Key Concepts:
+- AuditBufferMiddleware opens one buffer per request; record_audit() and
+  the easyaudit logging backend (BufferedAuditBackend) append to it and
+  the request ends with one bulk_create per table
+- Outside a request (workers, management commands) entries are written
+  at once, as before
+- CREATE events of one model and user above
+  AUDIT_BULK_COLLAPSE_THRESHOLD collapse into a single summary event;
+  its object_json_repr keeps every created object. Updates and deletes
+  are always stored one by one (their changed_fields are the delta)
+- easyaudit emits CRUD events from transaction.on_commit, so buffered
+  events describe committed changes and are written whatever the
+  response; record_audit() entries of a failed request (exception or
+  4xx / 5xx response) are dropped, the action they record did not happen
+"""
+
+import json
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from easyaudit.backends import ModelBackend
+from easyaudit.models import CRUDEvent
+
+from apps.boq.models import AuditLogEntry
+
+
+_state = threading.local()
+
+
+def _buffer():
+    return getattr(_state, "buffer", None)
+
+
+@contextmanager
+def audit_buffer():
+    """Collect audit writes until the block exits (nested blocks share the outer one)."""
+    if _buffer() is not None:
+        yield _buffer()
+        return
+
+    _state.buffer = buffer = {"entries": [], "crud_events": []}
+    try:
+        yield buffer
+    except BaseException:
+        discard_audit_entries(buffer)
+        raise
+    finally:
+        _state.buffer = None
+        flush_audit_buffer(buffer)
+
+
+# -------------------------------
+# WRITE
+# -------------------------------
+def record_audit(action, user=None, details=None):
+    """
+    Record one AuditLogEntry (buffered within a request).
+    Anonymous / missing users are stored as "System".
+    """
+    entry = AuditLogEntry(
+        user_id=user.pk if user is not None and user.is_authenticated else None,
+        action=action,
+        details=details or {},
+    )
+    buffer = _buffer()
+    if buffer is None:
+        entry.save()
+    else:
+        buffer["entries"].append(entry)
+    return entry
+
+
+class BufferedAuditBackend(ModelBackend):
+    """easyaudit logging backend (DJANGO_EASY_AUDIT_LOGGING_BACKEND)."""
+
+    def crud(self, crud_info):
+        buffer = _buffer()
+        if buffer is None:
+            return super().crud(crud_info)
+        event = CRUDEvent(**crud_info)
+        buffer["crud_events"].append(event)
+        return event
+
+
+def _summary_event(group):
+    first = group[0]
+    # object_json_repr is a serialized list per event: one list of all
+    objects = []
+    for event in group:
+        objects.extend(json.loads(event.object_json_repr or "[]"))
+    return CRUDEvent(
+        content_type_id=first.content_type_id,
+        event_type=first.event_type,
+        object_id="",
+        object_repr=f"{len(group)} objects (bulk)",
+        object_json_repr=json.dumps(objects),
+        changed_fields=first.changed_fields,
+        user_id=first.user_id,
+        user_pk_as_string=first.user_pk_as_string,
+        datetime=first.datetime,
+    )
+
+
+def collapse_crud_events(events, threshold=None):
+    """Replace groups of more than `threshold` CREATE events by one summary event each."""
+    if threshold is None:
+        threshold = getattr(settings, "AUDIT_BULK_COLLAPSE_THRESHOLD", 20)
+
+    groups = {}
+    for event in events:
+        if event.event_type == CRUDEvent.CREATE:
+            groups.setdefault((event.content_type_id, event.user_id), []).append(event)
+
+    collapsed = []
+    for event in events:
+        group = groups.get((event.content_type_id, event.user_id))
+        if event.event_type != CRUDEvent.CREATE or len(group) <= threshold:
+            collapsed.append(event)
+        elif event is group[0]:
+            collapsed.append(_summary_event(group))
+    return collapsed
+
+
+def discard_audit_entries(buffer):
+    buffer["entries"] = []
+
+
+def flush_audit_buffer(buffer):
+    if buffer["entries"]:
+        AuditLogEntry.objects.bulk_create(buffer["entries"])
+    if buffer["crud_events"]:
+        CRUDEvent.objects.bulk_create(collapse_crud_events(buffer["crud_events"]))
+    buffer["entries"], buffer["crud_events"] = [], []
+
+
+# -------------------------------
+# MIDDLEWARE
+# -------------------------------
+class AuditBufferMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit_buffer() as buffer:
+            response = self.get_response(request)
+            if response.status_code >= 400:
+                discard_audit_entries(buffer)
+            return response
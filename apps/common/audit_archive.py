@@ -0,0 +1,326 @@
+"""
+Audit Archive
+=============
+Monthly, append-only archive files for audit rows moved out of the hot
+tables (easyaudit CRUDEvent, BOQ AuditLogEntry).
+
+Key Concepts:
+- Layout: AUDIT_ARCHIVE_DIR/<source>/<YYYY-MM>.jsonl.gz, one JSON record
+  per line, source "crud" or "erp" (as in apps.common.audit_feed)
+- Every archival run appends one gzip member per month file, records
+  sorted newest first; existing members are never rewritten, and gzip
+  readers see one stream
+- <YYYY-MM>.idx.json lists the members (byte offset, length, newest /
+  oldest record), so a page decompresses only the members that can hold
+  its rows, merged lazily newest first; decoded members are cached per
+  process (members are immutable)
+- Rows are appended (and fsynced) before they are deleted from the hot
+  table; a run interrupted in between leaves duplicates, which readers
+  drop by (timestamp, id)
+- manifest.json keeps the watermark: every hot row older than
+  `archived_before` lives in the archive, so the feed only opens archive
+  files when a page reaches below it
+- `manage.py archive_audit_logs` moves rows older than
+  AUDIT_HOT_RETENTION_DAYS
+"""
+
+import gzip
+import heapq
+import json
+import os
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from easyaudit.models import CRUDEvent
+
+from apps.boq.models import AuditLogEntry
+
+
+CRUD_SOURCE = "crud"
+ERP_SOURCE = "erp"
+SOURCES = (CRUD_SOURCE, ERP_SOURCE)
+
+MANIFEST = "manifest.json"
+
+
+def archive_dir():
+    return Path(getattr(settings, "AUDIT_ARCHIVE_DIR", settings.BASE_DIR / "var" / "audit_archive"))
+
+
+def _month_path(source, month):
+    return archive_dir() / source / f"{month}.jsonl.gz"
+
+
+def _index_path(source, month):
+    return archive_dir() / source / f"{month}.idx.json"
+
+
+def month_of(moment):
+    """Archive partition ("YYYY-MM", UTC) of a datetime."""
+    return moment.astimezone(dt_timezone.utc).strftime("%Y-%m")
+
+
+# -------------------------------
+# MANIFEST
+# -------------------------------
+def archive_watermark():
+    """Datetime below which audit rows live in the archive (None: no archive)."""
+    try:
+        manifest = json.loads((archive_dir() / MANIFEST).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+    return datetime.fromisoformat(manifest["archived_before"])
+
+
+def _write_watermark(before):
+    current = archive_watermark()
+    if current is not None and current >= before:
+        return
+    path = archive_dir() / MANIFEST
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"archived_before": before.isoformat()}))
+    os.replace(tmp, path)
+
+
+# -------------------------------
+# RECORDS
+# -------------------------------
+def crud_record(event):
+    return {
+        "id": event.pk,
+        "timestamp": event.datetime.isoformat(),
+        "event_type": event.event_type,
+        "content_type_id": event.content_type_id,
+        "content_type": f"{event.content_type.app_label}.{event.content_type.model}",
+        "object_id": event.object_id,
+        "object_repr": event.object_repr,
+        "object_json_repr": event.object_json_repr,
+        "changed_fields": event.changed_fields,
+        "user_id": event.user_id,
+        "username": event.user.username if event.user else None,
+    }
+
+
+def erp_record(entry):
+    return {
+        "id": entry.pk,
+        "timestamp": entry.timestamp.isoformat(),
+        "action": entry.action,
+        "details": entry.details,
+        "user_id": entry.user_id,
+        "username": entry.user.username if entry.user else None,
+    }
+
+
+ARCHIVED = {
+    CRUD_SOURCE: (CRUDEvent, "datetime", ("user", "content_type"), crud_record),
+    ERP_SOURCE: (AuditLogEntry, "timestamp", ("user",), erp_record),
+}
+
+
+# -------------------------------
+# WRITE
+# -------------------------------
+def _newest_first(records):
+    return sorted(
+        records, key=lambda r: (datetime.fromisoformat(r["timestamp"]), r["id"]), reverse=True
+    )
+
+
+def _bounds(records):
+    """[newest, oldest] (timestamp, id) of records sorted newest first."""
+    return [[r["timestamp"], r["id"]] for r in (records[0], records[-1])]
+
+
+def _read_index(source, month):
+    try:
+        return json.loads(_index_path(source, month).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def _write_index(source, month, members):
+    path = _index_path(source, month)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(members))
+    os.replace(tmp, path)
+
+
+def _append(source, month, records):
+    path = _month_path(source, month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    records = _newest_first(records)
+    payload = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
+    member = gzip.compress(payload.encode())
+
+    members = _read_index(source, month)
+    offset = path.stat().st_size if path.exists() else 0
+    if members is None:
+        members = []
+        if offset:
+            # File written before indexes: index its members as one range
+            legacy = [
+                {"timestamp": r["timestamp"].isoformat(), "id": r["id"]}
+                for r in _member_records(str(path), 0, offset)[1]
+            ]
+            if legacy:
+                members.append({"offset": 0, "length": offset, "bounds": _bounds(legacy)})
+
+    with open(path, "ab") as fh:
+        fh.write(member)
+        fh.flush()
+        os.fsync(fh.fileno())
+    # Indexed only once on disk; a crash in between leaves unindexed
+    # bytes, whose rows are still in the hot table
+    members.append({"offset": offset, "length": len(member), "bounds": _bounds(records)})
+    _write_index(source, month, members)
+
+
+def archive_audit_logs(before, batch_size=5000, dry_run=False):
+    """
+    Move audit rows older than `before` into the monthly archive files.
+
+    Returns:
+        dict source -> {month: rows archived}
+    """
+    report = {}
+    for source, (model, field, related, to_record) in ARCHIVED.items():
+        months = report.setdefault(source, {})
+        old_rows = model.objects.filter(**{f"{field}__lt": before})
+
+        if dry_run:
+            counts = (
+                old_rows.annotate(month=TruncMonth(field, tzinfo=dt_timezone.utc))
+                .values("month")
+                .annotate(rows=Count("pk"))
+                .order_by("month")
+            )
+            for row in counts:
+                months[month_of(row["month"])] = row["rows"]
+            continue
+
+        while True:
+            rows = list(old_rows.select_related(*related).order_by(field, "pk")[:batch_size])
+            if not rows:
+                break
+
+            by_month = {}
+            for row in rows:
+                by_month.setdefault(month_of(getattr(row, field)), []).append(to_record(row))
+            for month, records in by_month.items():
+                _append(source, month, records)
+                months[month] = months.get(month, 0) + len(records)
+
+            with transaction.atomic():
+                model.objects.filter(pk__in=[row.pk for row in rows]).delete()
+
+    if not dry_run:
+        archive_dir().mkdir(parents=True, exist_ok=True)
+        _write_watermark(before)
+    return report
+
+
+# -------------------------------
+# READ
+# -------------------------------
+def archived_months(source):
+    folder = archive_dir() / source
+    if not folder.exists():
+        return []
+    return sorted(
+        (path.name[:-len(".jsonl.gz")] for path in folder.glob("*.jsonl.gz")),
+        reverse=True,
+    )
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _sort_key(timestamp, pk):
+    """Ascending sort key of the newest-first (timestamp, id) order."""
+    return (-((timestamp - _EPOCH) // timedelta(microseconds=1)), -pk)
+
+
+@lru_cache(maxsize=64)
+def _member_records(path, offset, length):
+    """
+    Decoded records of one byte range of an archive file, newest first,
+    with their sort keys. Cached: indexed ranges never change.
+    """
+    with open(path, "rb") as fh:
+        fh.seek(offset)
+        data = gzip.decompress(fh.read(length))
+    records = []
+    for line in data.decode().splitlines():
+        record = json.loads(line)
+        record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+        records.append(record)
+    records.sort(key=lambda r: _sort_key(r["timestamp"], r["id"]))
+    return [_sort_key(r["timestamp"], r["id"]) for r in records], records
+
+
+def _month_members(source, month):
+    """(path, offset, length, newest key, oldest key) per member of one month file."""
+    path = _month_path(source, month)
+    members = _read_index(source, month)
+    if members is None:
+        # Legacy file: one range, opened at once
+        return [(str(path), 0, path.stat().st_size, None, None)]
+    result = []
+    for member in members:
+        newest, oldest = (
+            _sort_key(datetime.fromisoformat(timestamp), pk) for timestamp, pk in member["bounds"]
+        )
+        result.append((str(path), member["offset"], member["length"], newest, oldest))
+    return result
+
+
+def iter_month(source, month, before=None):
+    """
+    Records of one archive file, newest first, duplicates dropped, lazily:
+    a member is decompressed once the merge reaches its newest record.
+    Timestamps are parsed back into datetimes.
+
+    Args:
+        before: only records with timestamp <= before (a feed cursor)
+    """
+    start = _sort_key(before, float("inf")) if before else None
+    members = [
+        m for m in _month_members(source, month)
+        if start is None or m[4] is None or m[4] >= start
+    ]
+    members.sort(key=lambda m: (m[3] is not None, m[3] or ()))
+
+    heap = []
+    opened = 0
+    last = None
+    while True:
+        while opened < len(members) and (
+            not heap or members[opened][3] is None or members[opened][3] <= heap[0][0]
+        ):
+            keys, records = _member_records(*members[opened][:3])
+            position = bisect_left(keys, start) if start else 0
+            if position < len(keys):
+                heapq.heappush(heap, (keys[position], opened, position, keys, records))
+            opened += 1
+        if not heap:
+            return
+        key, member, position, keys, records = heap[0]
+        if key != last:
+            yield records[position]
+            last = key
+        if position + 1 < len(keys):
+            heapq.heapreplace(heap, (keys[position + 1], member, position + 1, keys, records))
+        else:
+            heapq.heappop(heap)
+
+
+def read_month(source, month):
+    """All records of one archive file, newest first (duplicates dropped)."""
+    return list(iter_month(source, month))
@@ -0,0 +1,366 @@
+"""
+Audit Feed
+==========
+One newest-first feed over easyaudit CRUDEvent rows and BOQ
+AuditLogEntry rows, paginated with a keyset cursor.
+
+Key Concepts:
+- Entries are ordered by (timestamp, source, id), descending; the cursor
+  is the key of the last entry of a page, so a page costs one indexed
+  range query per source whatever its depth
+- Each source is read with LIMIT page_size + 1 and the two sorted lists
+  are merged; the extra row tells whether another page exists
+- Filters (model group / content type, actor, action, date range) are
+  applied in SQL on both sources; a filter a source cannot match removes
+  it from the query instead of scanning it
+- Content type ids of the model groups are resolved once per process
+- Pages reaching below the archive watermark also read the monthly
+  archive files (apps.common.audit_archive), newest month first, with
+  the same filters and cursor; only the indexed members at or below the
+  cursor are decompressed
+"""
+
+import base64
+import heapq
+import json
+from datetime import datetime, time
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from easyaudit.models import CRUDEvent
+from rest_framework.exceptions import ValidationError
+
+from apps.boq.models import AuditLogEntry, BOQ, BOQItem
+from apps.common.audit_archive import (
+    CRUD_SOURCE,
+    ERP_SOURCE,
+    archive_watermark,
+    archived_months,
+    iter_month,
+    month_of,
+)
+from apps.masters.models import Product, Driver, Accessory
+from apps.projects.models import Project, Area
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# ?model= groups; AuditLogEntry rows (BOQ workflow) belong to "boq"
+MODEL_GROUPS = {
+    "product": (Product, Driver, Accessory),
+    "project": (Project, Area),
+    "boq": (BOQ, BOQItem),
+}
+ERP_MODEL_GROUPS = {"boq"}
+
+CRUD_ACTIONS = {str(label).upper(): value for value, label in CRUDEvent.TYPES}
+CRUD_LABELS = dict(CRUDEvent.TYPES)
+
+_content_type_ids = {}
+
+
+def model_group_content_type_ids(group):
+    ids = _content_type_ids.get(group)
+    if ids is None:
+        models = ContentType.objects.get_for_models(*MODEL_GROUPS[group]).values()
+        ids = _content_type_ids[group] = sorted(ct.pk for ct in models)
+    return ids
+
+
+# -------------------------------
+# CURSOR
+# -------------------------------
+def encode_cursor(key):
+    timestamp, source, pk = key
+    payload = json.dumps([timestamp.isoformat(), source, pk], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, source, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        timestamp = datetime.fromisoformat(timestamp)
+        if source not in (CRUD_SOURCE, ERP_SOURCE):
+            raise ValueError(source)
+        return timestamp, source, int(pk)
+    except (ValueError, TypeError):
+        raise ValidationError({"cursor": "Invalid cursor"})
+
+
+def _after_cursor(field, source, cursor):
+    """Rows of `source` sorting strictly after `cursor` (descending order)."""
+    timestamp, cursor_source, pk = cursor
+    if source < cursor_source:
+        return Q(**{f"{field}__lte": timestamp})
+    if source > cursor_source:
+        return Q(**{f"{field}__lt": timestamp})
+    return Q(**{f"{field}__lt": timestamp}) | Q(**{field: timestamp, "pk__lt": pk})
+
+
+# -------------------------------
+# FILTERS
+# -------------------------------
+def _parse_bound(value, name, end=False):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({name: "Expected an ISO date or datetime"})
+        moment = datetime.combine(day, time.max if end else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class FeedFilter:
+    """
+    Feed filters, applied in SQL to the hot tables and in Python to
+    archived records. A source the filters exclude is not read at all.
+
+    Params (all optional):
+        model         product | project | boq
+        content_type  "app_label.model" (CRUD events only)
+        actor         user id
+        action        CREATE / UPDATE / DELETE / ... or an AuditLogEntry action
+        date_from     ISO date or datetime (inclusive)
+        date_to       ISO date or datetime (inclusive)
+    """
+    def __init__(self, params):
+        self.crud = self.erp = True
+        self.content_type_ids = None
+        self.actor_id = None
+        self.event_type = None
+        self.action = None
+
+        model = params.get("model")
+        if model:
+            if model not in MODEL_GROUPS:
+                self.crud = self.erp = False
+            else:
+                self.content_type_ids = set(model_group_content_type_ids(model))
+                self.erp = model in ERP_MODEL_GROUPS
+
+        content_type = params.get("content_type")
+        if content_type:
+            app_label, _, model_name = content_type.partition(".")
+            try:
+                ct = ContentType.objects.get_by_natural_key(app_label, model_name)
+            except ContentType.DoesNotExist:
+                raise ValidationError({"content_type": "Unknown content type"})
+            ids = {ct.pk}
+            if self.content_type_ids is not None:
+                ids &= self.content_type_ids
+            self.content_type_ids = ids
+            self.erp = False
+
+        actor = params.get("actor")
+        if actor:
+            if not str(actor).isdigit():
+                raise ValidationError({"actor": "Expected a user id"})
+            self.actor_id = int(actor)
+
+        action = params.get("action")
+        if action:
+            action = action.upper()
+            if action in CRUD_ACTIONS:
+                self.event_type = CRUD_ACTIONS[action]
+                self.erp = False
+            else:
+                self.action = action
+                self.crud = False
+
+        date_from = params.get("date_from")
+        date_to = params.get("date_to")
+        self.date_from = _parse_bound(date_from, "date_from") if date_from else None
+        self.date_to = _parse_bound(date_to, "date_to", end=True) if date_to else None
+
+    # SQL (hot tables)
+    def crud_queryset(self):
+        if not self.crud:
+            return None
+        events = CRUDEvent.objects.all()
+        if self.content_type_ids is not None:
+            events = events.filter(content_type_id__in=sorted(self.content_type_ids))
+        if self.event_type is not None:
+            events = events.filter(event_type=self.event_type)
+        return self._common(events, "datetime")
+
+    def erp_queryset(self):
+        if not self.erp:
+            return None
+        entries = AuditLogEntry.objects.all()
+        if self.action is not None:
+            entries = entries.filter(action=self.action)
+        return self._common(entries, "timestamp")
+
+    def _common(self, queryset, field):
+        if self.actor_id is not None:
+            queryset = queryset.filter(user_id=self.actor_id)
+        if self.date_from is not None:
+            queryset = queryset.filter(**{f"{field}__gte": self.date_from})
+        if self.date_to is not None:
+            queryset = queryset.filter(**{f"{field}__lte": self.date_to})
+        return queryset
+
+    # Python (archived records)
+    def matches(self, source, record):
+        if self.actor_id is not None and record["user_id"] != self.actor_id:
+            return False
+        if self.date_from is not None and record["timestamp"] < self.date_from:
+            return False
+        if self.date_to is not None and record["timestamp"] > self.date_to:
+            return False
+        if source == CRUD_SOURCE:
+            if self.content_type_ids is not None and record["content_type_id"] not in self.content_type_ids:
+                return False
+            return self.event_type is None or record["event_type"] == self.event_type
+        return self.action is None or record["action"] == self.action
+
+
+# -------------------------------
+# ENTRIES
+# -------------------------------
+def _crud_entry(log):
+    return {
+        "source": CRUD_SOURCE,
+        "id": log.pk,
+        "action": log.get_event_type_display().upper(),
+        "actor": log.user.username if log.user else "System",
+        "timestamp": log.datetime.strftime("%d %b %Y, %H:%M"),
+        "object": f"{log.content_type.model.title()}: {log.object_repr}",
+        "archived": False,
+    }
+
+
+def _erp_entry(log):
+    return {
+        "source": ERP_SOURCE,
+        "id": log.pk,
+        "action": log.action.upper(),
+        "actor": log.user.username if log.user else "System",
+        "timestamp": log.timestamp.strftime("%d %b %Y, %H:%M"),
+        "object": log.details.get('item_reference', f"BOQ v{log.details.get('version', 'Unknown')}"),
+        "archived": False,
+    }
+
+
+def _archived_crud_entry(record):
+    model = record["content_type"].partition(".")[2]
+    return {
+        "source": CRUD_SOURCE,
+        "id": record["id"],
+        "action": str(CRUD_LABELS.get(record["event_type"], "")).upper(),
+        "actor": record["username"] or "System",
+        "timestamp": record["timestamp"].strftime("%d %b %Y, %H:%M"),
+        "object": f"{model.title()}: {record['object_repr']}",
+        "archived": True,
+    }
+
+
+def _archived_erp_entry(record):
+    details = record["details"]
+    return {
+        "source": ERP_SOURCE,
+        "id": record["id"],
+        "action": record["action"].upper(),
+        "actor": record["username"] or "System",
+        "timestamp": record["timestamp"].strftime("%d %b %Y, %H:%M"),
+        "object": details.get('item_reference', f"BOQ v{details.get('version', 'Unknown')}"),
+        "archived": True,
+    }
+
+
+# -------------------------------
+# PAGE
+# -------------------------------
+def _hot_rows(feed_filter, cursor, limit):
+    streams = []
+    crud = feed_filter.crud_queryset()
+    if crud is not None:
+        if cursor:
+            crud = crud.filter(_after_cursor("datetime", CRUD_SOURCE, cursor))
+        rows = crud.select_related("user", "content_type").order_by("-datetime", "-pk")
+        streams.append([
+            ((log.datetime, CRUD_SOURCE, log.pk), log, _crud_entry)
+            for log in rows[:limit]
+        ])
+    erp = feed_filter.erp_queryset()
+    if erp is not None:
+        if cursor:
+            erp = erp.filter(_after_cursor("timestamp", ERP_SOURCE, cursor))
+        rows = erp.select_related("user").order_by("-timestamp", "-pk")
+        streams.append([
+            ((log.timestamp, ERP_SOURCE, log.pk), log, _erp_entry)
+            for log in rows[:limit]
+        ])
+    return streams
+
+
+def _archived_rows(source, feed_filter, cursor, limit):
+    """Newest-first archived records of one source, month file by month file."""
+    entry = _archived_crud_entry if source == CRUD_SOURCE else _archived_erp_entry
+    before = min(
+        (moment for moment in (cursor and cursor[0], feed_filter.date_to) if moment),
+        default=None,
+    )
+    newest = month_of(before) if before else None
+    oldest = month_of(feed_filter.date_from) if feed_filter.date_from else None
+
+    rows = []
+    for month in archived_months(source):
+        if newest and month > newest:
+            continue
+        if oldest and month < oldest:
+            break
+        for record in iter_month(source, month, before=before):
+            if feed_filter.date_from and record["timestamp"] < feed_filter.date_from:
+                return rows
+            key = (record["timestamp"], source, record["id"])
+            if cursor and not key < cursor:
+                continue
+            if feed_filter.matches(source, record):
+                rows.append((key, record, entry))
+                if len(rows) == limit:
+                    return rows
+    return rows
+
+
+def _needs_archive(feed_filter, merged, limit):
+    watermark = archive_watermark()
+    if watermark is None:
+        return False
+    if feed_filter.date_from is not None and feed_filter.date_from >= watermark:
+        return False
+    # Archived rows are all older than the watermark
+    return len(merged) < limit or merged[limit - 1][0][0] < watermark
+
+
+def audit_feed_page(params, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    One page of the merged feed, spanning hot tables and archive files.
+
+    Returns:
+        dict with results, next_cursor (None on the last page) and has_more
+    """
+    feed_filter = FeedFilter(params)
+    cursor = decode_cursor(cursor) if cursor else None
+    limit = page_size + 1
+
+    streams = _hot_rows(feed_filter, cursor, limit)
+    merged = list(heapq.merge(*streams, key=lambda row: row[0], reverse=True))
+    if _needs_archive(feed_filter, merged, limit):
+        for source, enabled in ((CRUD_SOURCE, feed_filter.crud), (ERP_SOURCE, feed_filter.erp)):
+            if enabled:
+                streams.append(_archived_rows(source, feed_filter, cursor, limit))
+        merged = list(heapq.merge(*streams, key=lambda row: row[0], reverse=True))
+
+    page = merged[:page_size]
+    has_more = len(merged) > page_size
+    return {
+        "results": [entry(row) for _, row, entry in page],
+        "next_cursor": encode_cursor(page[-1][0]) if has_more else None,
+        "has_more": has_more,
+    }
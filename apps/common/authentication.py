@@ -1,9 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from apps.common.cache import cache_is_shared
+from apps.common.jwt_serializers import ACCESS_STAMP_CLAIM, ROLES_CLAIM
+from apps.rbac.access import access_stamp
+
+
+class ClaimsUser(TokenUser):
+    """
+    Request user built from the signed claims of an ERP access token
+    (apps.common.jwt_serializers); no User row behind it.
+    """
+    @cached_property
+    def id(self):
+        # Claims carry the id as a string; same type as User.pk
+        return get_user_model()._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @property
+    def roles(self):
+        return frozenset(self.token.get(ROLES_CLAIM, ()))
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication without a User query for read requests.
+
+    GET / HEAD / OPTIONS requests get a ClaimsUser while the token's
+    access stamp matches the current role / permission versions
+    (apps.rbac.access). Writes, stale stamps and tokens issued without a
+    stamp load the User row as usual, and so does every request when the
+    versions are not kept in a shared cache (apps.common.cache).
+    """
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_request_user(request, validated_token), validated_token
+
+    def get_request_user(self, request, validated_token):
+        if request.method in SAFE_METHODS and self.has_fresh_stamp(validated_token):
+            return ClaimsUser(validated_token)
+        return self.get_user(validated_token)
+
+    def has_fresh_stamp(self, validated_token):
+        stamp = validated_token.get(ACCESS_STAMP_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if stamp is None or user_id is None or not cache_is_shared():
+            return False
+        return stamp == access_stamp(user_id)
+
 
 class QueryParamJWTAuthentication(JWTAuthentication):
     """
     Allow JWT authentication via 'token' query parameter.
     Used for file exports (PDF/Excel) where headers cannot be set easily in window.open.
+
+    Always resolves the User row: exports write audit entries for the user.
     """
     def authenticate(self, request):
         token = request.query_params.get('token')
@@ -0,0 +1,31 @@
+"""
+Shared Cache
+============
+Whether the default Django cache is visible to every worker process.
+
+Key Concepts:
+- Cross-worker invalidation (generation / version counters in
+  apps.masters.services.compatibility_cache and apps.rbac.access) only
+  holds when every process reads the same cache
+- LocMemCache (Django's default) is per process and DummyCache stores
+  nothing, so neither counts as shared
+- SHARED_CACHE overrides the guess: True for a single-process
+  deployment (or tests), False to switch the caches off
+- Callers fail closed: without a shared cache they compute / load from
+  the database every time
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+PER_PROCESS_BACKENDS = (LocMemCache, DummyCache)
+
+
+def cache_is_shared():
+    shared = getattr(settings, "SHARED_CACHE", None)
+    if shared is not None:
+        return shared
+    return not isinstance(caches["default"], PER_PROCESS_BACKENDS)
@@ -0,0 +1,56 @@
+"""
+JWT Claims
+==========
+Token serializers signing the user's identity and roles into the token,
+read back by StatelessJWTAuthentication (apps.common.authentication).
+
+Key Concepts:
+- Claims: username, email, is_staff, is_superuser, roles and
+  access_stamp (apps.rbac.access.access_stamp at issue time)
+- The stamp is read before the roles: a change landing in between makes
+  the token stale (DB fallback), never over-privileged
+- Refreshing re-reads the user, so a refreshed access token carries the
+  current roles and stamp again
+"""
+
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.rbac.access import access_stamp, get_user_access
+
+
+ACCESS_STAMP_CLAIM = "access_stamp"
+ROLES_CLAIM = "roles"
+
+
+def add_access_claims(token, user):
+    token[ACCESS_STAMP_CLAIM] = access_stamp(user.pk)
+    token["username"] = user.get_username()
+    token["email"] = user.email
+    token["is_staff"] = user.is_staff
+    token["is_superuser"] = user.is_superuser
+    token[ROLES_CLAIM] = sorted(get_user_access(user).roles)
+    return token
+
+
+class ERPTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_access_claims(super().get_token(user), user)
+
+
+class ERPTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+
+        access = AccessToken(data["access"])
+        user = get_user_model().objects.get(
+            **{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]}
+        )
+        data["access"] = str(add_access_claims(access, user))
+        return data
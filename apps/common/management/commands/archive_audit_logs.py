@@ -0,0 +1,73 @@
+"""
+Move old audit rows (easyaudit CRUD events, BOQ audit entries) from the
+hot tables into monthly compressed archive files.
+
+Usage:
+    python manage.py archive_audit_logs                     # older than AUDIT_HOT_RETENTION_DAYS
+    python manage.py archive_audit_logs --days 30
+    python manage.py archive_audit_logs --before 2026-01-01
+    python manage.py archive_audit_logs --dry-run           # count only
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.common.audit_archive import archive_audit_logs, archive_dir
+
+
+class Command(BaseCommand):
+    help = "Archive audit log rows older than the hot retention window"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="Keep this many days in the hot tables (default AUDIT_HOT_RETENTION_DAYS)",
+        )
+        parser.add_argument(
+            "--before",
+            default=None,
+            help="Archive rows older than this date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows moved per batch",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be archived without moving anything",
+        )
+
+    def handle(self, *args, **options):
+        if options["before"]:
+            day = parse_date(options["before"])
+            if day is None:
+                raise CommandError("--before expects YYYY-MM-DD")
+            before = timezone.make_aware(datetime.combine(day, time.min))
+        else:
+            days = options["days"]
+            if days is None:
+                days = getattr(settings, "AUDIT_HOT_RETENTION_DAYS", 90)
+            before = timezone.now() - timedelta(days=days)
+
+        report = archive_audit_logs(
+            before, batch_size=options["batch_size"], dry_run=options["dry_run"]
+        )
+
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        total = 0
+        for source, months in report.items():
+            for month, rows in sorted(months.items()):
+                total += rows
+                self.stdout.write(f"{verb} {rows} {source} rows of {month}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {total} audit rows older than {before.isoformat()} into {archive_dir()}"
+        ))
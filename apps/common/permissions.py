@@ -1,9 +1,13 @@
 from rest_framework import permissions
 
+from apps.rbac.access import get_user_access
+
 class BaseRolePermission(permissions.BasePermission):
     """
     Base class for role-based permissions checking Django Groups.
     Blocks DELETE for everyone.
+
+    Roles are read from the cached per-user access (apps.rbac.access).
     """
     role_name = None
 
@@ -22,7 +26,7 @@ class BaseRolePermission(permissions.BasePermission):
         if not self.role_name:
             return False
 
-        return request.user.groups.filter(name=self.role_name).exists()
+        return get_user_access(request.user).has_role(self.role_name)
 
 class IsAdmin(BaseRolePermission):
     role_name = 'Admin'
@@ -48,7 +52,7 @@ class IsAdminOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return request.user and request.user.is_authenticated
         
-        return request.user and (request.user.is_superuser or request.user.groups.filter(name='Admin').exists())
+        return request.user and (request.user.is_superuser or get_user_access(request.user).has_role('Admin'))
 
 class IsEditor(permissions.BasePermission):
     """
@@ -65,7 +69,7 @@ class IsEditor(permissions.BasePermission):
         if request.user.is_superuser:
             return True
             
-        return request.user.groups.filter(name__in=['Admin', 'Sales']).exists()
+        return get_user_access(request.user).has_role('Admin', 'Sales')
 
 class IsEditorOrReadOnly(permissions.BasePermission):
     """
@@ -82,4 +86,4 @@ class IsEditorOrReadOnly(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
             
-        return request.user.is_superuser or request.user.groups.filter(name__in=['Admin', 'Sales']).exists()
+        return request.user.is_superuser or get_user_access(request.user).has_role('Admin', 'Sales')
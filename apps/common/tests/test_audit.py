@@ -0,0 +1,91 @@
+import json
+
+import pytest
+from django.contrib.auth.models import Group, User
+from django.http import HttpResponse
+from django.test import RequestFactory
+from easyaudit.models import CRUDEvent
+
+from apps.boq.models import AuditLogEntry
+from apps.common.audit import (
+    AuditBufferMiddleware,
+    audit_buffer,
+    collapse_crud_events,
+    record_audit,
+)
+
+
+@pytest.mark.django_db
+def test_buffered_writes_are_flushed_in_bulk_and_collapsed(django_capture_on_commit_callbacks):
+    user = User.objects.create_user("auditor", password="x")
+    CRUDEvent.objects.all().delete()
+
+    with audit_buffer():
+        with django_capture_on_commit_callbacks(execute=True):
+            # easyaudit logs each save from on_commit
+            groups = [Group.objects.create(name=f"Team {n}") for n in range(25)]
+            User.objects.create_user("helper", password="x")
+            for group in groups:
+                group.name += " (renamed)"
+                group.save()
+        record_audit("BOQ_APPROVED", user=user, details={"boq_id": 1})
+        record_audit("PRICE UPDATE", details={"boq_id": 1})
+
+        assert not AuditLogEntry.objects.exists()
+        assert not CRUDEvent.objects.exists()
+
+    assert list(AuditLogEntry.objects.order_by("id").values_list("action", "user_id")) == [
+        ("BOQ_APPROVED", user.pk),
+        ("PRICE UPDATE", None),
+    ]
+
+    summary = CRUDEvent.objects.get(content_type__model="group", event_type=CRUDEvent.CREATE)
+    assert summary.object_repr == "25 objects (bulk)"
+    assert sorted(
+        (obj["pk"], obj["fields"]["name"]) for obj in json.loads(summary.object_json_repr)
+    ) == sorted((g.pk, f"Team {n}") for n, g in enumerate(groups))
+    # Updates keep their own event (and changed_fields)
+    updates = CRUDEvent.objects.filter(content_type__model="group", event_type=CRUDEvent.UPDATE)
+    assert updates.count() == 25
+    assert all("name" in json.loads(event.changed_fields) for event in updates)
+    assert CRUDEvent.objects.get(content_type__model="user").object_repr == "helper"
+
+
+@pytest.mark.django_db
+def test_record_audit_writes_at_once_outside_a_buffer():
+    record_audit("BOQ_GENERATED", details={"boq_id": 1})
+    assert AuditLogEntry.objects.filter(action="BOQ_GENERATED", user=None).count() == 1
+
+
+@pytest.mark.django_db
+def test_failed_requests_drop_their_audit_entries():
+    def view(status):
+        def get_response(request):
+            record_audit("BOQ_APPROVED", details={"status": status})
+            return HttpResponse(status=status)
+        return AuditBufferMiddleware(get_response)
+
+    def crash(request):
+        record_audit("BOQ_APPROVED", details={"status": 500})
+        raise RuntimeError("boom")
+
+    request = RequestFactory().post("/")
+    view(200)(request)
+    view(400)(request)
+    with pytest.raises(RuntimeError):
+        AuditBufferMiddleware(crash)(request)
+
+    assert list(AuditLogEntry.objects.values_list("details", flat=True)) == [{"status": 200}]
+
+
+def test_only_groups_above_the_threshold_collapse():
+    def created(count):
+        return [
+            CRUDEvent(event_type=CRUDEvent.CREATE, content_type_id=1, object_id=str(n),
+                      object_json_repr=json.dumps([{"pk": n}]))
+            for n in range(count)
+        ]
+
+    assert len(collapse_crud_events(created(3), threshold=3)) == 3
+    (summary,) = collapse_crud_events(created(4), threshold=3)
+    assert summary.object_repr == "4 objects (bulk)"
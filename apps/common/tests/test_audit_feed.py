@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from easyaudit.models import CRUDEvent
+from rest_framework.test import APIClient
+
+from apps.boq.models import AuditLogEntry
+from apps.common.audit_archive import (
+    _member_records,
+    archive_audit_logs,
+    iter_month,
+    read_month,
+)
+from apps.masters.models import Product
+
+
+BASE = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def feed(settings, tmp_path):
+    """Interleaved CRUD events and BOQ entries, some sharing a timestamp."""
+    settings.AUDIT_ARCHIVE_DIR = tmp_path / "audit_archive"
+    auditor = User.objects.create_user("auditor", password="x")
+    CRUDEvent.objects.all().delete()
+
+    product_ct = ContentType.objects.get_for_model(Product)
+    for minute in range(7):
+        event = CRUDEvent.objects.create(
+            event_type=CRUDEvent.UPDATE, object_id=str(minute), content_type=product_ct,
+            object_repr=f"P{minute}", user=auditor if minute % 2 else None,
+        )
+        entry = AuditLogEntry.objects.create(
+            action="BOQ_APPROVED" if minute % 3 else "PRICE UPDATE",
+            user=auditor, details={"version": minute},
+        )
+        CRUDEvent.objects.filter(pk=event.pk).update(datetime=BASE + timedelta(minutes=minute))
+        AuditLogEntry.objects.filter(pk=entry.pk).update(
+            timestamp=BASE + timedelta(minutes=minute - minute % 2)
+        )
+
+    client = APIClient()
+    client.force_authenticate(auditor)
+    return client, auditor
+
+
+def scroll(client, **params):
+    entries, cursor = [], None
+    while True:
+        query = dict(params, page_size=3, **({"cursor": cursor} if cursor else {}))
+        page = client.get("/api/common/audit/logs/", query).json()
+        entries += [(e["source"], e["id"]) for e in page["results"]]
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            return entries
+
+
+@pytest.mark.django_db
+def test_feed_pages_through_both_sources_in_order(feed):
+    client, _ = feed
+
+    expected = sorted(
+        [(e.datetime, "crud", e.pk) for e in CRUDEvent.objects.all()]
+        + [(e.timestamp, "erp", e.pk) for e in AuditLogEntry.objects.all()],
+        reverse=True,
+    )
+    assert scroll(client) == [(source, pk) for _, source, pk in expected]
+
+
+@pytest.mark.django_db
+def test_feed_filters(feed):
+    client, auditor = feed
+
+    assert {source for source, _ in scroll(client, model="product")} == {"crud"}
+    assert len(scroll(client, action="boq_approved")) == 4
+    assert len(scroll(client, action="update")) == 7
+    assert len(scroll(client, actor=auditor.pk, model="product")) == 3
+
+    window = scroll(client, date_from=(BASE + timedelta(minutes=2)).isoformat(),
+                    date_to=(BASE + timedelta(minutes=3)).isoformat())
+    assert sorted(source for source, _ in window) == ["crud", "crud", "erp", "erp"]
+
+    response = client.get("/api/common/audit/logs/", {"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_feed_spans_archived_months(feed, settings):
+    client, auditor = feed
+    everything = scroll(client)
+    approvals = scroll(client, action="BOQ_APPROVED", actor=auditor.pk)
+
+    report = archive_audit_logs(BASE + timedelta(minutes=4), dry_run=True)
+    assert report == {"crud": {"2026-01": 4}, "erp": {"2026-01": 4}}
+    assert CRUDEvent.objects.count() == 7
+
+    archive_audit_logs(BASE + timedelta(minutes=4), batch_size=3)
+    assert CRUDEvent.objects.count() == 3
+    assert AuditLogEntry.objects.count() == 3
+    assert (settings.AUDIT_ARCHIVE_DIR / "crud" / "2026-01.jsonl.gz").exists()
+
+    assert scroll(client) == everything
+    assert scroll(client, action="BOQ_APPROVED", actor=auditor.pk) == approvals
+
+    call_command("archive_audit_logs", before="2026-02-01", stdout=StringIO())
+    assert not CRUDEvent.objects.exists()
+    assert scroll(client) == everything
+    page = client.get("/api/common/audit/logs/", {"page_size": 1}).json()
+    assert page["results"][0]["archived"] is True
+
+
+@pytest.mark.django_db
+def test_archive_months_are_indexed_and_read_lazily(feed, settings):
+    client, _ = feed
+    # Late on Jan 31 in UTC, February in the site time zone
+    settings.TIME_ZONE = "Asia/Kolkata"
+    CRUDEvent.objects.filter(object_id="6").update(datetime=datetime(2026, 1, 31, 20, 0, tzinfo=timezone.utc))
+    everything = scroll(client)
+
+    before = datetime(2026, 2, 2, tzinfo=timezone.utc)
+    expected = {"crud": {"2026-01": 7}, "erp": {"2026-01": 7}}
+    assert archive_audit_logs(before, dry_run=True) == expected
+    assert archive_audit_logs(before, batch_size=3) == expected
+
+    index = settings.AUDIT_ARCHIVE_DIR / "crud" / "2026-01.idx.json"
+    assert index.exists()
+    records = read_month("crud", "2026-01")
+    keys = [(r["timestamp"], r["id"]) for r in records]
+    assert keys == sorted(keys, reverse=True) and len(keys) == 7
+
+    # Newest record: only the member holding it is decompressed
+    _member_records.cache_clear()
+    assert next(iter_month("crud", "2026-01"))["id"] == records[0]["id"]
+    assert _member_records.cache_info().currsize == 1
+    cursor = records[3]["timestamp"]
+    assert [r["id"] for r in iter_month("crud", "2026-01", before=cursor)] == (
+        [r["id"] for r in records if r["timestamp"] <= cursor]
+    )
+
+    # File written before indexes: read whole, then indexed as one range
+    index.unlink()
+    assert read_month("crud", "2026-01") == records
+    CRUDEvent.objects.create(
+        event_type=CRUDEvent.CREATE, object_id="7", content_type=ContentType.objects.get_for_model(Product),
+        object_repr="P7", datetime=BASE,
+    )
+    CRUDEvent.objects.filter(object_id="7").update(datetime=BASE - timedelta(minutes=1))
+    archive_audit_logs(before)
+    assert index.exists()
+    assert [r["id"] for r in read_month("crud", "2026-01")][:7] == [r["id"] for r in records]
+    assert len(read_month("crud", "2026-01")) == 8
+    assert scroll(client)[:len(everything)] == everything
@@ -5,3 +5,6 @@ class ConfigurationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.configurations'
     label = 'configurations'
+
+    def ready(self):
+        from apps.configurations import signals  # noqa: F401
@@ -0,0 +1,81 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_versions(apps, schema_editor):
+    """
+    Existing versions are full snapshots: each row is superseded by the
+    next version of its (project, area), and every version gets a header.
+    """
+    LightingConfiguration = apps.get_model("configurations", "LightingConfiguration")
+    ConfigurationVersion = apps.get_model("configurations", "ConfigurationVersion")
+
+    counts = {}
+    rows = LightingConfiguration.objects.values_list(
+        "project_id", "area_id", "configuration_version"
+    ).iterator()
+    for key in rows:
+        counts[key] = counts.get(key, 0) + 1
+
+    versions = {}
+    for project_id, area_id, version in counts:
+        versions.setdefault((project_id, area_id), []).append(version)
+
+    headers = []
+    for (project_id, area_id), numbers in versions.items():
+        numbers.sort()
+        for parent, version, successor in zip([None] + numbers, numbers, numbers[1:] + [None]):
+            headers.append(ConfigurationVersion(
+                project_id=project_id,
+                area_id=area_id,
+                version=version,
+                parent_version=parent,
+                line_count=counts[(project_id, area_id, version)],
+                written_count=counts[(project_id, area_id, version)],
+            ))
+            if successor is not None:
+                LightingConfiguration.objects.filter(
+                    project_id=project_id,
+                    area_id=area_id,
+                    configuration_version=version,
+                ).update(superseded_in_version=successor, is_active=False)
+    ConfigurationVersion.objects.bulk_create(headers, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configurations', '0001_initial'),
+        ('projects', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfigurationVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('parent_version', models.PositiveIntegerField(blank=True, null=True)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('written_count', models.PositiveIntegerField(default=0)),
+                ('removed_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('area', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='configuration_versions', to='projects.area')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='configuration_versions', to='projects.project')),
+            ],
+            options={
+                'ordering': ['project', 'area', 'version'],
+                'constraints': [models.UniqueConstraint(fields=('project', 'area', 'version'), name='uniq_configuration_version_per_area')],
+            },
+        ),
+        migrations.AddField(
+            model_name='lightingconfiguration',
+            name='superseded_in_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='lightingconfiguration',
+            index=models.Index(fields=['project', 'area', 'superseded_in_version'], name='configurati_project_4626d0_idx'),
+        ),
+        migrations.RunPython(backfill_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+import hashlib
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_snapshots(apps, schema_editor):
+    """
+    Serialize every existing version (same layout and hash as
+    apps.configurations.services.snapshots).
+    """
+    LightingConfiguration = apps.get_model("configurations", "LightingConfiguration")
+    ConfigurationDriver = apps.get_model("configurations", "ConfigurationDriver")
+    ConfigurationAccessory = apps.get_model("configurations", "ConfigurationAccessory")
+    ConfigurationSnapshot = apps.get_model("configurations", "ConfigurationSnapshot")
+    ConfigurationVersion = apps.get_model("configurations", "ConfigurationVersion")
+
+    drivers, accessories = {}, {}
+    for config_id, driver_id, quantity in ConfigurationDriver.objects.values_list(
+        "configuration_id", "driver_id", "quantity"
+    ).iterator():
+        drivers.setdefault(config_id, []).append([driver_id, quantity])
+    for config_id, accessory_id, quantity in ConfigurationAccessory.objects.values_list(
+        "configuration_id", "accessory_id", "quantity"
+    ).iterator():
+        accessories.setdefault(config_id, []).append([accessory_id, quantity])
+
+    rows = {}
+    for row in LightingConfiguration.objects.order_by("id").values_list(
+        "id", "project_id", "area_id", "product_id", "quantity",
+        "configuration_version", "superseded_in_version",
+    ).iterator():
+        rows.setdefault((row[1], row[2]), []).append(row)
+
+    snapshots = {s.content_hash: s for s in ConfigurationSnapshot.objects.all()}
+    for header in ConfigurationVersion.objects.filter(snapshot__isnull=True).iterator():
+        lines = {}
+        for config_id, _, _, product_id, quantity, version, superseded in rows.get(
+            (header.project_id, header.area_id), []
+        ):
+            if version > header.version or (superseded is not None and superseded <= header.version):
+                continue
+            if product_id in lines:
+                continue
+            lines[product_id] = {
+                "product_id": product_id,
+                "quantity": quantity,
+                "drivers": sorted(drivers.get(config_id, [])),
+                "accessories": sorted(accessories.get(config_id, [])),
+            }
+        lines = [lines[pk] for pk in sorted(lines)]
+        digest = hashlib.sha256(
+            json.dumps(lines, sort_keys=True, separators=(",", ":")).encode()
+        ).hexdigest()
+        if digest not in snapshots:
+            snapshots[digest] = ConfigurationSnapshot.objects.create(
+                content_hash=digest, lines=lines, line_count=len(lines)
+            )
+        header.snapshot = snapshots[digest]
+        header.save(update_fields=["snapshot"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configurations', '0002_configuration_copy_on_write'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfigurationSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('lines', models.JSONField()),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='configurationversion',
+            name='snapshot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='versions', to='configurations.configurationsnapshot'),
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
@@ -52,7 +52,11 @@ class LightingConfiguration(models.Model):
     )
     
     # ERP Versioning Fields
+    # A row belongs to every version from configuration_version up to
+    # (excluding) superseded_in_version: unchanged lines are shared
+    # between versions instead of copied (see services.versioning).
     configuration_version = models.PositiveIntegerField(default=1)
+    superseded_in_version = models.PositiveIntegerField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
     
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
@@ -69,6 +73,7 @@ class LightingConfiguration(models.Model):
         indexes = [
             models.Index(fields=['project', 'area', 'is_active']),
             models.Index(fields=['project', 'area', 'configuration_version']),
+            models.Index(fields=['project', 'area', 'superseded_in_version']),
         ]
         # Database-level constraints removed: cannot reference joined fields like project__inquiry_type.
         # Business rule is enforced at the model level in clean().
@@ -95,6 +100,69 @@ class LightingConfiguration(models.Model):
         )
 
 
+class ConfigurationSnapshot(models.Model):
+    """
+    Serialized, content-addressed lines of a configuration version
+    (see services.snapshots). Identical contents share one row.
+    """
+    content_hash = models.CharField(max_length=64, unique=True)
+    lines = models.JSONField()
+    line_count = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.line_count} lines)"
+
+
+class ConfigurationVersion(models.Model):
+    """
+    Header of one configuration version of a (project, area).
+
+    A version may write no LightingConfiguration row at all (e.g. only
+    removals), so version numbers are allocated here.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="configuration_versions")
+    area = models.ForeignKey(
+        Area,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="configuration_versions"
+    )
+    version = models.PositiveIntegerField()
+    parent_version = models.PositiveIntegerField(null=True, blank=True)
+
+    # Complete content of this version; cleared when rows of the latest
+    # version are edited outside create_configuration_version
+    snapshot = models.ForeignKey(
+        ConfigurationSnapshot,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="versions"
+    )
+
+    # Lines in the snapshot / rows written / lines dropped by this version
+    line_count = models.PositiveIntegerField(default=0)
+    written_count = models.PositiveIntegerField(default=0)
+    removed_count = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['project', 'area', 'version'],
+                name='uniq_configuration_version_per_area',
+            ),
+        ]
+        ordering = ['project', 'area', 'version']
+
+    def __str__(self):
+        return f"{self.project_id}/{self.area_id or 'Project-Level'} v{self.version}"
+
+
 class ConfigurationAccessory(models.Model):
     """
     Immutable accessory records linked to configuration versions.
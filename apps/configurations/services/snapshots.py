@@ -0,0 +1,232 @@
+"""
+Configuration Snapshots
+=======================
+Serialized, hash-addressed content of configuration versions.
+
+Key Concepts:
+- A snapshot is the list of lines of one (project, area) version:
+  {"product_id", "quantity", "drivers": [[id, qty]], "accessories": [[id, qty]]}
+  sorted by product, so equal contents serialize (and hash) equally
+- Written by create_configuration_version; versions are append-only, so
+  a snapshot stays valid forever and identical contents share one row
+- Rows of the latest version edited outside the versioning service
+  (plain CRUD endpoints, admin) clear its snapshot pointer
+  (apps.configurations.signals); readers then rebuild the lines from the
+  rows, with the same layout and hash
+- project_content_hash() combines the active snapshots of a project;
+  BOQ generation stores it to detect duplicate BOQs
+"""
+
+import hashlib
+import json
+
+from django.db.models import Q
+
+from apps.configurations.models import (
+    LightingConfiguration,
+    ConfigurationSnapshot,
+    ConfigurationVersion,
+)
+
+
+# -------------------------------
+# LINES / HASH
+# -------------------------------
+def _line(product_id, quantity, drivers, accessories):
+    return {
+        "product_id": int(product_id),
+        "quantity": int(quantity),
+        "drivers": sorted([int(pk), int(qty)] for pk, qty in drivers),
+        "accessories": sorted([int(pk), int(qty)] for pk, qty in accessories),
+    }
+
+
+def lines_from_request(products_data):
+    """Lines of a save_batch payload (same defaults as create_configuration_version)."""
+    lines = []
+    for prod_data in products_data:
+        quantity = prod_data.get("quantity", 1)
+        driver_id = prod_data.get("driver_id")
+        lines.append(_line(
+            prod_data["product_id"],
+            quantity,
+            [(driver_id, quantity)] if driver_id else [],
+            [(a.get("accessory_id"), a.get("quantity", 1)) for a in prod_data.get("accessories", [])],
+        ))
+    return sorted(lines, key=lambda line: line["product_id"])
+
+
+def lines_from_configs(configs):
+    """
+    Lines of LightingConfiguration rows (drivers / accessories prefetched).
+    A product keeps its first row, as in BOQ generation.
+    """
+    lines = {}
+    for config in configs:
+        if config.product_id in lines:
+            continue
+        lines[config.product_id] = _line(
+            config.product_id,
+            config.quantity,
+            [(d.driver_id, d.quantity) for d in config.configuration_drivers.all()],
+            [(a.accessory_id, a.quantity) for a in config.accessories.all()],
+        )
+    return [lines[pk] for pk in sorted(lines)]
+
+
+def content_hash(lines):
+    payload = json.dumps(lines, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def store_snapshot(lines):
+    """Hash-addressed snapshot row for `lines` (reused when it exists)."""
+    digest = content_hash(lines)
+    snapshot, _ = ConfigurationSnapshot.objects.get_or_create(
+        content_hash=digest,
+        defaults={"lines": lines, "line_count": len(lines)},
+    )
+    return snapshot
+
+
+# -------------------------------
+# READ
+# -------------------------------
+class AreaSnapshot:
+    __slots__ = ("area_id", "version", "lines", "content_hash")
+
+    def __init__(self, area_id, version, lines, digest=None):
+        self.area_id = area_id
+        self.version = version
+        self.lines = lines
+        self.content_hash = digest or content_hash(lines)
+
+
+def get_snapshot_lines(project_id, area_id, configuration_version):
+    """
+    Lines of one version, from its stored snapshot when available.
+
+    Returns:
+        AreaSnapshot or None when the version does not exist
+    """
+    header = (
+        ConfigurationVersion.objects.filter(
+            project_id=project_id, area_id=area_id, version=configuration_version
+        )
+        .select_related("snapshot")
+        .first()
+    )
+    if header is not None and header.snapshot is not None:
+        return AreaSnapshot(
+            area_id, configuration_version, header.snapshot.lines, header.snapshot.content_hash
+        )
+
+    from apps.configurations.services.versioning import snapshot_filter
+
+    configs = list(
+        LightingConfiguration.objects.filter(
+            snapshot_filter(configuration_version),
+            project_id=project_id,
+            area_id=area_id,
+        )
+        .prefetch_related("configuration_drivers", "accessories")
+        .order_by("id")
+    )
+    if header is None and not configs:
+        return None
+    return AreaSnapshot(area_id, configuration_version, lines_from_configs(configs))
+
+
+def load_active_snapshots(project_id):
+    """
+    Active configuration of every configured area of a project.
+
+    Stored snapshots are used as-is; areas without one (rows written
+    outside the versioning service) are rebuilt from their active rows.
+
+    Returns:
+        list of AreaSnapshot, ordered by area (project-level first)
+    """
+    active_areas = set(
+        LightingConfiguration.objects.filter(project_id=project_id, is_active=True)
+        .values_list("area_id", flat=True)
+        .distinct()
+    )
+    if not active_areas:
+        return []
+
+    latest = {}
+    headers = (
+        ConfigurationVersion.objects.filter(project_id=project_id)
+        .values_list("area_id", "version", "snapshot_id")
+        .order_by("area_id", "version")
+    )
+    for area_id, version, snapshot_id in headers:
+        latest[area_id] = (version, snapshot_id)
+
+    snapshot_ids = [
+        latest[area_id][1] for area_id in active_areas
+        if area_id in latest and latest[area_id][1]
+    ]
+    stored = ConfigurationSnapshot.objects.in_bulk(snapshot_ids)
+
+    snapshots = {}
+    for area_id in active_areas:
+        version, snapshot_id = latest.get(area_id, (None, None))
+        if snapshot_id in stored:
+            snapshot = stored[snapshot_id]
+            snapshots[area_id] = AreaSnapshot(area_id, version, snapshot.lines, snapshot.content_hash)
+
+    missing = active_areas - snapshots.keys()
+    if missing:
+        areas = Q(area_id__in=[a for a in missing if a is not None])
+        if None in missing:
+            areas |= Q(area_id__isnull=True)
+        configs = LightingConfiguration.objects.filter(areas, project_id=project_id, is_active=True)
+        by_area = {}
+        for config in configs.prefetch_related(
+            "configuration_drivers", "accessories"
+        ).order_by("id"):
+            by_area.setdefault(config.area_id, []).append(config)
+        for area_id, area_configs in by_area.items():
+            version = latest.get(area_id, (None, None))[0] or max(
+                c.configuration_version for c in area_configs
+            )
+            snapshots[area_id] = AreaSnapshot(area_id, version, lines_from_configs(area_configs))
+
+    return [
+        snapshots[area_id]
+        for area_id in sorted(snapshots, key=lambda a: (a is not None, a or 0))
+    ]
+
+
+def project_content_hash(area_snapshots):
+    """One hash over the active snapshots of a project (area id + content)."""
+    parts = [f"{s.area_id or 0}:{s.content_hash}" for s in area_snapshots]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+# -------------------------------
+# DIFF
+# -------------------------------
+def diff_snapshot_lines(base_lines, target_lines):
+    """
+    Line-level comparison of two snapshots, keyed on product.
+
+    Returns:
+        dict with added / removed / changed lines and the unchanged count
+    """
+    base = {line["product_id"]: line for line in base_lines}
+    target = {line["product_id"]: line for line in target_lines}
+
+    changed = [
+        {"product_id": pk, "old": base[pk], "new": line}
+        for pk, line in target.items()
+        if pk in base and base[pk] != line
+    ]
+    return {
+        "added": [line for pk, line in target.items() if pk not in base],
+        "removed": [line for pk, line in base.items() if pk not in target],
+        "changed": changed,
+        "unchanged_count": sum(1 for pk, line in target.items() if base.get(pk) == line),
+    }
@@ -4,22 +4,72 @@ Configuration Versioning Service
 Implements ERP-grade configuration versioning with immutable snapshots.
 
 Key Concepts:
-- Versions auto-increment per (project, area)
+- Versions auto-increment per (project, area), one ConfigurationVersion
+  header per version
 - Each version is immutable (append-only)
 - Only latest version is active
 - BOQ references specific version for reproducibility
+
+Copy-on-write (settings.CONFIGURATION_COPY_ON_WRITE):
+- A LightingConfiguration row is valid from configuration_version up to
+  (excluding) superseded_in_version
+- A new version only writes the lines that changed (quantity, driver or
+  accessories) or were added; unchanged rows are shared with the parent
+  version, changed / removed ones get superseded_in_version set
+- Row contents are never updated, so every past snapshot can be read
+  back with one interval query (snapshot_filter)
+- With the setting off every version writes a full copy (same reads)
+- Each version also stores its serialized, hash-addressed snapshot
+  (services.snapshots), read by BOQ generation
 """
 
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.db.models import Max, Q
-from apps.configurations.models import LightingConfiguration, ConfigurationAccessory, ConfigurationDriver
 from apps.masters.models import Product, Driver, Accessory
+from apps.projects.models import Project, Area
 from apps.configurations.models import (
     LightingConfiguration,
     ConfigurationDriver,
-    ConfigurationAccessory
+    ConfigurationAccessory,
+    ConfigurationVersion,
+)
+from apps.configurations.services.snapshots import (
+    lines_from_configs,
+    lines_from_request,
+    store_snapshot,
 )
 
+
+def copy_on_write_enabled():
+    return getattr(settings, "CONFIGURATION_COPY_ON_WRITE", True)
+
+
+def snapshot_filter(configuration_version):
+    """Q selecting the LightingConfiguration rows of one version."""
+    return Q(configuration_version__lte=configuration_version) & (
+        Q(superseded_in_version__isnull=True)
+        | Q(superseded_in_version__gt=configuration_version)
+    )
+
+
+def versions_containing(config):
+    """
+    ConfigurationVersion headers whose snapshot includes this row (the
+    headers inside its configuration_version .. superseded_in_version
+    interval). A row with any such header is frozen.
+    """
+    headers = ConfigurationVersion.objects.filter(
+        project_id=config.project_id,
+        area_id=config.area_id,
+        version__gte=config.configuration_version,
+    )
+    if config.superseded_in_version is not None:
+        headers = headers.filter(version__lt=config.superseded_in_version)
+    return headers
+
+
 def get_latest_configuration_version(project_id, area_id):
     """
     Get the latest configuration version number for a given (project, area).
@@ -27,34 +77,33 @@ def get_latest_configuration_version(project_id, area_id):
     Returns:
         int: Latest version number (1 if none exists)
     """
-    latest = LightingConfiguration.objects.filter(
+    latest = ConfigurationVersion.objects.filter(
         project_id=project_id,
         area_id=area_id
-    ).aggregate(max_version=Max('configuration_version'))['max_version']
+    ).aggregate(max_version=Max('version'))['max_version']
+
+    if latest is None:
+        # Rows written without a header (fixtures, admin)
+        latest = LightingConfiguration.objects.filter(
+            project_id=project_id,
+            area_id=area_id
+        ).aggregate(max_version=Max('configuration_version'))['max_version']
     
     return (latest or 0) + 1
 
 
-def mark_previous_versions_inactive(project_id, area_id, new_version):
-    """
-    Mark all previous configuration versions as inactive.
-    Only the latest version should have is_active=True.
-    
-    Args:
-        project_id: Project ID
-        area_id: Area ID
-        new_version: The new version number being activated
-    """
-    LightingConfiguration.objects.filter(
-        project_id=project_id,
-        area_id=area_id
-    ).exclude(
-        configuration_version=new_version
-    ).update(is_active=False)
+def _missing_ids(model, ids):
+    ids = {pk for pk in ids if pk is not None}
+    if not ids:
+        return set()
+    return ids - set(
+        model.objects.filter(pk__in=ids).values_list("pk", flat=True)
+    )
 
 
 @transaction.atomic
-def create_configuration_version(project_id, area_id, products_data, drivers_data, accessories_data):
+def create_configuration_version(project_id, area_id, products_data, drivers_data, accessories_data,
+                                 project=None, area=None):
     """
     Create a new IMMUTABLE configuration version.
 
@@ -62,6 +111,15 @@ def create_configuration_version(project_id, area_id, products_data, drivers_dat
     ✅ Append-only versioning
     ✅ No updates to past versions
     ✅ Drivers and accessories saved correctly
+
+    Only changed / new lines are written in copy-on-write mode. Rows are
+    written with bulk_create (configurations first, then their driver /
+    accessory links), so the query count does not grow with the number
+    of fixtures. LightingConfiguration.clean() only depends on the
+    project / area shared by the whole batch and runs once.
+
+    Args:
+        project / area: already loaded instances (optional, saves a query)
     """
 
     # -------------------------------
@@ -80,43 +138,72 @@ def create_configuration_version(project_id, area_id, products_data, drivers_dat
     if missing_products:
         raise ValidationError(f"Invalid product IDs: {missing_products}")
 
-    # Validate drivers
-    if drivers_data:
-        driver_ids = [d.get("driver_id") for d in drivers_data]
-        existing_drivers = set(
-            Driver.objects.filter(id__in=driver_ids)
-            .values_list("id", flat=True)
-        )
-        missing_drivers = set(driver_ids) - existing_drivers
-        if missing_drivers:
-            raise ValidationError(f"Invalid driver IDs: {missing_drivers}")
-
-    # Validate accessories
-    if accessories_data:
-        acc_ids = [a.get("accessory_id") for a in accessories_data]
-        existing_accessories = set(
-            Accessory.objects.filter(id__in=acc_ids)
-            .values_list("id", flat=True)
-        )
-        missing_acc = set(acc_ids) - existing_accessories
-        if missing_acc:
-            raise ValidationError(f"Invalid accessory IDs: {missing_acc}")
+    # Validate drivers (batch list and per-product links)
+    driver_ids = [d.get("driver_id") for d in drivers_data or []]
+    driver_ids += [p.get("driver_id") for p in products_data]
+    missing_drivers = _missing_ids(Driver, driver_ids)
+    if missing_drivers:
+        raise ValidationError(f"Invalid driver IDs: {missing_drivers}")
+
+    # Validate accessories (batch list and per-product links)
+    acc_ids = [a.get("accessory_id") for a in accessories_data or []]
+    acc_ids += [
+        acc.get("accessory_id")
+        for p in products_data
+        for acc in p.get("accessories", [])
+    ]
+    missing_acc = _missing_ids(Accessory, acc_ids)
+    if missing_acc:
+        raise ValidationError(f"Invalid accessory IDs: {missing_acc}")
+
+    # Project / area rules, once for the whole batch
+    if project is None:
+        project = Project.objects.get(pk=project_id)
+    if area is None and area_id:
+        area = Area.objects.get(pk=area_id)
+    LightingConfiguration(project=project, area=area).clean()
+
+    if len(set(product_ids)) != len(product_ids):
+        raise ValidationError("A product can only appear once per configuration version")
 
     # -------------------------------
     # VERSIONING
     # -------------------------------
     next_version = get_latest_configuration_version(project_id, area_id)
 
-    # Deactivate previous versions
-    mark_previous_versions_inactive(project_id, area_id, next_version)
+    # Lines of the parent version (rows not superseded yet)
+    live = LightingConfiguration.objects.filter(
+        project_id=project_id,
+        area_id=area_id,
+        superseded_in_version__isnull=True
+    )
+    copy_on_write = copy_on_write_enabled()
+    live_configs = live.filter(is_active=True)
+    if copy_on_write:
+        live_configs = live_configs.prefetch_related("configuration_drivers", "accessories")
+
+    lines = lines_from_request(products_data)
+    requested = {line["product_id"]: line for line in lines}
+    live_products = set()
+    shared = {}
+    for config in live_configs:
+        live_products.add(config.product_id)
+        line = requested.get(config.product_id)
+        if copy_on_write and line is not None and lines_from_configs([config]) == [line]:
+            shared[config.product_id] = config.pk
+    to_write = [p for p in products_data if int(p["product_id"]) not in shared]
+    removed_count = len(live_products - requested.keys())
+
+    # Changed / removed lines leave the snapshot (previous versions keep them)
+    live.exclude(pk__in=shared.values()).update(
+        is_active=False, superseded_in_version=next_version
+    )
 
     # -------------------------------
-    # CREATE PRODUCT CONFIGS
+    # CREATE PRODUCT CONFIGS (changed / new lines only)
     # -------------------------------
-    created_configs = []
-
-    for prod_data in products_data:
-        config = LightingConfiguration.objects.create(
+    created_configs = LightingConfiguration.objects.bulk_create([
+        LightingConfiguration(
             project_id=project_id,
             area_id=area_id,
             configuration_version=next_version,
@@ -124,36 +211,52 @@ def create_configuration_version(project_id, area_id, products_data, drivers_dat
             product_id=prod_data["product_id"],
             quantity=prod_data.get("quantity", 1),
         )
-        created_configs.append(config)
+        for prod_data in to_write
+    ])
 
-        # -------------------------------
-        # DRIVER LINK (per product)
-        # -------------------------------
+    ConfigurationVersion.objects.create(
+        project_id=project_id,
+        area_id=area_id,
+        version=next_version,
+        parent_version=next_version - 1 if next_version > 1 else None,
+        line_count=len(products_data),
+        written_count=len(created_configs),
+        removed_count=removed_count,
+        snapshot=store_snapshot(lines),
+    )
+
+    # -------------------------------
+    # DRIVER / ACCESSORY LINKS (per product)
+    # -------------------------------
+    config_drivers = []
+    config_accessories = []
+    for config, prod_data in zip(created_configs, to_write):
         driver_id = prod_data.get("driver_id")
         if driver_id:
-            ConfigurationDriver.objects.create(
+            config_drivers.append(ConfigurationDriver(
                 configuration=config,
                 driver_id=driver_id,
                 quantity=prod_data.get("quantity", 1),
-            )
-
-        # -------------------------------
-        # ACCESSORY LINKS (per product)
-        # -------------------------------
-        accessories = prod_data.get("accessories", [])
-        for acc in accessories:
-            ConfigurationAccessory.objects.create(
+            ))
+
+        for acc in prod_data.get("accessories", []):
+            config_accessories.append(ConfigurationAccessory(
                 configuration=config,
                 accessory_id=acc.get("accessory_id"),
                 quantity=acc.get("quantity", 1),
-            )
+            ))
+
+    ConfigurationDriver.objects.bulk_create(config_drivers)
+    ConfigurationAccessory.objects.bulk_create(config_accessories)
 
     # -------------------------------
     # RESPONSE
     # -------------------------------
     return {
         "version": next_version,
-        "configuration_count": len(created_configs),
+        "configuration_count": len(products_data),
+        "written_count": len(created_configs),
+        "shared_count": len(shared),
         "area_id": area_id,
         "project_id": project_id,
     }
@@ -165,11 +268,18 @@ def get_active_configuration_version(project_id, area_id):
     Returns:
         int: Active version number or None if no configurations exist
     """
-    result = LightingConfiguration.objects.filter(
+    result = ConfigurationVersion.objects.filter(
         project_id=project_id,
-        area_id=area_id,
-        is_active=True
-    ).values_list('configuration_version', flat=True).first()
+        area_id=area_id
+    ).aggregate(max_version=Max('version'))['max_version']
+
+    if result is None:
+        # Rows written without a header (fixtures, admin)
+        result = LightingConfiguration.objects.filter(
+            project_id=project_id,
+            area_id=area_id,
+            is_active=True
+        ).aggregate(max_version=Max('configuration_version'))['max_version']
     
     return result
 
@@ -187,9 +297,9 @@ def get_configuration_snapshot(project_id, area_id, configuration_version):
         }
     """
     configurations = LightingConfiguration.objects.filter(
+        snapshot_filter(configuration_version),
         project_id=project_id,
         area_id=area_id,
-        configuration_version=configuration_version
     ).select_related('product')
     
     # Collect drivers from configurations
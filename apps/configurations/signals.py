@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.configurations.models import (
+    LightingConfiguration,
+    ConfigurationDriver,
+    ConfigurationAccessory,
+)
+from apps.configurations.services.versioning import versions_containing
+
+
+def _invalidate_snapshot(config):
+    """
+    Rows edited outside create_configuration_version (which bulk inserts
+    and sends no signals; the API rejects such edits, admin / shell do
+    not): no stored snapshot of a version holding the row describes it
+    any more. A shared row belongs to several versions.
+    """
+    versions_containing(config).filter(snapshot__isnull=False).update(snapshot=None)
+
+
+@receiver(post_save, sender=LightingConfiguration)
+@receiver(post_delete, sender=LightingConfiguration)
+def configuration_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _invalidate_snapshot(instance)
+
+
+@receiver(post_save, sender=ConfigurationDriver)
+@receiver(post_delete, sender=ConfigurationDriver)
+@receiver(post_save, sender=ConfigurationAccessory)
+@receiver(post_delete, sender=ConfigurationAccessory)
+def configuration_link_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _invalidate_snapshot(instance.configuration)
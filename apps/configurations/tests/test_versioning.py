@@ -8,6 +8,10 @@ Tests the complete workflow:
 5. Cannot delete configuration versions
 """
 
+import pytest
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from rest_framework.test import APIClient
 from django.test import TestCase
 from django.db import IntegrityError
 from django.db.models import ProtectedError
@@ -15,12 +19,18 @@ from decimal import Decimal
 
 from apps.projects.models import Project, Area
 from apps.masters.models import Product, Driver, Accessory
-from apps.configurations.models import LightingConfiguration, ConfigurationDriver, ConfigurationAccessory
+from apps.configurations.models import (
+    LightingConfiguration,
+    ConfigurationDriver,
+    ConfigurationAccessory,
+    ConfigurationVersion,
+)
 from apps.boq.models import BOQ
 from apps.configurations.services.versioning import (
     create_configuration_version,
     get_latest_configuration_version,
     get_active_configuration_version,
+    get_configuration_snapshot,
 )
 from apps.boq.services.boq_service import generate_boq
 
@@ -318,3 +328,215 @@ if __name__ == '__main__':
     TestRunner = get_runner(settings)
     test_runner = TestRunner()
     failures = test_runner.run_tests(['__main__'])
+
+
+@pytest.mark.django_db
+def test_create_configuration_version_is_bulk(django_assert_max_num_queries):
+    project = Project.objects.create(
+        name="Bulk Project", project_code="BULK-001", client_name="Client", fee=1000
+    )
+    area = Area.objects.create(project=project, name="Hall")
+    driver = Driver.objects.create(driver_code="DRV-BULK", base_price=Decimal("20.00"))
+    accessory = Accessory.objects.create(
+        accessory_name="Clip", accessory_type="Clip", accessory_category="MOUNTING"
+    )
+    products = Product.objects.bulk_create([
+        Product(make=f"Make {i}", order_code=f"BULK-{i}", base_price=Decimal("10.00"))
+        for i in range(300)
+    ])
+    products_data = [
+        {
+            "product_id": product.pk,
+            "quantity": 2,
+            "driver_id": driver.pk,
+            "accessories": [{"accessory_id": accessory.pk, "quantity": 1}],
+        }
+        for product in products
+    ]
+
+    # Independent of the fixture count (bulk inserts are only split in
+    # backend-sized batches)
+    with django_assert_max_num_queries(32):
+        result = create_configuration_version(
+            project.pk, area.pk, products_data, [], [], project=project, area=area
+        )
+
+    assert result["version"] == 1
+    assert result["configuration_count"] == 300
+    configs = LightingConfiguration.objects.filter(area=area, configuration_version=1)
+    assert configs.count() == 300
+    assert ConfigurationDriver.objects.filter(configuration__in=configs, quantity=2).count() == 300
+    assert ConfigurationAccessory.objects.filter(configuration__in=configs).count() == 300
+
+    create_configuration_version(project.pk, area.pk, products_data[:1], [], [])
+    assert get_active_configuration_version(project.pk, area.pk) == 2
+    assert LightingConfiguration.objects.filter(area=area, is_active=True).count() == 1
+
+    with pytest.raises(ValidationError):
+        create_configuration_version(
+            project.pk, area.pk, [{"product_id": products[0].pk, "driver_id": 999999}], [], []
+        )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("copy_on_write", [True, False])
+def test_configuration_versions_share_unchanged_lines(settings, copy_on_write):
+    settings.CONFIGURATION_COPY_ON_WRITE = copy_on_write
+    project = Project.objects.create(
+        name="COW Project", project_code="COW-001", client_name="Client", fee=1000
+    )
+    area = Area.objects.create(project=project, name="Hall")
+    driver = Driver.objects.create(driver_code="DRV-COW", base_price=Decimal("20.00"))
+    accessory = Accessory.objects.create(
+        accessory_name="Clip", accessory_type="Clip", accessory_category="MOUNTING"
+    )
+    products = Product.objects.bulk_create([
+        Product(make=f"Make {i}", order_code=f"COW-{i}", base_price=Decimal("10.00"))
+        for i in range(4)
+    ])
+
+    def line(product, quantity=1, accessories=()):
+        return {
+            "product_id": product.pk,
+            "quantity": quantity,
+            "driver_id": driver.pk,
+            "accessories": [{"accessory_id": accessory.pk, "quantity": q} for q in accessories],
+        }
+
+    v1 = [line(products[0]), line(products[1]), line(products[2], accessories=[1])]
+    v2 = [line(products[0]), line(products[1], quantity=5), line(products[2], accessories=[2]), line(products[3])]
+    v3 = [line(products[0]), line(products[3])]
+    results = [
+        create_configuration_version(project.pk, area.pk, lines, [], [])
+        for lines in (v1, v2, v3)
+    ]
+
+    assert [r["version"] for r in results] == [1, 2, 3]
+    if copy_on_write:
+        assert [r["written_count"] for r in results] == [3, 3, 0]
+        assert LightingConfiguration.objects.filter(area=area).count() == 6
+    else:
+        assert [r["written_count"] for r in results] == [3, 4, 2]
+
+    # Every version reads back as the complete snapshot it was saved as
+    for version, lines in enumerate((v1, v2, v3), start=1):
+        snapshot = get_configuration_snapshot(project.pk, area.pk, version)
+        assert sorted(
+            (c.product_id, c.quantity) for c in snapshot["configurations"]
+        ) == sorted((l["product_id"], l["quantity"]) for l in lines)
+        assert sorted(
+            (a.configuration.product_id, a.quantity) for a in snapshot["accessories"]
+        ) == sorted(
+            (l["product_id"], a["quantity"]) for l in lines for a in l["accessories"]
+        )
+
+    active = LightingConfiguration.objects.filter(area=area, is_active=True)
+    assert sorted(active.values_list("product_id", flat=True)) == [products[0].pk, products[3].pk]
+    header = ConfigurationVersion.objects.get(project=project, area=area, version=3)
+    assert (header.parent_version, header.line_count, header.removed_count) == (2, 2, 2)
+
+
+@pytest.mark.django_db
+def test_boq_generation_reads_hash_addressed_snapshots():
+    project = Project.objects.create(
+        name="Snapshot Project", project_code="SNAP-001", client_name="Client", fee=1000
+    )
+    area = Area.objects.create(project=project, name="Hall")
+    driver = Driver.objects.create(driver_code="DRV-SNAP", base_price=Decimal("20.00"))
+    products = Product.objects.bulk_create([
+        Product(make=f"Make {i}", order_code=f"SNAP-{i}", base_price=Decimal("10.00"))
+        for i in range(3)
+    ])
+    lines = [
+        {"product_id": p.pk, "quantity": 2, "driver_id": driver.pk} for p in products
+    ]
+
+    create_configuration_version(project.pk, area.pk, lines, [], [])
+    header = ConfigurationVersion.objects.get(project=project, area=area, version=1)
+    assert header.snapshot.line_count == 3
+
+    boq = generate_boq(project, None)
+    assert boq.source_content_hash
+    assert boq.grand_total == Decimal("180.00")
+
+    # Same content under a new version: same snapshot row, duplicate BOQ
+    create_configuration_version(project.pk, area.pk, lines[::-1], [], [])
+    v2 = ConfigurationVersion.objects.get(project=project, area=area, version=2)
+    assert v2.snapshot_id == header.snapshot_id
+    with pytest.raises(ValidationError):
+        generate_boq(project, None)
+
+    # Rows edited outside the versioning service: every snapshot holding
+    # the row is dropped (v1 and v2 share it), the rows are read instead
+    config = LightingConfiguration.objects.get(product=products[0], is_active=True)
+    config.quantity = 5
+    config.save()
+    v2.refresh_from_db()
+    header.refresh_from_db()
+    assert v2.snapshot_id is None and header.snapshot_id is None
+    boq = generate_boq(project, None)
+    assert boq.grand_total == Decimal("180.00") + 3 * Decimal("10.00")
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user("snap", password="x"))
+    response = client.get(
+        "/api/configurations/versions/diff/",
+        {"project_id": project.pk, "area_id": area.pk, "base": 1, "target": 2},
+    )
+    assert response.status_code == 200
+    assert response.data["changed"] == []
+    assert response.data["unchanged_count"] == 3
+
+    response = client.get(
+        "/api/configurations/versions/snapshot/",
+        {"project_id": project.pk, "area_id": area.pk, "version": 1},
+    )
+    assert sorted(line["quantity"] for line in response.data["lines"]) == [2, 2, 5]
+    assert len(response.data["lines"]) == 3
+
+
+@pytest.mark.django_db
+def test_saved_versions_cannot_be_edited_in_place():
+    project = Project.objects.create(
+        name="Frozen Project", project_code="FRZ-001", client_name="Client", fee=1000
+    )
+    area = Area.objects.create(project=project, name="Hall")
+    driver = Driver.objects.create(driver_code="DRV-FRZ", base_price=Decimal("20.00"))
+    products = Product.objects.bulk_create([
+        Product(make=f"Make {i}", order_code=f"FRZ-{i}", base_price=Decimal("10.00"))
+        for i in range(2)
+    ])
+    lines = [{"product_id": p.pk, "quantity": 2, "driver_id": driver.pk} for p in products]
+    create_configuration_version(project.pk, area.pk, lines, [], [])
+    create_configuration_version(project.pk, area.pk, lines[:1], [], [])
+
+    # Shared by v1 and v2 under copy-on-write
+    shared = LightingConfiguration.objects.get(product=products[0])
+    link = ConfigurationDriver.objects.get(configuration=shared)
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_superuser("frozen", password="x"))
+    for method in (client.patch, client.put):
+        response = method(
+            f"/api/configurations/{shared.pk}/",
+            {"area": area.pk, "product": products[0].pk, "quantity": 9},
+            format="json",
+        )
+        assert response.status_code == 409
+    response = client.patch(
+        f"/api/configurations/configuration-drivers/{link.pk}/", {"quantity": 9}, format="json"
+    )
+    assert response.status_code == 409
+
+    shared.refresh_from_db()
+    link.refresh_from_db()
+    assert (shared.quantity, link.quantity) == (2, 2)
+    snapshot = get_configuration_snapshot(project.pk, area.pk, 1)
+    assert sorted(c.quantity for c in snapshot["configurations"]) == [2, 2]
+
+    # Rows outside any saved version stay editable
+    loose = LightingConfiguration.objects.create(
+        project=project, area=area, product=products[1], quantity=1, configuration_version=3
+    )
+    response = client.patch(f"/api/configurations/{loose.pk}/", {"quantity": 4}, format="json")
+    assert response.status_code == 200
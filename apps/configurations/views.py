@@ -11,14 +11,32 @@ from apps.configurations.models import (
     ConfigurationAccessory,
 )
 from apps.configurations.serializers import LightingConfigurationSerializer, ConfigurationAccessorySerializer,ConfigurationDriverSerializer
-from apps.configurations.services.versioning import create_configuration_version
+from apps.configurations.services.versioning import (
+    create_configuration_version,
+    get_active_configuration_version,
+    versions_containing,
+)
+from apps.configurations.services.snapshots import diff_snapshot_lines, get_snapshot_lines
 from apps.projects.models import Project, Area
 from apps.masters.models import Product
-from apps.common.permissions import IsEditorOrReadOnly
+from apps.common.permissions import IsAdmin, IsEditorOrReadOnly
 from rest_framework.filters import SearchFilter
 from django_filters.rest_framework import DjangoFilterBackend
 
 
+def _frozen_configuration_response(config):
+    """
+    409 for edits of rows that belong to a saved version: rows are shared
+    between versions, so an in-place edit would rewrite older ones too.
+    """
+    if config is not None and versions_containing(config).exists():
+        return Response(
+            {"error": "Configuration belongs to a saved version; save a new version instead (save_batch)"},
+            status=status.HTTP_409_CONFLICT
+        )
+    return None
+
+
 class LightingConfigurationListAPI(ModelViewSet):
     queryset = LightingConfiguration.objects.all()
     serializer_class = LightingConfigurationSerializer
@@ -85,6 +103,12 @@ class LightingConfigurationListAPI(ModelViewSet):
     def perform_create(self, serializer):
         serializer.save()
 
+    def update(self, request, *args, **kwargs):
+        frozen = _frozen_configuration_response(self.get_object())
+        if frozen:
+            return frozen
+        return super().update(request, *args, **kwargs)
+
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         instance.is_active = False
@@ -163,6 +187,8 @@ class LightingConfigurationListAPI(ModelViewSet):
                 products_data=products,
                 drivers_data=drivers,
                 accessories_data=accessories,
+                project=project,
+                area=area,
             )
 
             return Response(result, status=status.HTTP_201_CREATED)
@@ -176,6 +202,58 @@ class LightingConfigurationListAPI(ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def _version_params(self, request, *names):
+        """project_id, area_id (optional) and integer version params."""
+        params = request.query_params
+        try:
+            project_id = int(params["project_id"])
+            area_id = int(params["area_id"]) if params.get("area_id") else None
+            versions = [int(params[name]) if params.get(name) else None for name in names]
+        except (KeyError, ValueError):
+            raise ValidationError(f"project_id and integer {', '.join(names)} are required")
+        return project_id, area_id, versions
+
+    @action(detail=False, methods=["get"], url_path="versions/snapshot")
+    def version_snapshot(self, request):
+        """
+        GET /api/configurations/versions/snapshot/?project_id=&area_id=&version=
+
+        Stored snapshot of one configuration version (latest by default).
+        """
+        project_id, area_id, (version,) = self._version_params(request, "version")
+        version = version or get_active_configuration_version(project_id, area_id)
+        snapshot = version and get_snapshot_lines(project_id, area_id, version)
+        if not snapshot:
+            return Response({"error": "Configuration version not found"}, status=404)
+        return Response({
+            "project_id": project_id,
+            "area_id": area_id,
+            "version": snapshot.version,
+            "content_hash": snapshot.content_hash,
+            "lines": snapshot.lines,
+        })
+
+    @action(detail=False, methods=["get"], url_path="versions/diff")
+    def version_diff(self, request):
+        """
+        GET /api/configurations/versions/diff/?project_id=&area_id=&base=&target=
+
+        Line changes between two configuration versions of an area.
+        """
+        project_id, area_id, (base, target) = self._version_params(request, "base", "target")
+        if base is None or target is None:
+            raise ValidationError("base and target versions are required")
+        snapshots = [get_snapshot_lines(project_id, area_id, v) for v in (base, target)]
+        if not all(snapshots):
+            return Response({"error": "Configuration version not found"}, status=404)
+        return Response({
+            "project_id": project_id,
+            "area_id": area_id,
+            "base": {"version": base, "content_hash": snapshots[0].content_hash},
+            "target": {"version": target, "content_hash": snapshots[1].content_hash},
+            **diff_snapshot_lines(snapshots[0].lines, snapshots[1].lines),
+        })
+
     @action(
         detail=False,
         methods=["post"],
@@ -206,19 +284,23 @@ class LightingConfigurationListAPI(ModelViewSet):
             )
 
         try:
+            product_ids = [int(pk) for pk in product_ids]
+        except (TypeError, ValueError):
+            return Response({"error": "Some product IDs are invalid"}, status=400)
+
+        # Cached per id set: a repeated id is reported here, not from the cache
+        if len(set(product_ids)) != len(product_ids):
+            return Response({"error": "Some product IDs are invalid"}, status=400)
+
+        # Unknown ids are an answer of the catalogue too: cached as an error
+        def compute():
             products = Product.objects.filter(pk__in=product_ids)
             
             if not products.exists():
-                return Response(
-                    {"error": "No valid products found with provided IDs"}, 
-                    status=400
-                )
+                return {"error": "No valid products found with provided IDs"}
             
             if len(product_ids) != products.count():
-                return Response(
-                    {"error": "Some product IDs are invalid"}, 
-                    status=400
-                )
+                return {"error": "Some product IDs are invalid"}
             
             from apps.masters.services.compatibility import (
                 get_compatible_drivers,
@@ -232,18 +314,26 @@ class LightingConfigurationListAPI(ModelViewSet):
                 AccessoryCompatibilitySerializer
             )
             
-            drivers_data = DriverCompatibilitySerializer(compatible_drivers, many=True).data
-            accessories_data = AccessoryCompatibilitySerializer(compatible_accessories, many=True).data
+            # Plain dicts: cached and shared between processes
+            drivers_data = [dict(row) for row in DriverCompatibilitySerializer(compatible_drivers, many=True).data]
+            accessories_data = [dict(row) for row in AccessoryCompatibilitySerializer(compatible_accessories, many=True).data]
             
-            return Response({
+            return {
                 "drivers": drivers_data,
                 "accessories": accessories_data,
                 "meta": {
-                    "product_count": products.count(),
+                    "product_count": len(product_ids),
                     "driver_count": len(drivers_data),
                     "accessory_count": len(accessories_data)
                 }
-            })
+            }
+
+        try:
+            from apps.masters.services.compatibility_cache import compatibility_cache
+            result = compatibility_cache.get_or_compute("selection", product_ids, compute)
+            if "error" in result:
+                return Response(result, status=400)
+            return Response(result)
 
         except Exception as e:
             return Response(
@@ -256,7 +346,7 @@ class LightingConfigurationListAPI(ModelViewSet):
         """
         ERP-Grade Single Product Compatibility Endpoint
         """
-        try:
+        def compute():
             product = Product.objects.get(pk=product_id)
             
             from apps.masters.services.compatibility import (
@@ -266,8 +356,8 @@ class LightingConfigurationListAPI(ModelViewSet):
             drivers = get_compatible_drivers(product)
             accessories = get_compatible_accessories(product)
 
-            return Response({
-                "product_id": product.id,
+            return {
+                "product_id": product.pk,
                 "drivers": [
                     {
                         "id": d.id,
@@ -286,21 +376,70 @@ class LightingConfigurationListAPI(ModelViewSet):
                     }
                     for a in accessories
                 ]
-            })
-        except Product.DoesNotExist:
+            }
+
+        try:
+            from apps.masters.services.compatibility_cache import compatibility_cache
+            return Response(compatibility_cache.get_or_compute("product", [int(product_id)], compute))
+        except (Product.DoesNotExist, ValueError):
             return Response({"error": "Product not found"}, status=404)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
 
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="compatibility/cache-stats",
+        permission_classes=[IsAdmin]
+    )
+    def compatibility_cache_stats(self, request):
+        """
+        GET /api/configurations/compatibility/cache-stats/
+
+        Hit / miss counters of the compatibility cache (this process).
+        """
+        from apps.masters.services.compatibility_cache import compatibility_cache
+        return Response(compatibility_cache.stats())
+
+
+class FrozenConfigurationLinkMixin:
+    """Driver / accessory links of a saved version are immutable too."""
+
+    def _frozen(self, configuration_id):
+        try:
+            config = LightingConfiguration.objects.filter(pk=configuration_id).first()
+        except (TypeError, ValueError):
+            return None  # reported by the serializer
+        return _frozen_configuration_response(config)
+
+    def create(self, request, *args, **kwargs):
+        frozen = self._frozen(request.data.get("configuration"))
+        if frozen:
+            return frozen
+        return super().create(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        link = self.get_object()
+        frozen = self._frozen(link.configuration_id) or self._frozen(request.data.get("configuration"))
+        if frozen:
+            return frozen
+        return super().update(request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        frozen = self._frozen(self.get_object().configuration_id)
+        if frozen:
+            return frozen
+        return super().destroy(request, *args, **kwargs)
+
 
-class ConfigurationAccessoryViewSet(viewsets.ModelViewSet):
+class ConfigurationAccessoryViewSet(FrozenConfigurationLinkMixin, viewsets.ModelViewSet):
     queryset = ConfigurationAccessory.objects.all()
     serializer_class = ConfigurationAccessorySerializer
     permission_classes = [IsEditorOrReadOnly]
     filter_backends = [SearchFilter, DjangoFilterBackend]
 
 
-class ConfigurationDriverViewSet(viewsets.ModelViewSet):
+class ConfigurationDriverViewSet(FrozenConfigurationLinkMixin, viewsets.ModelViewSet):
     queryset = ConfigurationDriver.objects.all()
     serializer_class = ConfigurationDriverSerializer
     permission_classes = [IsEditorOrReadOnly]
@@ -308,6 +447,9 @@ class ConfigurationDriverViewSet(viewsets.ModelViewSet):
 
     def create(self, request, *args, **kwargs):
         configuration_id = request.data.get("configuration")
+        frozen = self._frozen(configuration_id)
+        if frozen:
+            return frozen
 
         existing = ConfigurationDriver.objects.filter(
             configuration_id=configuration_id
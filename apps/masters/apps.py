@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MastersConfig(AppConfig):
     name = 'apps.masters'
+
+    def ready(self):
+        from apps.masters import signals  # noqa: F401
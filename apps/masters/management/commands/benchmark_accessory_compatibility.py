@@ -0,0 +1,101 @@
+"""
+Compare accessory compatibility filtering in Python (JSON mounting
+styles, evaluated row by row) with the SQL bit AND on
+Accessory.mounting_style_mask.
+
+Synthetic accessories are created inside a transaction that is rolled
+back, so the database is left untouched.
+
+Usage:
+    python manage.py benchmark_accessory_compatibility
+    python manage.py benchmark_accessory_compatibility --accessories 50000 --repeat 5
+"""
+
+import itertools
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.masters.models import Accessory, Product
+from apps.masters.models.accessory import MOUNTING_STYLE_CHOICES, mounting_style_mask
+from apps.masters.services.compatibility_index import (
+    accessory_matches,
+    compatible_accessories_query,
+)
+
+
+class Command(BaseCommand):
+    help = "Benchmark Python vs SQL mounting-style filtering of accessories"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--accessories", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        count, repeat = options["accessories"], options["repeat"]
+        if count < 1 or repeat < 1:
+            raise CommandError("--accessories and --repeat must be positive")
+
+        with transaction.atomic():
+            self._run(count, repeat)
+            transaction.set_rollback(True)
+
+    def _run(self, count, repeat):
+        style_sets = [
+            list(combo)
+            for size in range(len(MOUNTING_STYLE_CHOICES) + 1)
+            for combo in itertools.combinations(MOUNTING_STYLE_CHOICES, size)
+        ]
+        # bulk_create bypasses save(): set the mask explicitly
+        Accessory.objects.bulk_create(
+            [
+                Accessory(
+                    accessory_name=f"BENCH-{index}",
+                    accessory_type="Benchmark",
+                    accessory_category="MOUNTING",
+                    compatible_mounting_styles=styles,
+                    mounting_style_mask=mounting_style_mask(styles),
+                    min_diameter_mm=index % 50,
+                    max_diameter_mm=index % 50 + 100,
+                    compatible_ip_class=(20, 44, 65, 68)[index % 4],
+                )
+                for index, styles in zip(range(count), itertools.cycle(style_sets))
+            ],
+            batch_size=1000,
+        )
+        self.stdout.write(f"{Accessory.objects.count()} accessories")
+
+        products = [
+            Product(mounting_style=style, diameter_mm=diameter, ip_class=ip)
+            for style, diameter, ip in itertools.product(
+                MOUNTING_STYLE_CHOICES + [None], (None, 75), (None, 44),
+            )
+        ]
+
+        def python_filter(product):
+            return {a.pk for a in Accessory.objects.all() if accessory_matches(product, a)}
+
+        def sql_filter(product):
+            return set(compatible_accessories_query(product).values_list("pk", flat=True))
+
+        timings = {}
+        results = {}
+        for label, evaluate in (("python", python_filter), ("sql", sql_filter)):
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                results[label] = [evaluate(product) for product in products]
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = best
+            self.stdout.write(
+                f"{label:>6}: {best * 1000:.1f} ms for {len(products)} products (best of {repeat})"
+            )
+
+        if results["python"] != results["sql"]:
+            raise CommandError("Python and SQL filtering disagree")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Identical results, SQL is {timings['python'] / timings['sql']:.1f}x faster"
+        ))
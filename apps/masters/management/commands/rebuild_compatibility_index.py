@@ -0,0 +1,46 @@
+"""
+Rebuild or verify the product -> driver / accessory compatibility index
+(ProductDriverMap / ProductAccessoryMap).
+
+Usage:
+    python manage.py rebuild_compatibility_index
+    python manage.py rebuild_compatibility_index --verify   # report only
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.masters.services.compatibility_index import (
+    rebuild_compatibility_index,
+    verify_compatibility_index,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or verify) the materialized compatibility index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare the index with the rules; exit non-zero on drift",
+        )
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            report = verify_compatibility_index()
+        else:
+            report = rebuild_compatibility_index()
+
+        drift = 0
+        for key, pairs in report.items():
+            drift += len(pairs)
+            self.stdout.write(f"{key}: {len(pairs)}")
+            for product_id, target_id in pairs[:20]:
+                self.stdout.write(f"  product {product_id} -> {target_id}")
+
+        if options["verify"] and drift:
+            raise CommandError(f"Compatibility index out of sync ({drift} pairs)")
+        if options["verify"]:
+            self.stdout.write(self.style.SUCCESS("Compatibility index is in sync"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Compatibility index rebuilt ({drift} pairs fixed)"))
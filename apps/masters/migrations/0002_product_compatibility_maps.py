@@ -0,0 +1,101 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Rules as of this migration (apps.masters.services.compatibility_index),
+# copied so later rule changes do not alter the backfill
+def _driver_ids(Driver, product):
+    if product.driver_integration == "INTEGRATED":
+        return []
+    drivers = Driver.objects.all()
+    if product.electrical_type:
+        drivers = drivers.filter(constant_type=product.electrical_type)
+    if product.wattage:
+        drivers = drivers.filter(max_wattage__gte=product.wattage)
+    if product.electrical_type == "CC" and product.op_current:
+        drivers = drivers.filter(output_current_ma=product.op_current)
+    elif product.electrical_type == "CV" and product.op_voltage:
+        drivers = drivers.filter(
+            output_voltage_min__lte=product.op_voltage,
+            output_voltage_max__gte=product.op_voltage,
+        )
+    if product.ip_class:
+        drivers = drivers.filter(ip_class__gte=product.ip_class)
+    if product.control_ready and product.control_ready != "NONE":
+        drivers = drivers.filter(dimming_protocol=product.control_ready)
+    return drivers.values_list("pk", flat=True)
+
+
+def _accessory_matches(product, accessory):
+    if product.mounting_style:
+        styles = accessory.compatible_mounting_styles or []
+        if isinstance(styles, str):
+            styles = [styles]
+        if product.mounting_style not in styles:
+            return False
+    if product.diameter_mm:
+        if accessory.min_diameter_mm is None or accessory.max_diameter_mm is None:
+            return False
+        if not accessory.min_diameter_mm <= product.diameter_mm <= accessory.max_diameter_mm:
+            return False
+    if product.ip_class:
+        if accessory.compatible_ip_class is None or accessory.compatible_ip_class < product.ip_class:
+            return False
+    return True
+
+
+def backfill_compatibility_maps(apps, schema_editor):
+    Product = apps.get_model("masters", "Product")
+    Driver = apps.get_model("masters", "Driver")
+    Accessory = apps.get_model("masters", "Accessory")
+    ProductDriverMap = apps.get_model("masters", "ProductDriverMap")
+    ProductAccessoryMap = apps.get_model("masters", "ProductAccessoryMap")
+
+    accessories = list(Accessory.objects.all())
+    driver_rows, accessory_rows = [], []
+    for product in Product.objects.all().iterator():
+        driver_rows.extend(
+            ProductDriverMap(product_id=product.pk, driver_id=driver_id)
+            for driver_id in _driver_ids(Driver, product)
+        )
+        accessory_rows.extend(
+            ProductAccessoryMap(product_id=product.pk, accessory_id=accessory.pk)
+            for accessory in accessories if _accessory_matches(product, accessory)
+        )
+    ProductDriverMap.objects.bulk_create(driver_rows, batch_size=1000)
+    ProductAccessoryMap.objects.bulk_create(accessory_rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masters', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductAccessoryMap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_mandatory', models.BooleanField(default=False)),
+                ('accessory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='masters.accessory')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='masters.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'accessory'), name='uniq_product_accessory_map')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDriverMap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_default', models.BooleanField(default=False)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='masters.driver')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='masters.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'driver'), name='uniq_product_driver_map')],
+            },
+        ),
+        migrations.RunPython(backfill_compatibility_maps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+MOUNTING_STYLE_CHOICES = ['SURFACE', 'RECESSED', 'INGROUND', 'TRACK MOUNTED']
+
+
+def backfill_mounting_style_mask(apps, schema_editor):
+    Accessory = apps.get_model("masters", "Accessory")
+    bits = {style: 1 << index for index, style in enumerate(MOUNTING_STYLE_CHOICES)}
+
+    changed = []
+    for accessory in Accessory.objects.only("id", "compatible_mounting_styles").iterator():
+        styles = accessory.compatible_mounting_styles or []
+        if isinstance(styles, str):
+            styles = [styles]
+        accessory.mounting_style_mask = 0
+        for style in styles:
+            accessory.mounting_style_mask |= bits.get(style, 0)
+        if accessory.mounting_style_mask:
+            changed.append(accessory)
+    Accessory.objects.bulk_update(changed, ["mounting_style_mask"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masters', '0002_product_compatibility_maps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessory',
+            name='mounting_style_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_mounting_style_mask, migrations.RunPython.noop),
+    ]
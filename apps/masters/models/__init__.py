@@ -1,3 +1,4 @@
 from .product import Product
 from .driver import Driver
 from .accessory import Accessory
+from .mappings import ProductDriverMap, ProductAccessoryMap
@@ -10,6 +10,21 @@ MOUNTING_STYLE_CHOICES = [
     'TRACK MOUNTED',
 ]
 
+# One bit per mounting style (append only: stored in mounting_style_mask)
+MOUNTING_STYLE_BITS = {
+    style: 1 << index for index, style in enumerate(MOUNTING_STYLE_CHOICES)
+}
+
+
+def mounting_style_mask(styles):
+    """Bitmask of a compatible_mounting_styles value (unknown styles ignored)."""
+    if isinstance(styles, str):
+        styles = [styles]
+    mask = 0
+    for style in styles or []:
+        mask |= MOUNTING_STYLE_BITS.get(style, 0)
+    return mask
+
 def validate_mounting_styles(value):
     if not isinstance(value, list):
         raise ValidationError("compatible_mounting_styles must be a list")
@@ -33,6 +48,9 @@ class Accessory(models.Model):
         validators=[validate_mounting_styles],
         help_text="Allowed values: SURFACE, RECESSED, INGROUND, TRACK MOUNTED"
     )
+    # Mirror of compatible_mounting_styles for SQL filtering (bit AND);
+    # kept in sync by save()
+    mounting_style_mask = models.PositiveSmallIntegerField(default=0, editable=False)
 
     min_diameter_mm = models.IntegerField(null=True, blank=True)
     max_diameter_mm = models.IntegerField(null=True, blank=True)
@@ -54,5 +72,12 @@ class Accessory(models.Model):
         default=random.randint(1,99)
     )
     
+    def save(self, *args, **kwargs):
+        self.mounting_style_mask = mounting_style_mask(self.compatible_mounting_styles)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "compatible_mounting_styles" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "mounting_style_mask"}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.accessory_name
\ No newline at end of file
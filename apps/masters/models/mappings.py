@@ -9,6 +9,14 @@ class ProductDriverMap(models.Model):
     driver = models.ForeignKey(Driver, on_delete=models.CASCADE)
     is_default = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "driver"],
+                name="uniq_product_driver_map"
+            ),
+        ]
+
     def __str__(self):
         return f"Product: {self.product.order_code} - Driver: {self.driver.driver_code}"
     
@@ -16,4 +24,12 @@ class ProductDriverMap(models.Model):
 class ProductAccessoryMap(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     accessory = models.ForeignKey(Accessory, on_delete=models.CASCADE)
-    is_mandatory = models.BooleanField(default=False)
\ No newline at end of file
+    is_mandatory = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "accessory"],
+                name="uniq_product_accessory_map"
+            ),
+        ]
@@ -0,0 +1,148 @@
+"""
+Compatibility Cache
+===================
+Two-level cache for compatibility responses (drivers / accessories
+compatible with a set of products).
+
+Key Concepts:
+- Entries are keyed by the sorted product-id set and the catalogue
+  generation, so one answer is shared by every user and session
+- The generation is a counter in the shared Django cache, bumped on any
+  Product / Driver / Accessory save or delete (apps.masters.signals);
+  bumping makes every older entry unreachable, nothing is deleted
+- Level 1 is a small in-process LRU, level 2 the shared Django cache
+  backend; a level 2 hit is copied into level 1
+- Both levels are used only when the Django cache is shared between
+  workers (apps.common.cache): with the per-process default a bump in
+  one worker would not reach the others, so every lookup computes
+- Hits / misses are counted per process (compatibility_cache.stats())
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.common.cache import cache_is_shared
+
+
+GENERATION_KEY = "masters:catalogue-generation"
+
+
+# -------------------------------
+# CATALOGUE GENERATION
+# -------------------------------
+def get_catalogue_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Seeded from the clock: an evicted counter must not restart at a
+        # value older entries were stored under.
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_catalogue_generation(**kwargs):
+    """Invalidate every cached compatibility answer (signal receiver friendly)."""
+    try:
+        return cache.incr(GENERATION_KEY)
+    except ValueError:
+        generation = time.time_ns()
+        cache.set(GENERATION_KEY, generation, timeout=None)
+        return generation
+
+
+# -------------------------------
+# CACHE
+# -------------------------------
+class CompatibilityCache:
+    def __init__(self, local_size=None, timeout=None):
+        self.local_size = local_size
+        self.timeout = timeout
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"local_hits": 0, "shared_hits": 0, "misses": 0, "uncached": 0}
+
+    def _settings(self):
+        local_size = self.local_size
+        if local_size is None:
+            local_size = getattr(settings, "COMPATIBILITY_CACHE_LOCAL_SIZE", 256)
+        timeout = self.timeout
+        if timeout is None:
+            timeout = getattr(settings, "COMPATIBILITY_CACHE_TIMEOUT", 60 * 60)
+        return local_size, timeout
+
+    @staticmethod
+    def make_key(namespace, product_ids, generation):
+        ids = ",".join(str(pk) for pk in sorted(set(product_ids)))
+        digest = hashlib.sha1(ids.encode()).hexdigest()
+        return f"compat:{namespace}:{generation}:{digest}"
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def get_or_compute(self, namespace, product_ids, compute):
+        """
+        Cached result of compute() for one product-id set.
+
+        compute() must return a picklable value; exceptions propagate and
+        nothing is cached.
+        """
+        if not cache_is_shared():
+            self._count("uncached")
+            return compute()
+
+        local_size, timeout = self._settings()
+        # Read before computing: a change committed meanwhile bumps the
+        # generation, so the result is never stored under the newer one.
+        key = self.make_key(namespace, product_ids, get_catalogue_generation())
+
+        with self._lock:
+            if key in self._local:
+                self._local.move_to_end(key)
+                self._counters["local_hits"] += 1
+                return self._local[key]
+
+        value = cache.get(key)
+        if value is not None:
+            self._count("shared_hits")
+        else:
+            self._count("misses")
+            value = compute()
+            cache.set(key, value, timeout)
+
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > local_size:
+                self._local.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            local_entries = len(self._local)
+        lookups = sum(counters.values())
+        hits = counters["local_hits"] + counters["shared_hits"]
+        return {
+            **counters,
+            "lookups": lookups,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "local_entries": local_entries,
+            "local_size": self._settings()[0],
+            "shared": cache_is_shared(),
+            "generation": get_catalogue_generation(),
+        }
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+            for counter in self._counters:
+                self._counters[counter] = 0
+
+
+compatibility_cache = CompatibilityCache()
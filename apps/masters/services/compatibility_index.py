@@ -0,0 +1,305 @@
+"""
+Compatibility Index
+===================
+Materialized product -> driver / accessory compatibility, stored in
+ProductDriverMap and ProductAccessoryMap.
+
+Key Concepts:
+- A row means "compatible with this single product" under the rules of
+  apps.masters.services.compatibility
+- The driver wattage rule depends on the whole product selection, so
+  rows only require max_wattage >= the product's own wattage; the total
+  is checked after intersecting
+- Rows are synced incrementally on Product / Driver / Accessory save
+  (apps.masters.signals) with one set-based query for the saved row
+  (compatible_drivers_query / driver_products_query); deletes cascade
+- Mounting styles are matched in SQL through Accessory.mounting_style_mask
+  (bit AND), the Python rules (accessory_matches) remain the reference
+  used by --verify
+- Syncing only adds missing rows and removes stale ones, so curated
+  flags (is_default, is_mandatory) survive a rebuild
+- `manage.py rebuild_compatibility_index [--verify]` rebuilds or checks
+  the whole index
+"""
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from apps.masters.models import (
+    Product,
+    Driver,
+    Accessory,
+    ProductDriverMap,
+    ProductAccessoryMap,
+)
+from apps.masters.models.accessory import MOUNTING_STYLE_BITS
+from apps.masters.services.compatibility_cache import bump_catalogue_generation
+from apps.masters.services.driver_catalogue import DriverCatalogue
+
+
+# -------------------------------
+# RULES (single product)
+# -------------------------------
+def accessory_matches(product, accessory):
+    """
+    Accessory rules for one product:
+    1. product.mounting_style in accessory.compatible_mounting_styles
+    2. min_diameter_mm <= product.diameter_mm <= max_diameter_mm
+    3. accessory.compatible_ip_class >= product.ip_class
+    Rules are skipped when the product value is not set.
+    """
+    if product.mounting_style:
+        styles = accessory.compatible_mounting_styles or []
+        if isinstance(styles, str):
+            styles = [styles]
+        if product.mounting_style not in styles:
+            return False
+
+    if product.diameter_mm:
+        if accessory.min_diameter_mm is None or accessory.max_diameter_mm is None:
+            return False
+        if not accessory.min_diameter_mm <= product.diameter_mm <= accessory.max_diameter_mm:
+            return False
+
+    if product.ip_class:
+        if accessory.compatible_ip_class is None or accessory.compatible_ip_class < product.ip_class:
+            return False
+
+    return True
+
+
+def compatible_accessories_query(product):
+    """
+    accessory_matches() as SQL: accessories fitting one product.
+    The mounting rule is a bit AND on Accessory.mounting_style_mask.
+    """
+    accessories = Accessory.objects.all()
+
+    if product.mounting_style:
+        bit = MOUNTING_STYLE_BITS.get(product.mounting_style, 0)
+        accessories = accessories.annotate(
+            style_match=F("mounting_style_mask").bitand(bit)
+        ).filter(style_match__gt=0)
+
+    if product.diameter_mm:
+        accessories = accessories.filter(
+            min_diameter_mm__lte=product.diameter_mm,
+            max_diameter_mm__gte=product.diameter_mm,
+        )
+
+    if product.ip_class:
+        accessories = accessories.filter(compatible_ip_class__gte=product.ip_class)
+
+    return accessories
+
+
+def compatible_products_query(accessory):
+    """accessory_matches() as SQL: products one accessory fits."""
+    styles = [
+        style for style, bit in MOUNTING_STYLE_BITS.items()
+        if accessory.mounting_style_mask & bit
+    ]
+    products = Product.objects.filter(
+        Q(mounting_style__isnull=True) | Q(mounting_style="") | Q(mounting_style__in=styles)
+    )
+
+    no_diameter = Q(diameter_mm__isnull=True) | Q(diameter_mm=0)
+    if accessory.min_diameter_mm is None or accessory.max_diameter_mm is None:
+        products = products.filter(no_diameter)
+    else:
+        products = products.filter(
+            no_diameter | Q(
+                diameter_mm__gte=accessory.min_diameter_mm,
+                diameter_mm__lte=accessory.max_diameter_mm,
+            )
+        )
+
+    no_ip = Q(ip_class__isnull=True) | Q(ip_class=0)
+    if accessory.compatible_ip_class is None:
+        products = products.filter(no_ip)
+    else:
+        products = products.filter(no_ip | Q(ip_class__lte=accessory.compatible_ip_class))
+
+    return products
+
+
+def compatible_drivers_query(product):
+    """
+    Driver rules of one product (see get_compatible_drivers) as SQL,
+    with the product's own wattage as the total.
+    """
+    if product.driver_integration == "INTEGRATED":
+        return Driver.objects.none()
+
+    drivers = Driver.objects.all()
+    if product.electrical_type:
+        drivers = drivers.filter(constant_type=product.electrical_type)
+    if product.wattage:
+        drivers = drivers.filter(max_wattage__gte=product.wattage)
+    if product.electrical_type == "CC" and product.op_current:
+        drivers = drivers.filter(output_current_ma=product.op_current)
+    elif product.electrical_type == "CV" and product.op_voltage:
+        drivers = drivers.filter(
+            output_voltage_min__lte=product.op_voltage,
+            output_voltage_max__gte=product.op_voltage,
+        )
+    if product.ip_class:
+        drivers = drivers.filter(ip_class__gte=product.ip_class)
+    if product.control_ready and product.control_ready != "NONE":
+        drivers = drivers.filter(dimming_protocol=product.control_ready)
+    return drivers
+
+
+def _unset(field):
+    return Q(**{f"{field}__isnull": True}) | Q(**{field: ""})
+
+
+def _unset_number(field):
+    return Q(**{f"{field}__isnull": True}) | Q(**{field: 0})
+
+
+def driver_products_query(driver):
+    """compatible_drivers_query() the other way round: products one driver fits."""
+    products = Product.objects.exclude(driver_integration="INTEGRATED").filter(
+        _unset("electrical_type") | Q(electrical_type=driver.constant_type)
+    )
+
+    if driver.max_wattage is None:
+        products = products.filter(_unset_number("wattage"))
+    else:
+        products = products.filter(_unset_number("wattage") | Q(wattage__lte=driver.max_wattage))
+
+    cc_free = ~Q(electrical_type="CC") | _unset_number("op_current")
+    if driver.output_current_ma is not None:
+        cc_free |= Q(op_current=driver.output_current_ma)
+    products = products.filter(cc_free)
+
+    cv_free = ~Q(electrical_type="CV") | _unset_number("op_voltage")
+    if driver.output_voltage_min is not None and driver.output_voltage_max is not None:
+        cv_free |= Q(
+            op_voltage__gte=driver.output_voltage_min,
+            op_voltage__lte=driver.output_voltage_max,
+        )
+    products = products.filter(cv_free)
+
+    if driver.ip_class is None:
+        products = products.filter(_unset_number("ip_class"))
+    else:
+        products = products.filter(_unset_number("ip_class") | Q(ip_class__lte=driver.ip_class))
+
+    return products.filter(
+        _unset("control_ready") | Q(control_ready="NONE") | Q(control_ready=driver.dimming_protocol)
+    )
+
+
+def expected_driver_ids(product, catalogue):
+    """Reference driver rules of one product, evaluated on a DriverCatalogue."""
+    if product.driver_integration == "INTEGRATED":
+        return set()
+    return set(catalogue.compatible_ids([product]))
+
+
+def expected_accessory_ids(product, accessories):
+    return {a.pk for a in accessories if accessory_matches(product, a)}
+
+
+# -------------------------------
+# SYNC
+# -------------------------------
+def _sync(model, owner_field, owner_id, target_field, expected):
+    """Make the rows of one owner (product, driver or accessory) match `expected`."""
+    existing = set(
+        model.objects.filter(**{owner_field: owner_id})
+        .values_list(target_field, flat=True)
+    )
+    stale = existing - expected
+    if stale:
+        model.objects.filter(**{owner_field: owner_id, f"{target_field}__in": stale}).delete()
+    missing = expected - existing
+    if missing:
+        model.objects.bulk_create([
+            model(**{owner_field: owner_id, target_field: target_id})
+            for target_id in missing
+        ])
+    return len(stale), len(missing)
+
+
+def index_product(product):
+    with transaction.atomic():
+        _sync(ProductDriverMap, "product_id", product.pk, "driver_id",
+              set(compatible_drivers_query(product).values_list("pk", flat=True)))
+        _sync(ProductAccessoryMap, "product_id", product.pk, "accessory_id",
+              set(compatible_accessories_query(product).values_list("pk", flat=True)))
+
+
+def index_driver(driver):
+    expected = set(driver_products_query(driver).values_list("pk", flat=True))
+    with transaction.atomic():
+        _sync(ProductDriverMap, "driver_id", driver.pk, "product_id", expected)
+
+
+def index_accessory(accessory):
+    expected = set(compatible_products_query(accessory).values_list("pk", flat=True))
+    with transaction.atomic():
+        _sync(ProductAccessoryMap, "accessory_id", accessory.pk, "product_id", expected)
+
+
+# -------------------------------
+# FULL REBUILD / VERIFY
+# -------------------------------
+def compute_compatibility_index():
+    """
+    Expected index from the rules.
+
+    Returns:
+        (set of (product_id, driver_id), set of (product_id, accessory_id))
+    """
+    catalogue = DriverCatalogue.load()
+    accessories = list(Accessory.objects.all())
+    driver_pairs, accessory_pairs = set(), set()
+    for product in Product.objects.all().iterator():
+        driver_pairs.update((product.pk, d) for d in expected_driver_ids(product, catalogue))
+        accessory_pairs.update(
+            (product.pk, a) for a in expected_accessory_ids(product, accessories)
+        )
+    return driver_pairs, accessory_pairs
+
+
+def verify_compatibility_index():
+    """
+    Returns:
+        dict of missing / stale pairs per map (empty lists when in sync)
+    """
+    driver_pairs, accessory_pairs = compute_compatibility_index()
+    stored_drivers = set(ProductDriverMap.objects.values_list("product_id", "driver_id"))
+    stored_accessories = set(ProductAccessoryMap.objects.values_list("product_id", "accessory_id"))
+    return {
+        "drivers_missing": sorted(driver_pairs - stored_drivers),
+        "drivers_stale": sorted(stored_drivers - driver_pairs),
+        "accessories_missing": sorted(accessory_pairs - stored_accessories),
+        "accessories_stale": sorted(stored_accessories - accessory_pairs),
+    }
+
+
+@transaction.atomic
+def rebuild_compatibility_index():
+    """Bring the whole index in line with the rules (keeps curated flags)."""
+    report = verify_compatibility_index()
+    for model, target_field, missing, stale in (
+        (ProductDriverMap, "driver_id", report["drivers_missing"], report["drivers_stale"]),
+        (ProductAccessoryMap, "accessory_id", report["accessories_missing"], report["accessories_stale"]),
+    ):
+        stale_by_product = {}
+        for product_id, target_id in stale:
+            stale_by_product.setdefault(product_id, []).append(target_id)
+        for product_id, target_ids in stale_by_product.items():
+            model.objects.filter(
+                product_id=product_id, **{f"{target_field}__in": target_ids}
+            ).delete()
+        model.objects.bulk_create(
+            [model(product_id=product_id, **{target_field: target_id}) for product_id, target_id in missing],
+            batch_size=1000,
+        )
+    # Cached compatibility answers were read from the old index
+    transaction.on_commit(bump_catalogue_generation)
+    return report
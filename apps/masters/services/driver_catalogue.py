@@ -0,0 +1,154 @@
+"""
+Driver Catalogue
+================
+In-memory, column-oriented copy of the Driver master, used as the
+reference evaluation of the driver rules when the compatibility index
+is verified or rebuilt.
+
+Key Concepts:
+- The Driver table is read once (one query) into parallel columns
+- Each driver owns one bit; a set of drivers is a Python int bitmask,
+  so combining rules for N products is a handful of AND operations
+- Equality columns (constant_type, output current, dimming protocol)
+  keep one mask per distinct value
+- Range columns (max_wattage, ip_class, output voltage range) are kept
+  sorted with cumulative masks, so `column >= x` is a bisect plus one
+  mask lookup
+- Loaded on demand (DriverCatalogue.load()); request-time lookups
+  read the index instead
+"""
+
+from bisect import bisect_left, bisect_right
+
+from apps.masters.models import Driver
+
+
+class _RangeIndex:
+    """
+    Sorted non-NULL values of one column with cumulative masks.
+    Drivers with a NULL value never match a range rule.
+    """
+
+    def __init__(self, values):
+        pairs = sorted(
+            (value, bit) for bit, value in enumerate(values) if value is not None
+        )
+        self.keys = [value for value, _ in pairs]
+
+        # prefix[i]: drivers with the i smallest values
+        self.prefix = [0]
+        for _, bit in pairs:
+            self.prefix.append(self.prefix[-1] | (1 << bit))
+
+        # suffix[i]: drivers from position i to the end
+        self.suffix = [0] * (len(pairs) + 1)
+        for i in range(len(pairs) - 1, -1, -1):
+            self.suffix[i] = self.suffix[i + 1] | (1 << pairs[i][1])
+
+    def at_least(self, value):
+        return self.suffix[bisect_left(self.keys, value)]
+
+    def at_most(self, value):
+        return self.prefix[bisect_right(self.keys, value)]
+
+
+def _equality_masks(values):
+    masks = {}
+    for bit, value in enumerate(values):
+        if value is not None:
+            masks[value] = masks.get(value, 0) | (1 << bit)
+    return masks
+
+
+class DriverCatalogue:
+    FIELDS = (
+        "id",
+        "constant_type",
+        "max_wattage",
+        "output_current_ma",
+        "output_voltage_min",
+        "output_voltage_max",
+        "ip_class",
+        "dimming_protocol",
+    )
+
+    def __init__(self, rows):
+        columns = list(zip(*rows)) if rows else [()] * len(self.FIELDS)
+        (
+            self.ids,
+            constant_types,
+            max_wattages,
+            currents,
+            voltage_mins,
+            voltage_maxs,
+            ip_classes,
+            protocols,
+        ) = (list(column) for column in columns)
+
+        self.all_mask = (1 << len(self.ids)) - 1
+        self.constant_type = _equality_masks(constant_types)
+        self.current = _equality_masks(currents)
+        self.protocol = _equality_masks(protocols)
+        self.max_wattage = _RangeIndex(max_wattages)
+        self.ip_class = _RangeIndex(ip_classes)
+        self.voltage_min = _RangeIndex(voltage_mins)
+        self.voltage_max = _RangeIndex(voltage_maxs)
+
+    @classmethod
+    def load(cls):
+        return cls(list(Driver.objects.order_by("pk").values_list(*cls.FIELDS)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---- RULES ----
+    def product_mask(self, product, total_wattage):
+        """
+        Drivers satisfying every rule for one product.
+        Mirrors the rules documented on get_compatible_drivers.
+        """
+        mask = self.all_mask
+
+        if product.electrical_type:
+            mask &= self.constant_type.get(product.electrical_type, 0)
+
+        if total_wattage:
+            mask &= self.max_wattage.at_least(total_wattage)
+
+        if product.electrical_type == "CC":
+            if product.op_current:
+                mask &= self.current.get(product.op_current, 0)
+        elif product.electrical_type == "CV":
+            if product.op_voltage:
+                mask &= self.voltage_min.at_most(product.op_voltage)
+                mask &= self.voltage_max.at_least(product.op_voltage)
+
+        if product.ip_class and isinstance(product.ip_class, int):
+            mask &= self.ip_class.at_least(product.ip_class)
+
+        if product.control_ready and product.control_ready != "NONE":
+            mask &= self.protocol.get(product.control_ready, 0)
+
+        return mask
+
+    def compatible_ids(self, products):
+        """
+        Ids of drivers compatible with ALL products, in pk order.
+
+        Args:
+            products: list of Product objects (all EXTERNAL)
+        """
+        total_wattage = sum(p.wattage or 0 for p in products)
+
+        mask = self.all_mask
+        for product in products:
+            mask &= self.product_mask(product, total_wattage)
+            if not mask:
+                return []
+
+        ids = []
+        while mask:
+            low = mask & -mask
+            ids.append(self.ids[low.bit_length() - 1])
+            mask ^= low
+        return ids
@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.masters.models import Product, Driver, Accessory
+from apps.masters.services.compatibility_index import (
+    index_accessory,
+    index_driver,
+    index_product,
+)
+from apps.masters.services.compatibility_cache import bump_catalogue_generation
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Driver)
+@receiver(post_delete, sender=Driver)
+@receiver(post_save, sender=Accessory)
+@receiver(post_delete, sender=Accessory)
+def catalogue_changed(sender, instance, **kwargs):
+    # Again on commit: a reader may have cached the pre-commit rows.
+    bump_catalogue_generation()
+    transaction.on_commit(bump_catalogue_generation)
+
+
+@receiver(post_save, sender=Driver)
+@receiver(post_delete, sender=Driver)
+def driver_changed(sender, instance, **kwargs):
+    if kwargs.get("signal") is post_save and not kwargs.get("raw"):
+        index_driver(instance)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_product(instance)
+
+
+@receiver(post_save, sender=Accessory)
+def accessory_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_accessory(instance)
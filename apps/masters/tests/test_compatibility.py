@@ -0,0 +1,267 @@
+import itertools
+from decimal import Decimal
+
+import pytest
+from django.db.models import Q
+from rest_framework.test import APIClient
+
+from apps.masters.models import Accessory, Driver, Product, ProductAccessoryMap
+from apps.masters.services.compatibility import (
+    get_compatible_accessories,
+    get_compatible_drivers,
+)
+from apps.masters.services.compatibility_cache import (
+    CompatibilityCache,
+    get_catalogue_generation,
+)
+from apps.masters.services.compatibility_index import (
+    accessory_matches,
+    compatible_accessories_query,
+    compatible_drivers_query,
+    compatible_products_query,
+    driver_products_query,
+    expected_accessory_ids,
+    rebuild_compatibility_index,
+    verify_compatibility_index,
+)
+
+
+def reference_driver_ids(products):
+    """The rules of get_compatible_drivers, evaluated with plain ORM filters."""
+    if any(p.driver_integration == "INTEGRATED" for p in products):
+        return []
+    total_wattage = sum(p.wattage or 0 for p in products)
+    queryset = Driver.objects.all()
+    for product in products:
+        filters = Q()
+        if product.electrical_type:
+            filters &= Q(constant_type=product.electrical_type)
+        if total_wattage:
+            filters &= Q(max_wattage__gte=total_wattage)
+        if product.electrical_type == "CC" and product.op_current:
+            filters &= Q(output_current_ma=product.op_current)
+        elif product.electrical_type == "CV" and product.op_voltage:
+            filters &= Q(
+                output_voltage_min__lte=product.op_voltage,
+                output_voltage_max__gte=product.op_voltage,
+            )
+        if product.ip_class:
+            filters &= Q(ip_class__gte=product.ip_class)
+        if product.control_ready and product.control_ready != "NONE":
+            filters &= Q(dimming_protocol=product.control_ready)
+        queryset = queryset.filter(filters)
+    return sorted(queryset.values_list("pk", flat=True))
+
+
+@pytest.fixture
+def catalogue():
+    variants = itertools.product(
+        ("CC", "CV"), (20, 60, None), (350, 700), ((12, 24), (24, 48)),
+        (20, 65, None), ("NONE", "DALI", "0-10V"),
+    )
+    for index, (ctype, watts, current, (vmin, vmax), ip, protocol) in enumerate(variants):
+        Driver.objects.create(
+            driver_code=f"DRV-{index}",
+            driver_make="Make",
+            constant_type=ctype,
+            max_wattage=watts,
+            output_current_ma=current,
+            output_voltage_min=vmin,
+            output_voltage_max=vmax,
+            ip_class=ip,
+            dimming_protocol=protocol,
+            base_price=Decimal("10.00"),
+        )
+
+    products = []
+    for index, (ctype, watts, current, voltage, ip, control) in enumerate(itertools.product(
+        ("CC", "CV"), (Decimal("8.5"), None), (350, None), (24, None), (44, None), ("NONE", "DALI"),
+    )):
+        products.append(Product.objects.create(
+            make=f"Product {index}",
+            order_code=f"P-{index}",
+            electrical_type=ctype,
+            wattage=watts,
+            op_current=current,
+            op_voltage=voltage,
+            ip_class=ip,
+            control_ready=control,
+            base_price=Decimal("10.00"),
+        ))
+    return products
+
+
+@pytest.mark.django_db
+def test_catalogue_matches_orm_rules(catalogue):
+    assert any(reference_driver_ids([product]) for product in catalogue)
+    for product in catalogue:
+        assert list(get_compatible_drivers([product]).values_list("pk", flat=True)) == (
+            reference_driver_ids([product])
+        )
+
+    for pair in itertools.combinations(catalogue[::5], 2):
+        products = Product.objects.filter(pk__in=[p.pk for p in pair])
+        assert list(get_compatible_drivers(products).values_list("pk", flat=True)) == (
+            reference_driver_ids(list(pair))
+        )
+
+    # Single-row index queries, both directions
+    for product in catalogue:
+        assert sorted(compatible_drivers_query(product).values_list("pk", flat=True)) == (
+            reference_driver_ids([product])
+        )
+    for driver in Driver.objects.all():
+        assert set(driver_products_query(driver).values_list("pk", flat=True)) == {
+            p.pk for p in catalogue if driver.pk in reference_driver_ids([p])
+        }
+
+
+@pytest.mark.django_db
+def test_index_follows_master_changes(catalogue, django_assert_num_queries):
+    product = catalogue[0]
+    before = list(get_compatible_drivers(product))
+    assert before
+
+    # One indexed query per lookup
+    with django_assert_num_queries(1):
+        list(get_compatible_drivers(product))
+
+    # Driver no longer fits -> dropped from the index
+    driver = before[0]
+    driver.ip_class = 10
+    driver.save()
+    assert list(get_compatible_drivers(product)) == before[1:]
+
+    # Product change re-evaluates its drivers
+    product.ip_class = None
+    product.save()
+    assert driver in get_compatible_drivers(product)
+
+    assert not any(verify_compatibility_index().values())
+
+
+@pytest.mark.django_db
+def test_accessory_rules_and_rebuild(catalogue):
+    clip = Accessory.objects.create(
+        accessory_name="Clip",
+        accessory_type="Clip",
+        accessory_category="MOUNTING",
+        compatible_mounting_styles=["SURFACE", "RECESSED"],
+        compatible_ip_class=65,
+    )
+    Accessory.objects.create(
+        accessory_name="Inground sleeve",
+        accessory_type="Sleeve",
+        accessory_category="INSTALLATION",
+        compatible_mounting_styles=["INGROUND"],
+    )
+
+    surface = catalogue[0]
+    assert list(get_compatible_accessories(surface)) == [clip]
+
+    ProductAccessoryMap.objects.all().delete()
+    assert verify_compatibility_index()["accessories_missing"]
+    rebuild_compatibility_index()
+    assert not any(verify_compatibility_index().values())
+    assert list(get_compatible_accessories(Product.objects.filter(pk=surface.pk))) == [clip]
+
+
+@pytest.mark.django_db
+def test_mounting_style_mask_matches_python_rules(catalogue):
+    accessories = [
+        Accessory.objects.create(
+            accessory_name=f"Accessory {index}",
+            accessory_type="Clip",
+            accessory_category="MOUNTING",
+            compatible_mounting_styles=styles,
+            min_diameter_mm=diameters[0],
+            max_diameter_mm=diameters[1],
+            compatible_ip_class=ip,
+        )
+        for index, (styles, diameters, ip) in enumerate(itertools.product(
+            ([], ["SURFACE"], ["RECESSED", "TRACK MOUNTED"]),
+            ((None, None), (50, 80)),
+            (None, 44, 65),
+        ))
+    ]
+    assert accessories[1].mounting_style_mask == 0
+    assert accessories[-1].mounting_style_mask == 2 | 8
+
+    # Mask follows compatible_mounting_styles on save
+    accessory = accessories[0]
+    accessory.compatible_mounting_styles = ["INGROUND"]
+    accessory.save(update_fields=["compatible_mounting_styles"])
+    accessory.refresh_from_db()
+    assert accessory.mounting_style_mask == 4
+
+    accessories = list(Accessory.objects.all())
+    for style, diameter in itertools.product(
+        ("SURFACE", "RECESSED", "INGROUND", None), (None, 60, 100),
+    ):
+        product = catalogue[0]
+        product.mounting_style, product.diameter_mm = style, diameter
+        for ip in (None, 44, 66):
+            product.ip_class = ip
+            assert set(compatible_accessories_query(product).values_list("pk", flat=True)) == (
+                expected_accessory_ids(product, accessories)
+            )
+
+    for accessory in accessories:
+        assert set(compatible_products_query(accessory).values_list("pk", flat=True)) == {
+            p.pk for p in Product.objects.all() if accessory_matches(p, accessory)
+        }
+    assert not any(verify_compatibility_index().values())
+
+
+@pytest.mark.django_db
+def test_compatibility_cache_follows_catalogue_generation(catalogue, settings):
+    settings.SHARED_CACHE = True
+    cache = CompatibilityCache(local_size=2)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [d.pk for d in get_compatible_drivers(Product.objects.filter(pk__in=ids))]
+
+    ids = [catalogue[1].pk, catalogue[0].pk]
+    first = cache.get_or_compute("selection", ids, compute)
+    # Same set in another order: served from the in-process LRU
+    assert cache.get_or_compute("selection", ids[::-1], compute) == first
+    assert len(calls) == 1
+
+    # Another process: empty LRU, shared cache hit
+    other = CompatibilityCache(local_size=2)
+    assert other.get_or_compute("selection", ids, compute) == first
+    assert len(calls) == 1
+    assert other.stats()["shared_hits"] == 1
+
+    # Any master change moves the generation
+    generation = get_catalogue_generation()
+    driver = Driver.objects.get(pk=first[0])
+    driver.ip_class = 10
+    driver.save()
+    assert get_catalogue_generation() > generation
+    assert cache.get_or_compute("selection", ids, compute) == first[1:]
+    assert len(calls) == 2
+
+    stats = cache.stats()
+    assert (stats["local_hits"], stats["shared_hits"], stats["misses"]) == (1, 0, 2)
+    assert stats["local_entries"] == 2
+
+
+@pytest.mark.django_db
+def test_compatibility_cache_is_off_without_shared_cache(catalogue, settings):
+    settings.SHARED_CACHE = None  # LocMemCache: one copy per worker
+    cache = CompatibilityCache()
+    calls = []
+    for _ in range(2):
+        cache.get_or_compute("product", [catalogue[0].pk], lambda: calls.append(1) or [])
+    assert len(calls) == 2
+    assert cache.stats()["uncached"] == 2 and not cache.stats()["shared"]
+
+    # Errors keep the endpoint's {"error": "..."} shape
+    response = APIClient().post(
+        "/api/configurations/compatibility/", {"product_ids": [0]}, format="json"
+    )
+    assert response.status_code == 400
+    assert response.json() == {"error": "No valid products found with provided IDs"}
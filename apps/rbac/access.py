@@ -0,0 +1,153 @@
+"""
+Cached role / permission resolution
+===================================
+One resolved set of roles (group names) and permissions per user,
+shared by every permission class.
+
+Key Concepts:
+- Resolved with two queries (groups, then user + group permissions) and
+  stored in the Django cache under a versioned key
+- A global version (role permissions, group renames / deletes) and a
+  per-user version (role assignment, user permissions, superuser /
+  active flags) are bumped by apps.rbac.signals, so a change applies on
+  the next request without deleting anything
+- Within a request the result is memoized on the user object, so
+  composite checks (IsAdmin | IsFinance | IsEditor) resolve once
+- access_stamp() condenses both versions into the string signed into
+  JWTs (apps.common.jwt_serializers); a token whose stamp no longer
+  matches was issued before a role / permission change
+- The versions only reach every worker through a shared cache
+  (apps.common.cache); without one, access is loaded from the database
+  on every request and token stamps are never trusted
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db.models import Q
+
+from apps.common.cache import cache_is_shared
+
+
+GLOBAL_VERSION_KEY = "rbac:access-version"
+
+
+def _user_version_key(user_id):
+    return f"rbac:access-version:user:{user_id}"
+
+
+class UserAccess:
+    __slots__ = ("roles", "permissions", "is_superuser", "is_active")
+
+    def __init__(self, roles, permissions, is_superuser=False, is_active=True):
+        self.roles = frozenset(roles)
+        self.permissions = frozenset(permissions)
+        self.is_superuser = is_superuser
+        self.is_active = is_active
+
+    def has_role(self, *names):
+        return bool(self.roles.intersection(names))
+
+    def has_perm(self, perm):
+        """Same answer as User.has_perm ("app_label.codename")."""
+        if not self.is_active:
+            return False
+        return self.is_superuser or perm in self.permissions
+
+
+ANONYMOUS_ACCESS = UserAccess((), (), is_active=False)
+
+
+# -------------------------------
+# VERSIONS
+# -------------------------------
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Seeded from the clock: a lost counter must not come back at a
+        # value older entries were stored under.
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_global_access_version(**kwargs):
+    _bump(GLOBAL_VERSION_KEY)
+
+
+def bump_user_access_version(user_id):
+    _bump(_user_version_key(user_id))
+
+
+def _versions(user_id):
+    keys = [GLOBAL_VERSION_KEY, _user_version_key(user_id)]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # A missing counter (cache flushed / evicted) may have been bumped
+        # before it was lost: seed it from the clock so stamps and keys
+        # issued earlier no longer match.
+        for key in missing:
+            cache.add(key, time.time_ns(), timeout=None)
+        versions.update(cache.get_many(missing))
+    return versions[GLOBAL_VERSION_KEY], versions[_user_version_key(user_id)]
+
+
+def access_stamp(user_id):
+    """Current global + user version of one user, e.g. "1712345678.1712345679" (no DB)."""
+    return "{}.{}".format(*_versions(user_id))
+
+
+def _access_key(user_id):
+    global_version, user_version = _versions(user_id)
+    return f"rbac:access:{global_version}:{user_id}:{user_version}"
+
+
+# -------------------------------
+# RESOLUTION
+# -------------------------------
+def load_user_access(user):
+    """
+    Roles and permissions of one user from the database.
+    Queried by id, so token users (apps.common.authentication) work too.
+    """
+    roles = Group.objects.filter(user__id=user.pk).values_list("name", flat=True)
+    permissions = (
+        Permission.objects.filter(Q(user__id=user.pk) | Q(group__user__id=user.pk))
+        .values_list("content_type__app_label", "codename")
+        .distinct()
+    )
+    return UserAccess(
+        roles,
+        (f"{app_label}.{codename}" for app_label, codename in permissions),
+        is_superuser=user.is_superuser,
+        is_active=user.is_active,
+    )
+
+
+def get_user_access(user):
+    """
+    Resolved access of a (request) user.
+
+    Returns:
+        UserAccess (ANONYMOUS_ACCESS for anonymous users)
+    """
+    if not user or not user.is_authenticated:
+        return ANONYMOUS_ACCESS
+
+    access = getattr(user, "_rbac_access", None)
+    if access is not None:
+        return access
+
+    if not cache_is_shared():
+        access = load_user_access(user)
+    else:
+        key = _access_key(user.pk)
+        access = cache.get(key)
+        if access is None:
+            access = load_user_access(user)
+            cache.set(key, access, getattr(settings, "RBAC_ACCESS_CACHE_TIMEOUT", 15 * 60))
+
+    user._rbac_access = access
+    return access
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class RbacConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = "apps.rbac"
\ No newline at end of file
+    name = "apps.rbac"
+
+    def ready(self):
+        from apps.rbac import signals  # noqa: F401
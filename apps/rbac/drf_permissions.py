@@ -1,5 +1,7 @@
 from rest_framework.permissions import BasePermission
 
+from apps.rbac.access import get_user_access
+
 class HasPermission(BasePermission):
     """
     Generic permission checker.
@@ -13,4 +15,4 @@ class HasPermission(BasePermission):
         perm = getattr(view, "permission_required", None)
         if not perm:
             return True
-        return request.user.has_perm(perm)
\ No newline at end of file
+        return get_user_access(request.user).has_perm(perm)
\ No newline at end of file
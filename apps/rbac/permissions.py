@@ -1,6 +1,9 @@
+from apps.rbac.access import get_user_access
+
+
 def has_permission(user, perm):
     """
     Example:
     has_permission(user, "boq.approve_boq")
     """
-    return user.has_perm(perm)
\ No newline at end of file
+    return get_user_access(user).has_perm(perm)
\ No newline at end of file
@@ -0,0 +1,50 @@
+from functools import partial
+
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from apps.rbac.access import bump_global_access_version, bump_user_access_version
+
+
+def _on_change(bump):
+    # Again on commit: a reader may have cached the pre-commit rows.
+    bump()
+    transaction.on_commit(bump)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_access_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        # user.groups.add(...) / user.user_permissions.set(...)
+        _on_change(partial(bump_user_access_version, instance.pk))
+    elif pk_set:
+        # group.user_set.add(...) / permission.user_set.add(...): these users
+        for user_id in pk_set:
+            _on_change(partial(bump_user_access_version, user_id))
+    else:
+        # clear() from the group / permission side: unknown users
+        _on_change(bump_global_access_version)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def role_permissions_changed(sender, action, **kwargs):
+    if action.startswith("post_"):
+        _on_change(bump_global_access_version)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def role_changed(sender, **kwargs):
+    _on_change(bump_global_access_version)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # is_superuser / is_active are part of the resolved access
+    _on_change(partial(bump_user_access_version, instance.pk))
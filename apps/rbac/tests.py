@@ -1,3 +0,0 @@
-# rbac/apps.py is already created.
-# rbac/tests.py
-# Add tests here if needed in the future.
@@ -0,0 +1,152 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import Group, Permission, User
+from rest_framework.test import APIClient, APIRequestFactory
+
+from apps.common.permissions import IsAdmin, IsEditor, IsFinance
+from apps.rbac.access import get_user_access
+
+
+def fresh(user):
+    """Same user as a new request would see it (no per-request memo)."""
+    return User.objects.get(pk=user.pk)
+
+
+@pytest.fixture
+def roles():
+    return {name: Group.objects.create(name=name) for name in ("Admin", "Sales", "Finance")}
+
+
+@pytest.mark.django_db
+def test_access_is_resolved_once_and_follows_changes(roles, settings, django_assert_num_queries):
+    settings.SHARED_CACHE = True
+    user = User.objects.create_user("planner", password="x")
+    user.groups.add(roles["Sales"])
+
+    request = APIRequestFactory().post("/")
+    request.user = fresh(user)
+    composite = IsAdmin | IsFinance | IsEditor
+    with django_assert_num_queries(2):
+        assert composite().has_permission(request, None)
+        assert not IsAdmin().has_permission(request, None)
+
+    # Cached for the next request
+    request.user = fresh(user)
+    with django_assert_num_queries(0):
+        assert IsEditor().has_permission(request, None)
+
+    # Role permissions changed through the RBAC API
+    approve = Permission.objects.get(content_type__app_label="boq", codename="change_boq")
+    admin = User.objects.create_superuser("root", "root@example.com", "x")
+    client = APIClient()
+    client.force_authenticate(admin)
+    response = client.post(
+        f"/api/roles/{roles['Sales'].pk}/assign-permissions/",
+        {"permission_ids": [approve.pk]},
+        format="json",
+    )
+    assert response.status_code == 200
+    assert get_user_access(fresh(user)).has_perm("boq.change_boq")
+
+    # Role assignment through the RBAC API
+    response = client.post(
+        f"/api/users/{user.pk}/assign-role/", {"group_id": roles["Finance"].pk}, format="json"
+    )
+    assert response.status_code == 200
+    assert get_user_access(fresh(user)).roles == {"Sales", "Finance"}
+
+    roles["Finance"].user_set.remove(user)
+    assert get_user_access(fresh(user)).roles == {"Sales"}
+
+    user.is_active = False
+    user.save()
+    assert not get_user_access(fresh(user)).has_perm("boq.change_boq")
+
+
+def auth_queries(context):
+    """Queries on users / roles / permissions (request audit inserts aside)."""
+    return [q["sql"] for q in context.captured_queries if '"auth_' in q["sql"]]
+
+
+@pytest.mark.django_db
+def test_read_requests_authenticate_from_token_claims(roles, settings):
+    settings.SHARED_CACHE = True
+    user = User.objects.create_user("reader", email="reader@example.com", password="x")
+    user.groups.add(roles["Finance"])
+
+    client = APIClient()
+    tokens = client.post(
+        "/api/auth/login/", {"username": "reader", "password": "x"}, format="json"
+    ).json()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+    # Identity and roles come from the signed claims; access is cached
+    with CaptureQueriesContext(connection) as context:
+        response = client.get("/api/common/me/")
+    assert auth_queries(context) == []
+    assert response.json()["roles"] == ["Finance"]
+    assert response.json()["email"] == "reader@example.com"
+    assert response.json()["id"] == user.pk
+
+    # A role change makes the stamp stale: the User row is loaded again
+    user.groups.add(roles["Sales"])
+    with CaptureQueriesContext(connection) as context:
+        response = client.get("/api/common/me/")
+    assert len(auth_queries(context)) == 3
+    assert response.json()["roles"] == ["Finance", "Sales"]
+
+    # A refreshed access token carries the new roles and stamp
+    access = client.post(
+        "/api/auth/refresh/", {"refresh": tokens["refresh"]}, format="json"
+    ).json()["access"]
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+    with CaptureQueriesContext(connection) as context:
+        response = client.get("/api/common/me/")
+    assert auth_queries(context) == []
+    assert response.json()["roles"] == ["Finance", "Sales"]
+
+
+@pytest.mark.django_db
+def test_access_stamps_go_stale_when_the_cache_is_lost(roles, settings):
+    settings.SHARED_CACHE = True
+    user = User.objects.create_user("restart", password="x")
+    user.groups.add(roles["Finance"])
+
+    # Token issued right after a cache flush (no version counters yet)
+    cache.clear()
+    client = APIClient()
+    access = client.post(
+        "/api/auth/login/", {"username": "restart", "password": "x"}, format="json"
+    ).json()["access"]
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    # Deactivated, then the cache (with the bumped counter) is lost again
+    user.is_active = False
+    user.save()
+    cache.clear()
+    assert client.get("/api/common/me/").status_code == 401
+
+
+@pytest.mark.django_db
+def test_access_is_not_cached_without_shared_cache(roles, settings, django_assert_num_queries):
+    settings.SHARED_CACHE = None  # LocMemCache: versions bumped in one worker only
+    user = User.objects.create_user("local", password="x")
+    user.groups.add(roles["Finance"])
+
+    request = APIRequestFactory().post("/")
+    for _ in range(2):
+        request.user = fresh(user)
+        with django_assert_num_queries(2):
+            assert IsFinance().has_permission(request, None)
+
+    # Read requests load the User row as well
+    client = APIClient()
+    access = client.post(
+        "/api/auth/login/", {"username": "local", "password": "x"}, format="json"
+    ).json()["access"]
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+    user.is_active = False
+    user.save()
+    assert client.get("/api/common/me/").status_code == 401
@@ -1,4 +1,5 @@
 
+import os
 from pathlib import Path
 from datetime import timedelta
 from corsheaders.defaults import default_headers
@@ -57,7 +58,8 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # Read requests are served from the token claims (no User query)
+        "apps.common.authentication.StatelessJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -86,6 +88,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'easyaudit.middleware.easyaudit.EasyAuditMiddleware',
+    'apps.common.audit.AuditBufferMiddleware',
 ]
 
 ROOT_URLCONF = 'lighting_erp.urls'
@@ -172,9 +175,24 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5173",
 ]
 
-EASY_AUDIT_WATCH_MODEL_EVENTS = True
-EASY_AUDIT_WATCH_AUTH_EVENTS = False
-EASY_AUDIT_WATCH_REQUEST_EVENTS = False
+# django-easy-audit only reads DJANGO_-prefixed settings
+DJANGO_EASY_AUDIT_WATCH_MODEL_EVENTS = True
+DJANGO_EASY_AUDIT_WATCH_AUTH_EVENTS = False
+DJANGO_EASY_AUDIT_WATCH_REQUEST_EVENTS = False
+
+# CRUD events are buffered per request (apps.common.audit)
+DJANGO_EASY_AUDIT_LOGGING_BACKEND = "apps.common.audit.BufferedAuditBackend"
+
+# Derived / bookkeeping rows: their changes are covered by BOQ audit entries
+DJANGO_EASY_AUDIT_UNREGISTERED_CLASSES_EXTRA = [
+    "boq.AuditLogEntry",
+    "boq.BOQCumulativeTotal",
+    "boq.BOQJob",
+    "masters.ProductDriverMap",
+    "masters.ProductAccessoryMap",
+    "configurations.ConfigurationSnapshot",
+    "configurations.ConfigurationVersion",
+]
 
 EASY_AUDIT_INCLUDE_FIELDS = {
     # Projects & Areas
@@ -218,6 +236,9 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
     "AUTH_HEADER_TYPES": ("Bearer",),
+    # Username / roles / access stamp claims for StatelessJWTAuthentication
+    "TOKEN_OBTAIN_SERIALIZER": "apps.common.jwt_serializers.ERPTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "apps.common.jwt_serializers.ERPTokenRefreshSerializer",
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
@@ -226,3 +247,56 @@ CORS_ALLOW_CREDENTIALS = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# BOQ exports: trace peak Python memory per export (slows rendering down)
+BOQ_EXPORT_TRACE_MEMORY = DEBUG
+
+# Rendered FINAL BOQ documents (LRU-evicted above the size budget)
+BOQ_EXPORT_CACHE_DIR = BASE_DIR / 'var' / 'boq_export_cache'
+BOQ_EXPORT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# BOQ background jobs: "worker" (manage.py run_boq_worker must be running),
+# "thread" or "inline" (runs inside the request; tests / development only)
+BOQ_JOB_BACKEND = 'worker'
+BOQ_JOB_OUTPUT_DIR = BASE_DIR / 'var' / 'boq_jobs'
+# Seconds a worker may go without reporting progress before its job is
+# requeued (failed after BOQ_JOB_MAX_ATTEMPTS claims)
+BOQ_JOB_LEASE_SECONDS = 300
+BOQ_JOB_MAX_ATTEMPTS = 3
+# DRAFT export files are deleted this many seconds after the job finished
+BOQ_JOB_OUTPUT_TTL = 24 * 60 * 60
+
+
+# Cached diffs between two FINAL BOQ versions (seconds)
+BOQ_DIFF_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Shared cache: compatibility answers and cached RBAC access are only
+# used when every worker reads the same cache (apps.common.cache).
+# REDIS_URL selects Django's Redis backend (needs the redis package);
+# without it the per-process default cache is not trusted.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+
+# Compatibility answers: in-process LRU entries / shared cache TTL (seconds)
+COMPATIBILITY_CACHE_LOCAL_SIZE = 256
+COMPATIBILITY_CACHE_TIMEOUT = 60 * 60
+
+# Configuration versions only store changed lines (unchanged rows are
+# shared with the parent version); False writes a full copy per version
+CONFIGURATION_COPY_ON_WRITE = True
+
+# Resolved roles / permissions per user (apps.rbac.access), seconds
+RBAC_ACCESS_CACHE_TIMEOUT = 15 * 60
+
+# Audit buffer: CREATE events of one model in one request above this
+# count are stored as one summary event
+AUDIT_BULK_COLLAPSE_THRESHOLD = 20
+
+# Audit archive (manage.py archive_audit_logs): rows older than the
+# retention window move to monthly .jsonl.gz files, still read by the feed
+AUDIT_HOT_RETENTION_DAYS = 90
+AUDIT_ARCHIVE_DIR = BASE_DIR / 'var' / 'audit_archive'
@@ -302,7 +302,11 @@ const BOQ = {
         if (!this.projectId) return;
         try {
             Utils.showToast('Generating BOQ...', 'info');
-            await API.post(`/boq/generate/${this.projectId}/`);
+            const job = await this.runJob({ kind: 'GENERATE', project_id: this.projectId });
+            if (job.status !== 'SUCCEEDED') {
+                Utils.showToast(job.message || 'Failed to generate BOQ', 'error');
+                return;
+            }
             Utils.showToast('BOQ generated successfully!', 'success');
             await this.loadBOQVersions();
         } catch (error) {
@@ -339,10 +343,45 @@ const BOQ = {
         }
     },
 
-    export(format) {
-        const token = API.getToken();
-        const url = `/api/boq/export/${format}/${this.boqId}/?token=${token}`;
-        window.open(url, '_blank');
+    async export(format) {
+        // Opened while the click still counts as a user gesture (popup
+        // blockers drop windows opened after the job polls)
+        const target = window.open('', '_blank');
+        try {
+            Utils.showToast(`Preparing ${format.toUpperCase()} export...`, 'info');
+            const kind = format === 'pdf' ? 'EXPORT_PDF' : 'EXPORT_EXCEL';
+            const job = await this.runJob({ kind, boq_id: this.boqId });
+            if (job.status !== 'SUCCEEDED') {
+                if (target) target.close();
+                Utils.showToast(job.message || 'Export failed', 'error');
+                return;
+            }
+            const token = API.getToken();
+            const url = `${job.download_url}?token=${token}`;
+            if (target) {
+                target.location = url;
+            } else {
+                window.location.assign(url);
+            }
+        } catch (error) {
+            if (target) target.close();
+            console.error('Export Error:', error);
+            Utils.showToast(error.response?.data?.detail || 'Export failed', 'error');
+        }
+    },
+
+    // Queue a background job and poll until it finishes (gives up after maxWaitMs).
+    async runJob(payload, pollMs = 1500, maxWaitMs = 5 * 60 * 1000) {
+        let job = await API.post('/boq/jobs/', payload);
+        const deadline = Date.now() + maxWaitMs;
+        while (job && (job.status === 'QUEUED' || job.status === 'RUNNING')) {
+            if (Date.now() >= deadline) {
+                return { ...job, status: 'FAILED', message: 'This is taking too long, please try again later' };
+            }
+            await new Promise(resolve => setTimeout(resolve, pollMs));
+            job = await API.get(`/boq/jobs/${job.id}/`);
+        }
+        return job || { status: 'FAILED' };
     }
 };
 